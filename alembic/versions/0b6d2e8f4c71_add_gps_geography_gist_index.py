@@ -0,0 +1,36 @@
+"""Add GiST expression index on gps_data position as geography
+
+Revision ID: 0b6d2e8f4c71
+Revises: f3a9c61e7b24
+Create Date: 2026-10-17 16:48:39.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6d2e8f4c71'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c61e7b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Índice de expresión (sin columna generada: no reescribe gps_data).
+    # La expresión es la misma que GPS_GEOGRAPHY_SQL en src/Models/gps_data.py
+    op.execute(
+        """
+        CREATE INDEX idx_gps_geography
+        ON gps_data USING gist
+        ((CAST(ST_SetSRID(ST_MakePoint("Longitude", "Latitude"), 4326) AS geography)))
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_gps_geography', table_name='gps_data')
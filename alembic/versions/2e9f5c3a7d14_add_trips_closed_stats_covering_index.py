@@ -0,0 +1,36 @@
+"""Add covering partial index for closed-trip statistics
+
+Revision ID: 2e9f5c3a7d14
+Revises: 6b2d8e4f1a97
+Create Date: 2026-10-17 19:14:46.058391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e9f5c3a7d14'
+down_revision: Union[str, Sequence[str], None] = '6b2d8e4f1a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # status va en el WHERE del índice, no como columna clave
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_trips_closed_stats
+        ON trips (device_id, start_time)
+        INCLUDE (trip_type, distance, duration, avg_speed)
+        WHERE status = 'closed'
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP INDEX IF EXISTS idx_trips_closed_stats')
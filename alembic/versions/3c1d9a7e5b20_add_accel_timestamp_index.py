@@ -0,0 +1,28 @@
+"""Add accelerometer_data Timestamp index
+
+Revision ID: 3c1d9a7e5b20
+Revises: 97067c8f86ef
+Create Date: 2026-10-17 09:41:05.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1d9a7e5b20'
+down_revision: Union[str, Sequence[str], None] = '97067c8f86ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_accel_timestamp', 'accelerometer_data', ['Timestamp'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_accel_timestamp', table_name='accelerometer_data')
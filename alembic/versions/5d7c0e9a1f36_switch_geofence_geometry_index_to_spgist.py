@@ -0,0 +1,38 @@
+"""Switch geofences.geometry index from GiST to SP-GiST
+
+Revision ID: 5d7c0e9a1f36
+Revises: b8f3e61d2a47
+Create Date: 2026-10-17 11:32:50.274419
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7c0e9a1f36'
+down_revision: Union[str, Sequence[str], None] = 'b8f3e61d2a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Requires PostGIS >= 3.0 (SP-GiST operator class for geography)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_geofences_geometry_spgist "
+        "ON geofences USING spgist (geometry)"
+    )
+    # GiST index created automatically by GeoAlchemy2
+    op.execute("DROP INDEX IF EXISTS idx_geofences_geometry")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_geofences_geometry "
+        "ON geofences USING gist (geometry)"
+    )
+    op.execute("DROP INDEX IF EXISTS idx_geofences_geometry_spgist")
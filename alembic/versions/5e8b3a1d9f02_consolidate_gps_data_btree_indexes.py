@@ -0,0 +1,46 @@
+"""Consolidate gps_data B-tree indexes around (key, Timestamp) composites
+
+Revision ID: 5e8b3a1d9f02
+Revises: 0b6d2e8f4c71
+Create Date: 2026-10-17 17:05:52.661840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b3a1d9f02'
+down_revision: Union[str, Sequence[str], None] = '0b6d2e8f4c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los índices de gps_data se crearon fuera de Alembic (create_all):
+    # IF [NOT] EXISTS para que la migración sea idempotente en cualquier base.
+
+    # Compuestos que sirven filtro + ORDER BY "Timestamp" con un index walk
+    op.execute('CREATE UNIQUE INDEX IF NOT EXISTS unique_device_timestamp ON gps_data ("DeviceID", "Timestamp")')
+    op.execute('CREATE INDEX IF NOT EXISTS idx_gps_trip_timestamp ON gps_data (trip_id, "Timestamp")')
+
+    # Prefiltro bbox (get_gps_in_bounding_box / fallback NumPy)
+    op.execute('CREATE INDEX IF NOT EXISTS idx_gps_lat_lon ON gps_data ("Latitude", "Longitude")')
+
+    # Redundantes: mismo prefijo que un compuesto existente
+    op.execute('DROP INDEX IF EXISTS idx_device_timestamp')     # = unique_device_timestamp
+    op.execute('DROP INDEX IF EXISTS "ix_gps_data_DeviceID"')   # prefijo de unique_device_timestamp
+    op.execute('DROP INDEX IF EXISTS idx_gps_trip_id')          # prefijo de idx_gps_trip_timestamp
+    op.execute('DROP INDEX IF EXISTS ix_gps_data_trip_id')      # prefijo de idx_gps_trip_timestamp
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('CREATE INDEX IF NOT EXISTS ix_gps_data_trip_id ON gps_data (trip_id)')
+    op.execute('CREATE INDEX IF NOT EXISTS idx_gps_trip_id ON gps_data (trip_id)')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_gps_data_DeviceID" ON gps_data ("DeviceID")')
+    op.execute('CREATE INDEX IF NOT EXISTS idx_device_timestamp ON gps_data ("DeviceID", "Timestamp")')
+    op.execute('DROP INDEX IF EXISTS idx_gps_lat_lon')
@@ -0,0 +1,39 @@
+"""Add partial indexes on active trips, drop redundant ix_trips_device_id
+
+Revision ID: 6b2d8e4f1a97
+Revises: a17f3c9e5b28
+Create Date: 2026-10-17 19:05:31.842260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d8e4f1a97'
+down_revision: Union[str, Sequence[str], None] = 'a17f3c9e5b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trips_active_device "
+        "ON trips (device_id) WHERE status = 'active'"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trips_active_start_time "
+        "ON trips (start_time DESC) WHERE status = 'active'"
+    )
+    # device_id solo es prefijo de idx_trips_device_status / _start_time / _type
+    op.execute('DROP INDEX IF EXISTS ix_trips_device_id')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('CREATE INDEX IF NOT EXISTS ix_trips_device_id ON trips (device_id)')
+    op.execute('DROP INDEX IF EXISTS idx_trips_active_start_time')
+    op.execute('DROP INDEX IF EXISTS idx_trips_active_device')
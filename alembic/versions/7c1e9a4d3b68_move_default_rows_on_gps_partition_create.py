@@ -0,0 +1,107 @@
+"""Move gps_data_default rows into a new monthly partition on creation
+
+Revision ID: 7c1e9a4d3b68
+Revises: 8d3b6f1e4a52
+Create Date: 2026-10-17 20:31:12.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9a4d3b68'
+down_revision: Union[str, Sequence[str], None] = '8d3b6f1e4a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Si gps_data_default ya tiene filas del mes, CREATE ... PARTITION OF falla
+    # ("updated partition constraint for default partition would be violated").
+    # En ese caso: DETACH del default, crear la partición, mover las filas del
+    # mes y volver a ATTACH. Toma un lock exclusivo sobre gps_data mientras dura.
+    # Las columnas generadas (geohash7) no admiten valores explícitos: se
+    # copian solo las columnas no generadas.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION gsms_create_gps_partition(p_month date)
+        RETURNS text
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            start_month date := date_trunc('month', p_month)::date;
+            range_start timestamptz := start_month::timestamptz;
+            range_end timestamptz := (start_month + interval '1 month')::timestamptz;
+            partition_name text := format('gps_data_%s', to_char(start_month, 'YYYY_MM'));
+            cols text;
+        BEGIN
+            IF to_regclass(quote_ident(partition_name)) IS NOT NULL THEN
+                RETURN partition_name;
+            END IF;
+
+            IF to_regclass('gps_data_default') IS NULL OR NOT EXISTS (
+                SELECT 1 FROM gps_data_default
+                WHERE "Timestamp" >= range_start AND "Timestamp" < range_end
+            ) THEN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF gps_data FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, range_start, range_end
+                );
+                RETURN partition_name;
+            END IF;
+
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO cols
+            FROM pg_attribute
+            WHERE attrelid = 'gps_data'::regclass
+              AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+            ALTER TABLE gps_data DETACH PARTITION gps_data_default;
+
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF gps_data FOR VALUES FROM (%L) TO (%L)',
+                partition_name, range_start, range_end
+            );
+            EXECUTE format(
+                'INSERT INTO %I (%s) SELECT %s FROM gps_data_default WHERE "Timestamp" >= $1 AND "Timestamp" < $2',
+                partition_name, cols, cols
+            ) USING range_start, range_end;
+            DELETE FROM gps_data_default
+            WHERE "Timestamp" >= range_start AND "Timestamp" < range_end;
+
+            ALTER TABLE gps_data ATTACH PARTITION gps_data_default DEFAULT;
+
+            RETURN partition_name;
+        END;
+        $$
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Versión original (d2b86f0e4a13)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION gsms_create_gps_partition(p_month date)
+        RETURNS text
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            start_month date := date_trunc('month', p_month)::date;
+            partition_name text := format('gps_data_%s', to_char(start_month, 'YYYY_MM'));
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF gps_data FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                start_month::timestamptz,
+                (start_month + interval '1 month')::timestamptz
+            );
+            RETURN partition_name;
+        END;
+        $$
+        """
+    )
@@ -0,0 +1,42 @@
+"""Add generated trip_range column and GiST index to trips
+
+Revision ID: 8d3b6f1e4a52
+Revises: 2e9f5c3a7d14
+Create Date: 2026-10-17 19:52:31.740615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3b6f1e4a52'
+down_revision: Union[str, Sequence[str], None] = '2e9f5c3a7d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # btree_gist: permite device_id (varchar) como columna de un índice GiST
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    # La expresión es la misma que TRIP_RANGE_SQL en src/Models/trip.py
+    op.execute(
+        """
+        ALTER TABLE trips
+        ADD COLUMN IF NOT EXISTS trip_range TSTZRANGE
+        GENERATED ALWAYS AS (tstzrange(start_time, COALESCE(end_time, 'infinity'::timestamptz), '[]')) STORED
+        """
+    )
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS idx_trips_device_range ON trips USING gist (device_id, trip_range)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # btree_gist se deja instalado (puede usarlo otro objeto)
+    op.execute('DROP INDEX IF EXISTS idx_trips_device_range')
+    op.execute('ALTER TABLE trips DROP COLUMN IF EXISTS trip_range')
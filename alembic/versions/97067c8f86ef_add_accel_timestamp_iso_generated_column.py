@@ -0,0 +1,49 @@
+"""Add accelerometer_data.Timestamp_iso generated column
+
+Revision ID: 97067c8f86ef
+Revises: 4f84e5c8808a
+Create Date: 2026-10-17 09:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '97067c8f86ef'
+down_revision: Union[str, Sequence[str], None] = '4f84e5c8808a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # to_char() is STABLE, and generated columns need an IMMUTABLE
+    # expression. The format has no locale-dependent fields and the zone
+    # is pinned to UTC, so the wrapper can safely be declared IMMUTABLE.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION gsms_utc_iso_seconds(ts timestamptz)
+        RETURNS text
+        LANGUAGE sql
+        IMMUTABLE PARALLEL SAFE
+        AS $$
+            SELECT to_char(ts AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"Z"')
+        $$
+        """
+    )
+    op.execute(
+        """
+        ALTER TABLE accelerometer_data
+        ADD COLUMN "Timestamp_iso" TEXT
+        GENERATED ALWAYS AS (gsms_utc_iso_seconds("Timestamp")) STORED
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('accelerometer_data', 'Timestamp_iso')
+    op.execute("DROP FUNCTION IF EXISTS gsms_utc_iso_seconds(timestamptz)")
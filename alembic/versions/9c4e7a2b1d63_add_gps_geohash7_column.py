@@ -0,0 +1,38 @@
+"""Add generated geohash7 column and index to gps_data
+
+Revision ID: 9c4e7a2b1d63
+Revises: 5e8b3a1d9f02
+Create Date: 2026-10-17 18:22:07.613904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e7a2b1d63'
+down_revision: Union[str, Sequence[str], None] = '5e8b3a1d9f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Columna generada STORED: reescribe gps_data (y sus particiones) una vez.
+    # La expresión es la misma que GPS_GEOHASH7_SQL en src/Models/gps_data.py
+    op.execute(
+        """
+        ALTER TABLE gps_data
+        ADD COLUMN IF NOT EXISTS "geohash7" VARCHAR(7)
+        GENERATED ALWAYS AS (ST_GeoHash(ST_SetSRID(ST_MakePoint("Longitude", "Latitude"), 4326), 7)) STORED
+        """
+    )
+    op.execute('CREATE INDEX IF NOT EXISTS idx_gps_geohash7 ON gps_data ("geohash7")')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP INDEX IF EXISTS idx_gps_geohash7')
+    op.execute('ALTER TABLE gps_data DROP COLUMN IF EXISTS "geohash7"')
@@ -0,0 +1,29 @@
+"""Drop idx_device_id_asc (served by idx_gps_device_id_covering)
+
+Revision ID: a17f3c9e5b28
+Revises: 9c4e7a2b1d63
+Create Date: 2026-10-17 18:41:52.307716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a17f3c9e5b28'
+down_revision: Union[str, Sequence[str], None] = '9c4e7a2b1d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (DeviceID, id DESC) se recorre en ambos sentidos: el ASC es redundante
+    op.execute('DROP INDEX IF EXISTS idx_device_id_asc')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('CREATE INDEX IF NOT EXISTS idx_device_id_asc ON gps_data ("DeviceID", id ASC)')
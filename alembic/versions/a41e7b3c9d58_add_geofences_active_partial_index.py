@@ -0,0 +1,33 @@
+"""Add partial index on active geofences
+
+Revision ID: a41e7b3c9d58
+Revises: 5d7c0e9a1f36
+Create Date: 2026-10-17 12:06:18.731045
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41e7b3c9d58'
+down_revision: Union[str, Sequence[str], None] = '5d7c0e9a1f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'idx_geofences_active',
+        'geofences',
+        ['id'],
+        postgresql_where=sa.text('is_active = true')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_geofences_active', table_name='geofences')
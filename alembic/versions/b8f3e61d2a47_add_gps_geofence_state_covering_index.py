@@ -0,0 +1,34 @@
+"""Add covering index for the last geofence state per device
+
+Revision ID: b8f3e61d2a47
+Revises: e5a2f04b7c19
+Create Date: 2026-10-17 10:48:13.902566
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f3e61d2a47'
+down_revision: Union[str, Sequence[str], None] = 'e5a2f04b7c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE INDEX idx_gps_device_ts_geofence
+        ON gps_data ("DeviceID", "Timestamp" DESC)
+        INCLUDE ("CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType")
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_gps_device_ts_geofence', table_name='gps_data')
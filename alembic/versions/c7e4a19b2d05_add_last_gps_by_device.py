@@ -0,0 +1,145 @@
+"""Add last_gps_by_device table maintained by trigger
+
+Revision ID: c7e4a19b2d05
+Revises: a41e7b3c9d58
+Create Date: 2026-10-17 13:02:44.118352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a19b2d05'
+down_revision: Union[str, Sequence[str], None] = 'a41e7b3c9d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'last_gps_by_device',
+        sa.Column('DeviceID', sa.String(length=100), nullable=False),
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('trip_id', sa.String(length=100), nullable=True),
+        sa.Column('Latitude', sa.Float(), nullable=False),
+        sa.Column('Longitude', sa.Float(), nullable=False),
+        sa.Column('Altitude', sa.Float(), nullable=False),
+        sa.Column('Accuracy', sa.Float(), nullable=False),
+        sa.Column('Timestamp', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('CurrentGeofenceID', sa.String(length=100), nullable=True),
+        sa.Column('CurrentGeofenceName', sa.String(length=200), nullable=True),
+        sa.Column('GeofenceEventType', sa.String(length=10), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('DeviceID')
+    )
+
+    # Recalcula la fila de un dispositivo desde gps_data (UPDATE/DELETE del último punto)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION gsms_refresh_last_gps(device_id varchar)
+        RETURNS void
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            DELETE FROM last_gps_by_device WHERE "DeviceID" = device_id;
+
+            INSERT INTO last_gps_by_device (
+                "DeviceID", id, trip_id, "Latitude", "Longitude", "Altitude", "Accuracy",
+                "Timestamp", "CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType"
+            )
+            SELECT "DeviceID", id, trip_id, "Latitude", "Longitude", "Altitude", "Accuracy",
+                   "Timestamp", "CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType"
+            FROM gps_data
+            WHERE "DeviceID" = device_id
+            ORDER BY id DESC
+            LIMIT 1;
+        END;
+        $$
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION gsms_upsert_last_gps()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO last_gps_by_device (
+                    "DeviceID", id, trip_id, "Latitude", "Longitude", "Altitude", "Accuracy",
+                    "Timestamp", "CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType"
+                )
+                VALUES (
+                    NEW."DeviceID", NEW.id, NEW.trip_id, NEW."Latitude", NEW."Longitude",
+                    NEW."Altitude", NEW."Accuracy", NEW."Timestamp", NEW."CurrentGeofenceID",
+                    NEW."CurrentGeofenceName", NEW."GeofenceEventType"
+                )
+                ON CONFLICT ("DeviceID") DO UPDATE SET
+                    id = EXCLUDED.id,
+                    trip_id = EXCLUDED.trip_id,
+                    "Latitude" = EXCLUDED."Latitude",
+                    "Longitude" = EXCLUDED."Longitude",
+                    "Altitude" = EXCLUDED."Altitude",
+                    "Accuracy" = EXCLUDED."Accuracy",
+                    "Timestamp" = EXCLUDED."Timestamp",
+                    "CurrentGeofenceID" = EXCLUDED."CurrentGeofenceID",
+                    "CurrentGeofenceName" = EXCLUDED."CurrentGeofenceName",
+                    "GeofenceEventType" = EXCLUDED."GeofenceEventType",
+                    updated_at = now()
+                WHERE EXCLUDED.id > last_gps_by_device.id;
+                RETURN NULL;
+            END IF;
+
+            -- UPDATE/DELETE: solo recalcular si se tocó el último punto del dispositivo
+            IF EXISTS (
+                SELECT 1 FROM last_gps_by_device
+                WHERE "DeviceID" = OLD."DeviceID" AND id = OLD.id
+            ) THEN
+                PERFORM gsms_refresh_last_gps(OLD."DeviceID");
+            END IF;
+
+            IF TG_OP = 'UPDATE' AND NEW."DeviceID" IS DISTINCT FROM OLD."DeviceID" THEN
+                PERFORM gsms_refresh_last_gps(NEW."DeviceID");
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TRIGGER trg_gps_data_last_gps
+        AFTER INSERT OR UPDATE OR DELETE ON gps_data
+        FOR EACH ROW EXECUTE FUNCTION gsms_upsert_last_gps()
+        """
+    )
+
+    # Semilla: último punto actual de cada dispositivo
+    op.execute(
+        """
+        INSERT INTO last_gps_by_device (
+            "DeviceID", id, trip_id, "Latitude", "Longitude", "Altitude", "Accuracy",
+            "Timestamp", "CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType"
+        )
+        SELECT DISTINCT ON ("DeviceID")
+               "DeviceID", id, trip_id, "Latitude", "Longitude", "Altitude", "Accuracy",
+               "Timestamp", "CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType"
+        FROM gps_data
+        ORDER BY "DeviceID", id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_gps_data_last_gps ON gps_data")
+    op.execute("DROP FUNCTION IF EXISTS gsms_upsert_last_gps()")
+    op.execute("DROP FUNCTION IF EXISTS gsms_refresh_last_gps(varchar)")
+    op.drop_table('last_gps_by_device')
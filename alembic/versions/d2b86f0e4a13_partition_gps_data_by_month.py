@@ -0,0 +1,162 @@
+"""Partition gps_data by month on Timestamp
+
+Revision ID: d2b86f0e4a13
+Revises: c7e4a19b2d05
+Create Date: 2026-10-17 13:41:09.562871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b86f0e4a13'
+down_revision: Union[str, Sequence[str], None] = 'c7e4a19b2d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Recrea gps_data a partir de gps_data_old conservando columnas, defaults
+# (secuencia del id), CHECKs, índices y FKs tal como existen en la base,
+# sin depender de que las migraciones anteriores describan todo el esquema.
+#   {create}: sentencia CREATE TABLE gps_data (...)
+#   {pkey}:   columnas de la PK nueva
+_SWAP_TABLE_SQL = """
+DO $$
+DECLARE
+    seq text := pg_get_serial_sequence('gps_data_old', 'id');
+    index_defs text[];
+    fk_defs text[];
+    def text;
+BEGIN
+    SELECT array_agg(indexdef) INTO index_defs
+    FROM pg_indexes
+    WHERE schemaname = current_schema()
+      AND tablename = 'gps_data_old'
+      AND indexname NOT IN (
+          SELECT conname FROM pg_constraint
+          WHERE conrelid = 'gps_data_old'::regclass AND contype = 'p'
+      );
+
+    SELECT array_agg(format('ALTER TABLE gps_data ADD CONSTRAINT %I %s', conname, pg_get_constraintdef(oid)))
+    INTO fk_defs
+    FROM pg_constraint
+    WHERE conrelid = 'gps_data_old'::regclass AND contype = 'f';
+
+    {create}
+
+    {partitions}
+
+    INSERT INTO gps_data SELECT * FROM gps_data_old;
+
+    -- La secuencia del id pertenece a la tabla vieja: soltarla antes del DROP
+    IF seq IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', seq);
+    END IF;
+
+    DROP TABLE gps_data_old;
+
+    IF seq IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY gps_data.id', seq);
+    END IF;
+
+    ALTER TABLE gps_data ADD CONSTRAINT gps_data_pkey PRIMARY KEY ({pkey});
+
+    FOREACH def IN ARRAY coalesce(index_defs, '{{}}') LOOP
+        EXECUTE regexp_replace(def, ' ON (ONLY )?(\\S+\\.)?gps_data_old ', ' ON \\2gps_data ');
+    END LOOP;
+
+    FOREACH def IN ARRAY coalesce(fk_defs, '{{}}') LOOP
+        EXECUTE def;
+    END LOOP;
+END
+$$;
+"""
+
+
+def _recreate_last_gps_trigger() -> None:
+    op.execute(
+        """
+        CREATE TRIGGER trg_gps_data_last_gps
+        AFTER INSERT OR UPDATE OR DELETE ON gps_data
+        FOR EACH ROW EXECUTE FUNCTION gsms_upsert_last_gps()
+        """
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Crea (si no existe) la partición mensual que contiene p_month
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION gsms_create_gps_partition(p_month date)
+        RETURNS text
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            start_month date := date_trunc('month', p_month)::date;
+            partition_name text := format('gps_data_%s', to_char(start_month, 'YYYY_MM'));
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF gps_data FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                start_month::timestamptz,
+                (start_month + interval '1 month')::timestamptz
+            );
+            RETURN partition_name;
+        END;
+        $$
+        """
+    )
+
+    op.execute("DROP TRIGGER IF EXISTS trg_gps_data_last_gps ON gps_data")
+    op.execute("ALTER TABLE gps_data RENAME TO gps_data_old")
+
+    op.execute(
+        _SWAP_TABLE_SQL.format(
+            create="""
+    CREATE TABLE gps_data (
+        LIKE gps_data_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+    ) PARTITION BY RANGE ("Timestamp");
+            """,
+            # Un mes por partición desde el dato más antiguo hasta dos meses
+            # adelante; lo que caiga fuera va a gps_data_default
+            partitions="""
+    PERFORM gsms_create_gps_partition(m::date)
+    FROM generate_series(
+        date_trunc('month', coalesce((SELECT min("Timestamp") FROM gps_data_old), now())),
+        date_trunc('month', now()) + interval '2 months',
+        interval '1 month'
+    ) AS m;
+
+    CREATE TABLE gps_data_default PARTITION OF gps_data DEFAULT;
+            """,
+            pkey='id, "Timestamp"'
+        )
+    )
+
+    _recreate_last_gps_trigger()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_gps_data_last_gps ON gps_data")
+    op.execute("ALTER TABLE gps_data RENAME TO gps_data_old")
+
+    # DROP TABLE del padre particionado elimina también sus particiones
+    op.execute(
+        _SWAP_TABLE_SQL.format(
+            create="""
+    CREATE TABLE gps_data (
+        LIKE gps_data_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+    );
+            """,
+            partitions="",
+            pkey='id'
+        )
+    )
+
+    _recreate_last_gps_trigger()
+    op.execute("DROP FUNCTION IF EXISTS gsms_create_gps_partition(date)")
@@ -0,0 +1,57 @@
+"""Add accelerometer_data.trip_id
+
+Revision ID: e5a2f04b7c19
+Revises: 3c1d9a7e5b20
+Create Date: 2026-10-17 10:05:27.640912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a2f04b7c19'
+down_revision: Union[str, Sequence[str], None] = '3c1d9a7e5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'accelerometer_data',
+        sa.Column('trip_id', sa.String(length=100), nullable=True)
+    )
+
+    # Backfill from the GPS point sharing (DeviceID, Timestamp)
+    op.execute(
+        """
+        UPDATE accelerometer_data a
+        SET trip_id = g.trip_id
+        FROM gps_data g
+        WHERE a."DeviceID" = g."DeviceID"
+          AND a."Timestamp" = g."Timestamp"
+          AND g.trip_id IS NOT NULL
+        """
+    )
+
+    op.create_foreign_key(
+        'fk_accel_data_trip_id',
+        'accelerometer_data', 'trips',
+        ['trip_id'], ['trip_id'],
+        ondelete='SET NULL'
+    )
+    op.create_index(
+        'idx_accel_trip_timestamp',
+        'accelerometer_data',
+        ['trip_id', 'Timestamp']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_accel_trip_timestamp', table_name='accelerometer_data')
+    op.drop_constraint('fk_accel_data_trip_id', 'accelerometer_data', type_='foreignkey')
+    op.drop_column('accelerometer_data', 'trip_id')
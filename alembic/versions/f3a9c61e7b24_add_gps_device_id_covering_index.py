@@ -0,0 +1,39 @@
+"""Replace idx_device_id_desc with a covering (DeviceID, id DESC) index
+
+Revision ID: f3a9c61e7b24
+Revises: d2b86f0e4a13
+Create Date: 2026-10-17 16:21:07.530418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c61e7b24'
+down_revision: Union[str, Sequence[str], None] = 'd2b86f0e4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Mismas claves que idx_device_id_desc + columnas de get_last_gps_row_by_device:
+    # el "último GPS por device" pasa a ser un index-only scan (sin heap fetches)
+    op.execute(
+        """
+        CREATE INDEX idx_gps_device_id_covering
+        ON gps_data ("DeviceID", id DESC)
+        INCLUDE ("Latitude", "Longitude", "Altitude", "Accuracy", "Timestamp",
+                 "CurrentGeofenceID", "CurrentGeofenceName", "GeofenceEventType")
+        """
+    )
+    op.drop_index('idx_device_id_desc', table_name='gps_data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('idx_device_id_desc', 'gps_data', ['DeviceID', sa.text('id DESC')], unique=False)
+    op.drop_index('idx_gps_device_id_covering', table_name='gps_data')
@@ -1,13 +1,19 @@
 # src/Controller/Routes/gps_datas.py
-from datetime import datetime
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from src.Controller.deps import get_DB
+from typing import Iterator, List, Optional
+import orjson
+from src.Controller.deps import get_DB, get_read_DB
+from src.DB.session import SessionLocal
 from src.Repositories import gps_data as gps_data_repo
 from src.Schemas import gps_data as gps_data_schema
+from src.Services.gps_serialization import format_utc_iso
+from src.Services import request_handlers
 
-router = APIRouter()
+# ORJSONResponse: datetimes/floats se serializan en C
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # ==========================================================
 # ✅ SPECIAL GET ROUTES (Specific routes - PRIORITY ORDER)
@@ -19,7 +25,7 @@ router = APIRouter()
 # ==========================================================
 
 @router.get("/devices", response_model=dict)
-def get_all_devices(DB: Session = Depends(get_DB)):
+def get_all_devices(DB: Session = Depends(get_read_DB)):
     """
     Get a list of all unique DeviceIDs that have reported GPS data.
     
@@ -45,7 +51,7 @@ def get_all_devices(DB: Session = Depends(get_DB)):
 @router.get("/last", response_model=gps_data_schema.GpsData_get)
 def get_last_gps_row(
     device_id: str = Query(..., description="Device ID (required)"),
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get the most recent GPS record for a specific device.
@@ -62,7 +68,10 @@ def get_last_gps_row(
     Raises:
         404: No GPS data found for the specified device
     """
-    last_row = gps_data_repo.get_last_gps_row_by_device(DB, device_id, include_id=True)
+    # Sesión de réplica: leer del caché sí, pero no llenarlo con una fila atrasada
+    last_row = gps_data_repo.get_last_gps_row_by_device(
+        DB, device_id, include_id=True, fill_cache=False
+    )
     
     if last_row is None:
         raise HTTPException(
@@ -76,7 +85,7 @@ def get_last_gps_row(
 @router.get("/oldest", response_model=gps_data_schema.GpsData_get)
 def get_oldest_gps_row(
     device_id: str = Query(..., description="Device ID (required)"),
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get the oldest GPS record for a specific device (starting point of route history).
@@ -109,7 +118,7 @@ def get_gps_data_range(
     start: datetime = Query(..., description="Start timestamp in ISO-8601 UTC"),
     end: datetime = Query(..., description="End timestamp in ISO-8601 UTC"),
     device_id: str = Query(None, description="Optional: Filter by specific device"),
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get GPS data within a time range.
@@ -120,15 +129,15 @@ def get_gps_data_range(
     
     Args:
         start: Start of time range (inclusive, UTC)
-        end: End of time range (inclusive, UTC)
+        end: End of time range (exclusive, UTC)
         device_id: Optional device identifier to filter by
         
     Returns:
         List of GPS records ordered chronologically
         
     Examples:
-        GET /gps_data/range?start=2025-10-11T00:00:00Z&end=2025-10-12T23:59:59Z&device_id=TRUCK-001
-        GET /gps_data/range?start=2025-10-11T00:00:00Z&end=2025-10-12T23:59:59Z
+        GET /gps_data/range?start=2025-10-11T00:00:00Z&end=2025-10-13T00:00:00Z&device_id=TRUCK-001
+        GET /gps_data/range?start=2025-10-11T00:00:00Z&end=2025-10-13T00:00:00Z
     
     Raises:
         404: No GPS data found in range
@@ -175,7 +184,7 @@ def get_gps_data_range(
 
 @router.get("/positions/latest", response_model=dict)
 def get_latest_positions(
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get the most recent GPS position for all active devices.
@@ -218,8 +227,6 @@ def get_latest_positions(
     - 200: Success (positions returned)
     - 500: Database error
     """
-    from datetime import datetime, timezone
-    
     try:
         # Query DB for latest positions (reuses existing repository function)
         positions = gps_data_repo.get_last_gps_all_devices(DB, include_id=False)
@@ -243,7 +250,7 @@ def get_latest_positions(
 @router.get("/timestamps/range", response_model=dict)
 def get_timestamp_range(
     device_id: Optional[str] = Query(None, description="Optional device filter (if not provided, returns global range)"),
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get the available timestamp range (oldest and newest GPS data).
@@ -281,34 +288,30 @@ def get_timestamp_range(
     """
     try:
         if device_id:
-            # Device-specific range
-            oldest = gps_data_repo.get_oldest_gps_row_by_device(DB, device_id)
-            newest = gps_data_repo.get_last_gps_row_by_device(DB, device_id)
+            # Device-specific range (MIN/MAX en un solo query)
+            oldest_dt, newest_dt = gps_data_repo.get_device_gps_timespan(DB, device_id)
             
-            if not oldest or not newest:
+            if oldest_dt is None or newest_dt is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"No GPS data found for device '{device_id}'"
                 )
         else:
             # Global range (all active devices)
-            oldest = gps_data_repo.get_global_oldest_gps(DB)
-            newest = gps_data_repo.get_global_newest_gps(DB)
+            oldest_dt, newest_dt = gps_data_repo.get_global_gps_timespan(DB)
             
-            if not oldest or not newest:
+            if oldest_dt is None or newest_dt is None:
                 raise HTTPException(
                     status_code=404,
                     detail="No GPS data available in the system"
                 )
         
         # Calculate span
-        oldest_dt = datetime.fromisoformat(oldest["Timestamp"].replace("Z", "+00:00"))
-        newest_dt = datetime.fromisoformat(newest["Timestamp"].replace("Z", "+00:00"))
         span_seconds = int((newest_dt - oldest_dt).total_seconds())
         
         return {
-            "oldest_timestamp": oldest["Timestamp"],
-            "newest_timestamp": newest["Timestamp"],
+            "oldest_timestamp": format_utc_iso(oldest_dt),
+            "newest_timestamp": format_utc_iso(newest_dt),
             "device_id": device_id,
             "span_seconds": span_seconds
         }
@@ -328,7 +331,7 @@ def get_gps_history(
     end: str = Query(..., description="End timestamp in ISO 8601 format (UTC), e.g., '2025-01-12T10:00:00Z'"),
     device_id: Optional[str] = Query(None, description="Optional device filter (if not provided, returns all devices)"),
     format: str = Query("polyline", regex="^(polyline|raw)$", description="Response format: 'polyline' (default) or 'raw'"),
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get historical GPS data within a time range.
@@ -343,7 +346,7 @@ def get_gps_history(
     
     **Parameters**:
     - `start`: Start of time range (inclusive, UTC)
-    - `end`: End of time range (inclusive, UTC)
+    - `end`: End of time range (exclusive, UTC)
     - `device_id`: Optional filter (if omitted, returns all devices)
     - `format`: Response format
         - `polyline` (default): Optimized for map display (lat/lon only)
@@ -475,7 +478,7 @@ def get_trips_data(
     # Device filter
     device_id: Optional[str] = Query(None, description="Optional device filter"),
     
-    DB: Session = Depends(get_DB)
+    DB: Session = Depends(get_read_DB)
 ):
     """
     Get trips with optional temporal/spatial filters.
@@ -555,8 +558,6 @@ def get_trips_data(
     - Near warehouse: `GET /gps_data/trips?center_lat=10.9878&center_lon=-74.7889&radius_meters=500`
     - Device trips: `GET /gps_data/trips?start=...&end=...&device_id=DEVICE_001`
     """
-    from src.Services import request_handlers
-    
     try:
         # Build params dict (same format as WebSocket handler for reusability)
         params = {}
@@ -614,6 +615,32 @@ def get_trips_data(
         )
 
 
+@router.get("/export/ndjson")
+def export_gps_ndjson(
+    device_id: str = Query(..., description="Device to export"),
+    start: Optional[datetime] = Query(None, description="Optional start timestamp (ISO-8601 UTC, inclusive)"),
+    end: Optional[datetime] = Query(None, description="Optional end timestamp (ISO-8601 UTC, exclusive)")
+):
+    """
+    Stream a device's GPS history as NDJSON (one JSON object per line).
+    
+    Rows are read with a server-side cursor and written as they arrive,
+    so memory stays bounded regardless of history size.
+    
+    The session is opened inside the generator (not via Depends): the
+    dependency would be closed before the response body is streamed.
+    
+    Example:
+        GET /gps_data/export/ndjson?device_id=TRUCK-001&start=2025-01-01T00:00:00Z
+    """
+    def ndjson_lines() -> Iterator[bytes]:
+        with SessionLocal() as db:
+            for point in gps_data_repo.iter_gps_for_device(db, device_id, start, end):
+                yield orjson.dumps(point) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 # ==========================================================
 # ✅ STANDARD CRUD ROUTES (Variable path parameters - LAST)
 # ==========================================================
@@ -625,7 +652,7 @@ def get_trips_data(
 # ==========================================================
 
 @router.get("/{gps_data_id}", response_model=gps_data_schema.GpsData_get)
-def read_gps_data_by_id(gps_data_id: int, DB: Session = Depends(get_DB)):
+def read_gps_data_by_id(gps_data_id: int, DB: Session = Depends(get_read_DB)):
     """
     Get a specific GPS record by its internal database ID.
     
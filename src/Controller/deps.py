@@ -1,7 +1,7 @@
 #src/Controller/deps.py
 
 from typing import Generator
-from src.DB.session import SessionLocal
+from src.DB.session import SessionLocal, ReadSessionLocal
 
 def get_DB() -> Generator:
     DB = SessionLocal()
@@ -9,3 +9,12 @@ def get_DB() -> Generator:
         yield DB
     finally:
         DB.close()
+
+
+def get_read_DB() -> Generator:
+    """Read-only session (AUTOCOMMIT) for GET endpoints; do not write through it."""
+    DB = ReadSessionLocal()
+    try:
+        yield DB
+    finally:
+        DB.close()
@@ -37,6 +37,7 @@ Models Registered:
 - Geofence: Geographic boundary definitions for alerts and monitoring
 - AccelerometerData: Accelerometer sensor data for motion analysis
 - Trip: Journey records with start/end points and statistics
+- LastGpsByDevice: Latest GPS point per device (maintained by trigger)
 
 Important:
 ----------
@@ -58,4 +59,5 @@ from src.Models.gps_data import GPS_data
 from src.Models.device import Device  
 from src.Models.geofence import Geofence  
 from src.Models.accelerometer_data import AccelerometerData
-from src.Models.trip import Trip
\ No newline at end of file
+from src.Models.trip import Trip
+from src.Models.last_gps_by_device import LastGpsByDevice
@@ -12,6 +12,8 @@ Architecture:
 ------------
 - Engine: Manages the database connection pool and dialect
 - SessionLocal: Factory for creating database sessions
+- ReadSessionLocal: Factory for read-only sessions in AUTOCOMMIT mode
+- prewarm_pool(): Opens pooled connections at startup
 - Configuration: Sourced from centralized settings module
 
 Usage Example:
@@ -40,6 +42,14 @@ Session Configuration:
 - autoflush=False: Changes are not automatically flushed to database before queries
 - bind=engine: Sessions are bound to the configured database engine
 
+Read-only Sessions:
+------------------
+ReadSessionLocal shares the engine's pool but runs in AUTOCOMMIT isolation,
+so pure reads (GET endpoints, trip queries) don't open a BEGIN/ROLLBACK pair
+per request. Each statement sees its own snapshot; never write through it.
+If DATABASE_READ_URL is set, ReadSessionLocal is bound to that replica
+instead (reads may lag the primary by the replication delay).
+
 Note:
     The DATABASE_URL is retrieved from environment variables via the settings
     module, ensuring secure configuration management and environment-specific
@@ -56,7 +66,15 @@ from src.Core.config import settings
 # ============================================================
 # Create SQLAlchemy engine with connection pooling and dialect configuration
 # The engine manages the database connection pool and handles low-level DBAPI interactions
-engine = create_engine(settings.DATABASE_URL)
+# Pool sized for concurrent HTTP workers + UDP ingest (see DB_POOL_* settings)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_S,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE
+)
 
 
 # ============================================================
@@ -68,4 +86,56 @@ SessionLocal = sessionmaker(
     autocommit=False,  # Require explicit commit() for transaction control
     autoflush=False,   # Disable automatic flushing before queries for better control
     bind=engine        # Bind sessions to the configured database engine
-)
\ No newline at end of file
+)
+
+
+# ============================================================
+# READ-ONLY SESSION FACTORY
+# ============================================================
+# AUTOCOMMIT isolation: no BEGIN/ROLLBACK round trips for pure reads.
+# With DATABASE_READ_URL the reads go to a streaming replica (own pool);
+# otherwise they share the primary's pool (the isolation level is reset
+# when the connection returns to the pool, so SessionLocal is unaffected).
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE_S,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        isolation_level="AUTOCOMMIT"
+    )
+else:
+    read_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine
+)
+
+
+# ============================================================
+# POOL PRE-WARM
+# ============================================================
+def prewarm_pool(connections: int) -> int:
+    """
+    Open up to `connections` pooled connections ahead of time.
+    
+    The pool is lazy: without this, the first UDP packets and HTTP requests
+    after startup each pay a TCP + auth handshake. The connections are
+    checked out together (so the pool really holds that many) and returned
+    idle. Capped at DB_POOL_SIZE (overflow connections are closed on return).
+    
+    Returns:
+        int: Connections opened
+    """
+    opened = []
+    try:
+        for _ in range(min(connections, settings.DB_POOL_SIZE)):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
@@ -1,6 +1,6 @@
 # src/Models/accelerometer_data.py
 
-from sqlalchemy import Column, BigInteger, String, Float, Integer, SmallInteger, DateTime, Index
+from sqlalchemy import Column, BigInteger, String, Float, Integer, SmallInteger, DateTime, Index, Text, Computed, ForeignKeyConstraint
 from sqlalchemy.orm import declared_attr
 from src.DB.base_class import Base
 
@@ -9,7 +9,8 @@ class AccelerometerData(Base):
     """
     SQLAlchemy model for storing accelerometer statistics data.
     
-    Linked to GPS data via composite key (DeviceID + Timestamp).
+    Linked to GPS data via composite key (DeviceID + Timestamp), with the
+    GPS trip_id copied at insert time so a trip's windows need no JOIN.
     Contains 5-second window statistics from vehicle motion sensors.
     """
 
@@ -34,6 +35,20 @@ class AccelerometerData(Base):
         doc="GPS timestamp (matches gps_data.Timestamp)"
     )
 
+    # Precomputed UTC ISO string (generated by PostgreSQL at INSERT)
+    Timestamp_iso = Column(
+        Text,
+        Computed('gsms_utc_iso_seconds("Timestamp")', persisted=True),
+        doc="Timestamp formatted as 'YYYY-MM-DDTHH:MM:SSZ' (same key as GPS JSON)"
+    )
+
+    # Trip link (denormalized from gps_data at insert time)
+    trip_id = Column(
+        String(100),
+        nullable=True,  # NULL for legacy data / points outside a trip
+        doc="ID of the trip this window belongs to (matches gps_data.trip_id)"
+    )
+
     # Accelerometer window timestamps
     ts_start = Column(
         DateTime(timezone=True),
@@ -96,6 +111,12 @@ class AccelerometerData(Base):
             Timestamp
         ),
         
+        # Timestamp-only index (global range scans, see get_accel_in_range_batched)
+        Index(
+            'idx_accel_timestamp',
+            Timestamp
+        ),
+        
         # Descending index (for latest data queries)
         Index(
             'idx_accel_device_id_desc',
@@ -103,6 +124,13 @@ class AccelerometerData(Base):
             id.desc()
         ),
         
+        # Trip lookup (get_accel_map_for_trip)
+        Index(
+            'idx_accel_trip_timestamp',
+            trip_id,
+            Timestamp
+        ),
+        
         # Analytical indexes (partial - only high values)
         Index(
             'idx_accel_rms_mag_high',
@@ -115,6 +143,14 @@ class AccelerometerData(Base):
             max_mag,
             postgresql_where=(max_mag > 2.0)
         ),
+        
+        # Foreign key to trips (same behaviour as gps_data)
+        ForeignKeyConstraint(
+            ['trip_id'],
+            ['trips.trip_id'],
+            name='fk_accel_data_trip_id',
+            ondelete='SET NULL'
+        ),
     )
 
     def __repr__(self) -> str:
@@ -1,6 +1,6 @@
 # src/Models/geofence.py
 
-from sqlalchemy import Column, String, Text, Boolean, DateTime, func
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Index, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declared_attr
 from geoalchemy2 import Geography
@@ -25,8 +25,10 @@ class Geofence(Base):
     
     # Campo espacial: almacena POLYGON en formato GEOGRAPHY (coordenadas esféricas)
     # SRID 4326 = WGS84 (latitud/longitud estándar GPS)
+    # Índice espacial: SP-GiST (declarado abajo) en vez del GiST automático
+    # de GeoAlchemy; mejor para consultas punto-en-polígono.
     geometry = Column(
-        Geography('POLYGON', srid=4326), 
+        Geography('POLYGON', srid=4326, spatial_index=False), 
         nullable=False
     )
     
@@ -38,5 +40,13 @@ class Geofence(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # SP-GiST espacial (PostGIS >= 3.0, PostgreSQL >= 11)
+        Index('idx_geofences_geometry_spgist', geometry, postgresql_using='spgist'),
+        
+        # Parcial: solo geocercas activas (get_all_geofences, índice espacial en memoria)
+        Index('idx_geofences_active', id, postgresql_where=(is_active == True)),
+    )
+    
     def __repr__(self):
         return f"<Geofence(id={self.id!r}, name={self.name!r})>"
\ No newline at end of file
@@ -2,10 +2,19 @@
 from sqlalchemy.orm import declared_attr
 from sqlalchemy import (
     Column, BigInteger, String, Float, DateTime,
-    CheckConstraint, func, Index, ForeignKeyConstraint
+    CheckConstraint, func, Index, ForeignKeyConstraint, text, Computed
 )
 from src.DB.base_class import Base
 
+# Posición como geography (metros). Debe coincidir textualmente con la
+# expresión del índice idx_gps_geography para que PostgreSQL lo use.
+GPS_GEOGRAPHY_SQL = 'CAST(ST_SetSRID(ST_MakePoint("Longitude", "Latitude"), 4326) AS geography)'
+
+# Celda geohash de 7 caracteres (~150 m) de la posición; misma codificación
+# que src.Services.geohash.encode(lat, lon, 7)
+GPS_GEOHASH_PRECISION = 7
+GPS_GEOHASH7_SQL = 'ST_GeoHash(ST_SetSRID(ST_MakePoint("Longitude", "Latitude"), 4326), 7)'
+
 
 class GPS_data(Base):
     """
@@ -20,13 +29,16 @@ class GPS_data(Base):
         return "gps_data"
 
     # Primary key
+    # La tabla está particionada por mes sobre Timestamp (ver migración
+    # d2b86f0e4a13): la PK física es (id, Timestamp) porque debe incluir la
+    # clave de partición; el mapper sigue identificando filas solo por id.
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
     # NUEVO: Device identifier
     DeviceID = Column(
         String(100),
         nullable=False,
-        index=True,  # Índice simple
+        # Sin índice simple: prefijo de unique_device_timestamp
         doc="Unique identifier of the GPS device"
     )
 
@@ -36,7 +48,6 @@ class GPS_data(Base):
     trip_id = Column(
         String(100),
         nullable=True,  # NULL for legacy data (pre-trip implementation)
-        index=True,
         doc="ID of the trip this GPS point belongs to (NULL for historical data)"
     )
 
@@ -46,9 +57,17 @@ class GPS_data(Base):
     Altitude = Column(Float, nullable=False)
     Accuracy = Column(Float, nullable=False)
 
+    # Generada por PostgreSQL al insertar: prefiltro por celdas en bbox
+    geohash7 = Column(
+        String(GPS_GEOHASH_PRECISION),
+        Computed(GPS_GEOHASH7_SQL, persisted=True),
+        doc="Geohash (7 chars) of the position, computed by the database"
+    )
+
     # Timestamp stored as timezone-aware DateTime (UTC)
     Timestamp = Column(
         DateTime(timezone=True),
+        primary_key=True,  # Clave de partición (PK compuesta id, Timestamp)
         nullable=False
     )
 
@@ -75,17 +94,40 @@ class GPS_data(Base):
     # Composite indexes for efficient multi-device queries
     __table_args__ = (
         # Existing indexes
-        Index('idx_device_id_desc', DeviceID, id.desc()),
-        Index('idx_device_id_asc', DeviceID, id.asc()),
-        Index('idx_device_timestamp', DeviceID, Timestamp),
+        # Covering index: último GPS por device (index-only scan); el más
+        # antiguo (ORDER BY id ASC) lo recorre hacia atrás
+        Index(
+            'idx_gps_device_id_covering',
+            DeviceID,
+            id.desc(),
+            postgresql_include=[
+                'Latitude', 'Longitude', 'Altitude', 'Accuracy', 'Timestamp',
+                'CurrentGeofenceID', 'CurrentGeofenceName', 'GeofenceEventType'
+            ]
+        ),
         Index('idx_device_geofence', DeviceID, CurrentGeofenceID),
         Index('idx_geofence_timestamp', CurrentGeofenceID, Timestamp),
+        # (DeviceID, Timestamp): dedup + rangos por device ordenados por Timestamp
         Index('unique_device_timestamp', DeviceID, Timestamp, unique=True),
+        # Covering index: last geofence state per device (index-only scan)
+        Index(
+            'idx_gps_device_ts_geofence',
+            DeviceID,
+            Timestamp.desc(),
+            postgresql_include=['CurrentGeofenceID', 'CurrentGeofenceName', 'GeofenceEventType']
+        ),
+
+        # Prefiltro bounding box (Latitude/Longitude)
+        Index('idx_gps_lat_lon', Latitude, Longitude),
+        # GiST sobre la posición (ST_DWithin en búsquedas por radio)
+        Index('idx_gps_geography', text(GPS_GEOGRAPHY_SQL), postgresql_using='gist'),
+        # Celdas geohash que cubren un bbox (geohash7 IN (...))
+        Index('idx_gps_geohash7', geohash7),
 
         # ========================================
         # NUEVOS: Trip-related indexes
         # ========================================
-        Index('idx_gps_trip_id', 'trip_id'),
+        # (trip_id, Timestamp) también sirve los filtros solo por trip_id
         Index('idx_gps_trip_timestamp', 'trip_id', Timestamp.asc()),
 
         # ========================================
@@ -103,8 +145,14 @@ class GPS_data(Base):
             '"GeofenceEventType" IN (\'entry\', \'exit\', \'inside\')',
             name='check_geofence_event_type'
         ),
+
+        # Particiones mensuales gps_data_YYYY_MM + gps_data_default
+        {'postgresql_partition_by': 'RANGE ("Timestamp")'},
     )
 
+    # id sigue siendo único (secuencia): identidad ORM solo por id
+    __mapper_args__ = {'primary_key': [id]}
+
     # Optional: for debugging and clean logging
     def __repr__(self) -> str:
         return (
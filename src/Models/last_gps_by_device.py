@@ -0,0 +1,52 @@
+# src/Models/last_gps_by_device.py
+from sqlalchemy.orm import declared_attr
+from sqlalchemy import Column, BigInteger, String, Float, DateTime
+from sqlalchemy.sql import func
+from src.DB.base_class import Base
+
+
+class LastGpsByDevice(Base):
+    """
+    SQLAlchemy model for the latest GPS point of each device.
+
+    One row per DeviceID, kept up to date by the PostgreSQL trigger
+    gsms_upsert_last_gps on gps_data (see migration c7e4a19b2d05), so
+    "latest position of every device" reads O(devices) rows instead of
+    aggregating over the whole gps_data table.
+
+    Same columns as gps_data (id is the gps_data id of that point), so
+    rows can be serialized with serialize_gps_row. Read-only from the
+    application: never write to it directly.
+    """
+
+    @declared_attr.directive
+    def __tablename__(cls) -> str:
+        return "last_gps_by_device"
+
+    DeviceID = Column(String(100), primary_key=True)
+
+    # gps_data.id of the latest point
+    id = Column(BigInteger, nullable=False)
+
+    trip_id = Column(String(100), nullable=True)
+
+    Latitude = Column(Float, nullable=False)
+    Longitude = Column(Float, nullable=False)
+    Altitude = Column(Float, nullable=False)
+    Accuracy = Column(Float, nullable=False)
+
+    Timestamp = Column(DateTime(timezone=True), nullable=False)
+
+    CurrentGeofenceID = Column(String(100), nullable=True)
+    CurrentGeofenceName = Column(String(200), nullable=True)
+    GeofenceEventType = Column(String(10), nullable=True)
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        doc="When the trigger last wrote this row."
+    )
+
+    def __repr__(self) -> str:
+        return f"<LastGpsByDevice(DeviceID={self.DeviceID!r}, id={self.id}, Timestamp={self.Timestamp})>"
@@ -1,9 +1,15 @@
 # src/Models/trip.py
-from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, CheckConstraint, Index
+from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, CheckConstraint, Index, Computed
+from sqlalchemy.dialects.postgresql import TSTZRANGE
 from sqlalchemy.sql import func
 from sqlalchemy.orm import declared_attr
 from src.DB.base_class import Base
 
+# Intervalo cerrado [start_time, end_time] del trip; los activos (end_time NULL)
+# quedan abiertos hasta 'infinity'. Cerrado por ambos lados para que un trip de
+# duración cero no sea un rango vacío (que no solapa con nada).
+TRIP_RANGE_SQL = "tstzrange(start_time, COALESCE(end_time, 'infinity'::timestamptz), '[]')"
+
 
 class Trip(Base):
     """
@@ -40,7 +46,7 @@ class Trip(Base):
         String(100),
         ForeignKey('devices.DeviceID', ondelete='CASCADE'),
         nullable=False,
-        index=True,
+        # Sin índice simple: prefijo de los índices compuestos por device
         doc="Device that generated this trip"
     )
     
@@ -75,6 +81,13 @@ class Trip(Base):
         doc="UTC timestamp of last GPS point (NULL if trip is active)"
     )
     
+    # Generada por PostgreSQL: consultas de solapamiento (&&) con índice GiST
+    trip_range = Column(
+        TSTZRANGE,
+        Computed(TRIP_RANGE_SQL, persisted=True),
+        doc="Time span of the trip as tstzrange (open-ended while active), computed by the database"
+    )
+    
     # ========================================
     # SPATIAL BOUNDS (Start Location)
     # ========================================
@@ -145,6 +158,24 @@ class Trip(Base):
         Index('idx_trips_device_status', 'device_id', 'status'),
         Index('idx_trips_device_start_time', 'device_id', 'start_time'),
         Index('idx_trips_device_type', 'device_id', 'trip_type'),
+        # (device_id, start_time) también sirve ORDER BY start_time DESC
+        # (recorrido hacia atrás), no hace falta una versión DESC
+        
+        # Parciales sobre trips activos (a lo sumo uno por device):
+        # get_active_trip_by_device / get_all_active_trips
+        Index('idx_trips_active_device', device_id, postgresql_where=(status == 'active')),
+        Index('idx_trips_active_start_time', start_time.desc(), postgresql_where=(status == 'active')),
+        # GiST (device_id, trip_range): get_trips_in_time_range (requiere btree_gist)
+        Index('idx_trips_device_range', device_id, trip_range, postgresql_using='gist'),
+        # Covering parcial sobre trips cerrados: get_trip_statistics_by_device
+        # (index-only scan, sin leer el heap)
+        Index(
+            'idx_trips_closed_stats',
+            device_id,
+            start_time,
+            postgresql_include=['trip_type', 'distance', 'duration', 'avg_speed'],
+            postgresql_where=(status == 'closed')
+        ),
         
         # Validation constraints
         CheckConstraint(
@@ -1,24 +1,74 @@
 # src/Repositories/accelerometer_data.py
 
+from sqlalchemy import select, exists, bindparam, func, update, delete
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import orjson
 from src.Models.accelerometer_data import AccelerometerData
 from src.Schemas.accelerometer_data import AccelData_create, AccelData_update
-from src.Models.gps_data import GPS_data
-from typing import List, Optional, Any
-from datetime import datetime
+from typing import List, Optional, Any, Iterator
+from datetime import datetime, timedelta
+
+
+# ==========================================================
+# STATEMENTS PRECOMPILADOS
+# ==========================================================
+# Construidos una sola vez al importar el módulo: SQLAlchemy reutiliza
+# la compilación cacheada en cada llamada (solo cambian los parámetros).
+
+_BY_DEVICE_TIMESTAMP_STMT = (
+    select(AccelerometerData)
+    .where(
+        AccelerometerData.DeviceID == bindparam("device_id"),
+        AccelerometerData.Timestamp == bindparam("timestamp")
+    )
+    .limit(1)
+)
+
+_DEDUP_STMT = (
+    select(AccelerometerData.id)
+    .where(
+        AccelerometerData.DeviceID == bindparam("device_id"),
+        AccelerometerData.Timestamp == bindparam("timestamp")
+    )
+    .limit(1)
+)
+
+# Columnas del mapa por trip (get_accel_map_for_trip / _json)
+_TRIP_MAP_COLUMNS = (
+    AccelerometerData.Timestamp_iso,
+    AccelerometerData.rms_x,
+    AccelerometerData.rms_y,
+    AccelerometerData.rms_z,
+    AccelerometerData.rms_mag,
+    AccelerometerData.max_x,
+    AccelerometerData.max_y,
+    AccelerometerData.max_z,
+    AccelerometerData.max_mag,
+    AccelerometerData.peaks_count,
+    AccelerometerData.sample_count,
+    AccelerometerData.flags,
+)
 
 
 # ==========================================================
 # CRUD BÁSICO
 # ==========================================================
 
-def create_accel_data(db: Session, accel_data: AccelData_create) -> AccelerometerData:
+def create_accel_data(
+    db: Session,
+    accel_data: AccelData_create,
+    commit: bool = True,
+    refresh: bool = False
+) -> AccelerometerData:
     """
     Crea un nuevo registro de acelerómetro.
     
     Args:
         db: Session SQLAlchemy
         accel_data: Schema validado
+        commit: False solo hace flush (queda en la transacción del caller)
+        refresh: Recargar la fila tras el commit (SELECT extra; por defecto no)
         
     Returns:
         AccelerometerData: Registro insertado
@@ -28,14 +78,43 @@ def create_accel_data(db: Session, accel_data: AccelData_create) -> Acceleromete
     """
     new_accel = AccelerometerData(**accel_data.model_dump(exclude_unset=True))
     db.add(new_accel)
+    if not commit:
+        # flush: el INSERT (y un IntegrityError) ocurre ya, sin commit
+        db.flush()
+        return new_accel
     db.commit()
-    db.refresh(new_accel)
+    if refresh:
+        db.refresh(new_accel)
     return new_accel
 
 
+def create_accel_data_bulk(db: Session, batch: List[AccelData_create]) -> int:
+    """
+    Inserta varios registros de acelerómetro con un solo INSERT multi-fila.
+    
+    Duplicados (DeviceID, Timestamp) se ignoran con ON CONFLICT DO NOTHING
+    sobre unique_device_timestamp_accel.
+    
+    Returns:
+        int: Registros realmente insertados
+    """
+    if not batch:
+        return 0
+    
+    rows = [a.model_dump() for a in batch]
+    stmt = (
+        pg_insert(AccelerometerData)
+        .on_conflict_do_nothing(index_elements=['DeviceID', 'Timestamp'])
+        .returning(AccelerometerData.id)
+    )
+    inserted = len(db.execute(stmt, rows).scalars().all())
+    db.commit()
+    return inserted
+
+
 def get_accel_by_id(db: Session, accel_id: int) -> Optional[AccelerometerData]:
     """Obtiene un registro por su ID interno."""
-    return db.query(AccelerometerData).filter(AccelerometerData.id == accel_id).first()
+    return db.get(AccelerometerData, accel_id)
 
 
 def update_accel_data(
@@ -49,18 +128,34 @@ def update_accel_data(
     Nota: Normalmente los datos de acelerómetro son inmutables,
     pero esta función permite correcciones si es necesario.
     """
-    db_accel = get_accel_by_id(db, accel_id)
+    update_dict = {
+        key: value
+        for key, value in accel_data.model_dump(exclude_unset=True).items()
+        if hasattr(AccelerometerData, key)
+    }
+    if not update_dict:
+        # Sin cambios: mismo contrato que el UPDATE (fila actual, desacoplada)
+        db_accel = db.get(AccelerometerData, accel_id, populate_existing=True)
+        if db_accel is not None:
+            db.expunge(db_accel)
+        return db_accel
     
-    if not db_accel:
-        return None
+    # UPDATE ... RETURNING: sin SELECT previo ni recarga posterior
+    db_accel = db.execute(
+        update(AccelerometerData)
+        .where(AccelerometerData.id == accel_id)
+        .values(**update_dict)
+        .returning(AccelerometerData)
+        # Si la instancia ya está en el identity map (p.ej. cargada por el
+        # caller), se sobrescribe con los valores de RETURNING
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
     
-    update_dict = accel_data.model_dump(exclude_unset=True)
-    for key, value in update_dict.items():
-        if hasattr(db_accel, key):
-            setattr(db_accel, key, value)
+    if db_accel is None:
+        return None
     
+    db.expunge(db_accel)
     db.commit()
-    db.refresh(db_accel)
     return db_accel
 
 
@@ -71,12 +166,16 @@ def delete_accel_data(db: Session, accel_id: int) -> bool:
     Returns:
         True si se eliminó, False si no existía
     """
-    db_accel = get_accel_by_id(db, accel_id)
+    deleted_id = db.execute(
+        delete(AccelerometerData)
+        .where(AccelerometerData.id == accel_id)
+        .returning(AccelerometerData.id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
     
-    if not db_accel:
+    if deleted_id is None:
         return False
     
-    db.delete(db_accel)
     db.commit()
     return True
 
@@ -109,11 +208,15 @@ def get_last_accel_by_device(
     """
     Obtiene el registro más reciente de un dispositivo.
     Equivalente a get_last_gps_row_by_device() pero para accel.
+    
+    Ordena por Timestamp (no por id): con ingesta fuera de orden el id no
+    sigue al tiempo, y así el LIMIT 1 sale directo del índice
+    (DeviceID, Timestamp) sin paso de Sort.
     """
     return (
         db.query(AccelerometerData)
         .filter(AccelerometerData.DeviceID == device_id)
-        .order_by(AccelerometerData.id.desc())
+        .order_by(AccelerometerData.Timestamp.desc())
         .first()
     )
 
@@ -124,11 +227,12 @@ def get_oldest_accel_by_device(
 ) -> Optional[AccelerometerData]:
     """
     Obtiene el registro más antiguo de un dispositivo.
+    Usa el índice (DeviceID, Timestamp), igual que get_last_accel_by_device().
     """
     return (
         db.query(AccelerometerData)
         .filter(AccelerometerData.DeviceID == device_id)
-        .order_by(AccelerometerData.id.asc())
+        .order_by(AccelerometerData.Timestamp.asc())
         .first()
     )
 
@@ -142,15 +246,27 @@ def get_accel_by_device_timestamp(
     Busca un registro específico por (DeviceID, Timestamp).
     Útil para verificar duplicados o hacer JOINs manuales con GPS.
     """
-    return (
-        db.query(AccelerometerData)
-        .filter(
-            AccelerometerData.DeviceID == device_id,
-            AccelerometerData.Timestamp == timestamp
-        )
-        .first()
-    )
-    
+    return db.execute(
+        _BY_DEVICE_TIMESTAMP_STMT,
+        {"device_id": device_id, "timestamp": timestamp}
+    ).scalars().first()
+
+
+def get_accel_id_by_device_timestamp(
+    db: Session,
+    device_id: str,
+    timestamp: datetime
+) -> Optional[int]:
+    """
+    Variante liviana para chequeo de duplicados: solo retorna el id
+    (index probe sobre unique_device_timestamp_accel, sin cargar la fila).
+    """
+    return db.execute(
+        _DEDUP_STMT,
+        {"device_id": device_id, "timestamp": timestamp}
+    ).scalar()
+
+
 # ==========================================================
 # CONSULTAS POR RANGO TEMPORAL
 # ==========================================================
@@ -192,6 +308,7 @@ def get_accel_in_range(
     
     Warning: Solo para exportaciones globales o análisis administrativos.
     Para queries específicos, usar get_accel_in_range_by_device().
+    Para rangos de varios días, usar get_accel_in_range_batched().
     """
     return (
         db.query(AccelerometerData)
@@ -202,6 +319,65 @@ def get_accel_in_range(
         .order_by(AccelerometerData.Timestamp.asc())
         .all()
     )
+
+
+def get_accel_in_range_batched(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    target_batch_rows: int = 10_000
+) -> Iterator[List[AccelerometerData]]:
+    """
+    Versión por lotes de get_accel_in_range() para rangos muy amplios.
+    
+    Parte [start_time, end_time] en sub-rangos de tiempo adaptativos y
+    entrega cada lote al caller en cuanto llega, en vez de materializar
+    millones de filas de golpe. El primer sub-rango es (end-start)/64 y
+    cada siguiente se reescala según las filas que devolvió el anterior:
+    
+        b_{i+1} = b_i * min(4, target_batch_rows / r_i),  acotado a [1s, 1d]
+    
+    Args:
+        start_time: Inicio del rango (inclusive, UTC)
+        end_time: Fin del rango (inclusive, UTC)
+        target_batch_rows: Filas objetivo por lote
+    
+    Yields:
+        List[AccelerometerData]: Lote ordenado por Timestamp (nunca vacío)
+    """
+    min_step = timedelta(seconds=1)
+    max_step = timedelta(days=1)
+    
+    step = min(max((end_time - start_time) / 64, min_step), max_step)
+    cursor = start_time
+    
+    while cursor <= end_time:
+        upper = cursor + step
+        is_last = upper > end_time
+        
+        query = db.query(AccelerometerData).filter(
+            AccelerometerData.Timestamp >= cursor
+        )
+        # Sub-rangos semiabiertos [cursor, upper) salvo el último,
+        # que respeta el end_time inclusive
+        if is_last:
+            query = query.filter(AccelerometerData.Timestamp <= end_time)
+        else:
+            query = query.filter(AccelerometerData.Timestamp < upper)
+        
+        batch = query.order_by(AccelerometerData.Timestamp.asc()).all()
+        
+        if batch:
+            yield batch
+        
+        if is_last:
+            break
+        
+        factor = 4.0 if not batch else min(4.0, target_batch_rows / len(batch))
+        step = min(max(step * factor, min_step), max_step)
+        cursor = upper
+
+
 # ==========================================================
 # UTILIDADES
 # ==========================================================
@@ -209,14 +385,13 @@ def get_accel_in_range(
 def device_has_accel_data(db: Session, device_id: str) -> bool:
     """
     Verifica si un dispositivo tiene al menos un registro de acelerómetro.
+    
+    SELECT EXISTS(...): una sola sonda al índice, sin el subquery + count(*)
+    que genera Query.count().
     """
-    count = (
-        db.query(AccelerometerData)
-        .filter(AccelerometerData.DeviceID == device_id)
-        .limit(1)
-        .count()
-    )
-    return count > 0
+    return db.query(
+        exists().where(AccelerometerData.DeviceID == device_id)
+    ).scalar()
 
 
 def count_accel_records(
@@ -230,12 +405,12 @@ def count_accel_records(
         device_id: Si se provee, cuenta solo ese device. 
                    Si es None, cuenta todos los registros.
     """
-    query = db.query(AccelerometerData)
+    stmt = select(func.count()).select_from(AccelerometerData)
     
     if device_id:
-        query = query.filter(AccelerometerData.DeviceID == device_id)
+        stmt = stmt.where(AccelerometerData.DeviceID == device_id)
     
-    return query.count()
+    return db.scalar(stmt)
 
 
 def get_all_devices_with_accel(db: Session) -> List[str]:
@@ -292,77 +467,108 @@ def get_accel_map_for_trip(
         ...     print("No accel data for this GPS point")
     
     Performance:
-        - Uses composite index (DeviceID, Timestamp)
+        - Uses composite index (trip_id, Timestamp), one query
         - Typical time: 5-20ms for 360 points
         - Memory: ~50KB for 360 accel records
     
     Notes:
         - Empty dict if trip has no accelerometer data
-        - Timestamps are normalized to match GPS format (UTC ISO with 'Z')
+        - Timestamps are normalized to match GPS format (UTC ISO with 'Z'),
+          precomputed at INSERT in the generated column Timestamp_iso
         - Not all GPS points will have accel data (device may skip windows)
     """
-    # First, get device_id from trip
-    # (We need this because accel is indexed by DeviceID + Timestamp, not trip_id)
-    device_id_result = (
-        db.query(GPS_data.DeviceID)
-        .filter(GPS_data.trip_id == trip_id)
-        .limit(1)
-        .first()
+    # Single indexed query on (trip_id, Timestamp), only the mapped columns
+    accel_rows = db.execute(
+        select(*_TRIP_MAP_COLUMNS).where(AccelerometerData.trip_id == trip_id)
     )
     
-    if not device_id_result:
-        # Trip has no GPS data, so no accel either
-        return {}
+    # Build timestamp-keyed map
+    accel_map: dict[str, dict[str, Any]] = {}
+    
+    for row in accel_rows:
+        # Timestamp already formatted by PostgreSQL (generated column)
+        timestamp_str = row.Timestamp_iso
+        if not timestamp_str:
+            continue
+        
+        accel_map[timestamp_str] = _accel_map_entry(row)
+    
+    return accel_map
+
+
+def get_accel_maps_for_trips(
+    db: Session,
+    trip_ids: List[str]
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """
+    Batch version of get_accel_map_for_trip: {trip_id: accel_map} with one
+    `trip_id IN (...)` query for all trips (no N+1).
     
-    device_id = device_id_result[0]
+    Trips without accelerometer data map to an empty dict.
+    """
+    accel_maps: dict[str, dict[str, dict[str, Any]]] = {trip_id: {} for trip_id in trip_ids}
+    if not trip_ids:
+        return accel_maps
     
-    # Get all timestamps for this trip
-    timestamps = (
-        db.query(GPS_data.Timestamp)
-        .filter(GPS_data.trip_id == trip_id)
-        .all()
+    accel_rows = db.execute(
+        select(AccelerometerData.trip_id, *_TRIP_MAP_COLUMNS)
+        .where(AccelerometerData.trip_id.in_(trip_ids))
     )
     
-    if not timestamps:
-        return {}
+    for row in accel_rows:
+        if row.Timestamp_iso:
+            accel_maps[row.trip_id][row.Timestamp_iso] = _accel_map_entry(row)
+    
+    return accel_maps
+
+
+def _accel_map_entry(row: Any) -> dict[str, Any]:
+    """
+    Campos de un punto del accel_map (fila de _TRIP_MAP_COLUMNS).
     
-    # Extract timestamp values
-    timestamp_list = [ts[0] for ts in timestamps]
+    Todas las columnas son NOT NULL en el modelo: psycopg2 ya entrega
+    float/int nativos, sin defaults ni conversiones por fila.
+    """
+    return {
+        "rms_x": row.rms_x,
+        "rms_y": row.rms_y,
+        "rms_z": row.rms_z,
+        "rms_mag": row.rms_mag,
+        "max_x": row.max_x,
+        "max_y": row.max_y,
+        "max_z": row.max_z,
+        "max_mag": row.max_mag,
+        "peaks_count": row.peaks_count,
+        "sample_count": row.sample_count,
+        "flags": row.flags
+    }
+
+
+def get_accel_map_for_trip_json(
+    db: Session,
+    trip_id: str
+) -> bytes:
+    """
+    Same map as get_accel_map_for_trip(), serialized straight to JSON bytes.
     
-    # Query accelerometer data matching these timestamps
-    accel_rows = (
-        db.query(AccelerometerData)
-        .filter(
-            AccelerometerData.DeviceID == device_id,
-            AccelerometerData.Timestamp.in_(timestamp_list)
-        )
-        .all()
-    )
+    Intended for HTTP endpoints that return the map as-is: the map is built
+    with the same _accel_map_entry() and serialized with orjson in one call,
+    so the result can be returned directly with
+    Response(content=..., media_type="application/json").
     
-    # Build timestamp-keyed map
-    accel_map: dict[str, dict[str, Any]] = {}
+    Args:
+        db: SQLAlchemy session
+        trip_id: Trip identifier
     
-    for row in accel_rows:
-        # Normalize timestamp to match GPS format
-        ts = getattr(row, 'Timestamp', None)
-        if not ts:
-            continue
-        
-        timestamp_str = ts.strftime("%Y-%m-%dT%H:%M:%SZ")
-        
-        # Extract all accelerometer fields
-        accel_map[timestamp_str] = {
-            "rms_x": float(getattr(row, 'rms_x', 0.0)),
-            "rms_y": float(getattr(row, 'rms_y', 0.0)),
-            "rms_z": float(getattr(row, 'rms_z', 0.0)),
-            "rms_mag": float(getattr(row, 'rms_mag', 0.0)),
-            "max_x": float(getattr(row, 'max_x', 0.0)),
-            "max_y": float(getattr(row, 'max_y', 0.0)),
-            "max_z": float(getattr(row, 'max_z', 0.0)),
-            "max_mag": float(getattr(row, 'max_mag', 0.0)),
-            "peaks_count": int(getattr(row, 'peaks_count', 0)),
-            "sample_count": int(getattr(row, 'sample_count', 0)),
-            "flags": int(getattr(row, 'flags', 0))
-        }
+    Returns:
+        bytes: JSON object keyed by UTC ISO timestamp (b"{}" if no data)
+    """
+    rows = db.execute(
+        select(*_TRIP_MAP_COLUMNS).where(AccelerometerData.trip_id == trip_id)
+    )
     
-    return accel_map
\ No newline at end of file
+    return orjson.dumps({
+        row.Timestamp_iso: _accel_map_entry(row)
+        for row in rows
+        if row.Timestamp_iso
+    })
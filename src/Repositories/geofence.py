@@ -1,29 +1,250 @@
 # src/Repositories/geofence.py
 
-from sqlalchemy.orm import Session
+import threading
+import time
+from sqlalchemy import text, func, select, insert, update, delete, exists, values, column, cast, and_, Integer, Float
+from geoalchemy2 import Geography
+from sqlalchemy.orm import Session, make_transient_to_detached
 from src.Models.geofence import Geofence
-from typing import List, Optional
+from src.Core.config import settings
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+# ==========================================================
+# CACHE EN MEMORIA DE GEOCERCAS
+# ==========================================================
+# Las geocercas cambian muy poco y se leen seguido. El cache guarda
+# snapshots desacoplados de la sesión; cada lectura los re-asocia con
+# Session.merge(load=False), que no emite SQL.
+#
+# Invalidación:
+#   - create/update/delete_geofence incrementan `version` y limpian todo
+#   - TTL (GEOFENCE_CACHE_TTL_S) como red de seguridad para cambios
+#     hechos por otro proceso o directamente en la DB
+
+_GEOFENCE_COLUMN_ATTRS = tuple(attr.key for attr in Geofence.__mapper__.column_attrs)
+_GEOFENCE_UPDATABLE_ATTRS = frozenset(_GEOFENCE_COLUMN_ATTRS)
+
+
+class _GeofenceCache:
+    """Cache versionado + TTL, thread-safe."""
+
+    def __init__(self, ttl_s: float):
+        self._lock = threading.RLock()
+        self._entries: dict[Any, tuple[int, float, Any]] = {}
+        self._ttl_s = ttl_s
+        self.version = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            version, expires_at, value = entry
+            if version != self.version or time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+
+            return value
+
+    def set(self, key: Any, value: Any, version: int) -> None:
+        """Guarda solo si nadie invalidó mientras se consultaba la DB."""
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = (version, time.monotonic() + self._ttl_s, value)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+_geofence_cache = _GeofenceCache(ttl_s=settings.GEOFENCE_CACHE_TTL_S)
+
+
+# UPDATE con subquery correlacionada (row-valued SET): un solo statement
+# para buscar la geocerca y escribirla en cada punto GPS.
+_ASSIGN_GEOFENCE_STMT = text("""
+    UPDATE gps_data d
+    SET ("CurrentGeofenceID", "CurrentGeofenceName") = (
+        SELECT g.id, g.name
+        FROM geofences g
+        WHERE g.is_active = TRUE
+        AND g.geometry && ST_SetSRID(ST_MakePoint(d."Longitude", d."Latitude"), 4326)::geography
+        AND ST_Intersects(
+            g.geometry,
+            ST_SetSRID(ST_MakePoint(d."Longitude", d."Latitude"), 4326)::geography
+        )
+        ORDER BY ST_Area(g.geometry) ASC
+        LIMIT 1
+    )
+    WHERE d.id = ANY(:ids)
+""")
+
+
+def _detached_snapshot(geofence: Geofence) -> Geofence:
+    """Copia desacoplada (detached) con todas las columnas cargadas."""
+    snapshot = Geofence(**{attr: getattr(geofence, attr) for attr in _GEOFENCE_COLUMN_ATTRS})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def get_geofence_cache_version() -> int:
+    """Versión actual del cache (cambia en cada create/update/delete)."""
+    return _geofence_cache.version
+
+
+def invalidate_geofence_cache() -> None:
+    """Invalida el cache de geocercas (para cambios fuera de este módulo)."""
+    _geofence_cache.invalidate()
 
 
 def get_all_geofences(db: Session, only_active: bool = True) -> List[Geofence]:
     """
     Obtiene todas las geocercas.
     
+    Cacheado en memoria (ver _GeofenceCache): en un hit no hay query.
+    Las instancias retornadas pertenecen a `db` (merge sin SQL).
+    
     Args:
         db: Session SQLAlchemy
         only_active: Si True, solo retorna geocercas activas
     """
-    query = db.query(Geofence)
+    key = ("all", only_active)
+    snapshots = _geofence_cache.get(key)
     
-    if only_active:
-        query = query.filter(Geofence.is_active == True)
+    if snapshots is None:
+        version = _geofence_cache.version
+        query = db.query(Geofence)
+        
+        if only_active:
+            query = query.filter(Geofence.is_active == True)
+        
+        snapshots = [_detached_snapshot(g) for g in query.all()]
+        _geofence_cache.set(key, snapshots, version)
+    
+    return [db.merge(g, load=False) for g in snapshots]
+
+
+def get_active_geofence_shapes(db: Session) -> List[Any]:
+    """
+    Obtiene id, nombre, geometría (WKB) y área (m²) de las geocercas activas.
+    
+    Usado por GeofenceDetector para construir su índice espacial en memoria.
+    
+    Returns:
+        List[Row]: filas con atributos id, name, wkb, area
+    """
+    return (
+        db.query(
+            Geofence.id,
+            Geofence.name,
+            func.ST_AsBinary(Geofence.geometry).label("wkb"),
+            func.ST_Area(Geofence.geometry).label("area")
+        )
+        .filter(Geofence.is_active == True)
+        .all()
+    )
+
+
+def get_containing_geofences_bulk(
+    db: Session,
+    points: Sequence[Tuple[float, float]]
+) -> dict[int, dict[str, str]]:
+    """
+    Clasifica muchos puntos contra las geocercas activas en un solo query.
+    
+    Emite un JOIN contra una lista VALUES (idx, lat, lon) con DISTINCT ON
+    (idx), pre-filtrando por bounding box (&&): la misma semántica que GeofenceDetector (ST_Intersects, gana la
+    geocerca de menor área) pero un round-trip para N puntos.
+    
+    Args:
+        db: Session SQLAlchemy
+        points: Lista de (lat, lon)
+    
+    Returns:
+        dict: {índice_del_punto: {'id': ..., 'name': ...}} solo para los
+        puntos que caen dentro de alguna geocerca
+    """
+    if not points:
+        return {}
+    
+    pts = (
+        values(
+            column('idx', Integer),
+            column('lat', Float),
+            column('lon', Float),
+            name='pts'
+        )
+        .data([(idx, float(lat), float(lon)) for idx, (lat, lon) in enumerate(points)])
+    )
+    
+    point = cast(
+        func.ST_SetSRID(func.ST_MakePoint(pts.c.lon, pts.c.lat), 4326),
+        Geography(srid=4326)
+    )
+    
+    stmt = (
+        select(pts.c.idx, Geofence.id, Geofence.name)
+        .select_from(
+            pts.join(
+                Geofence,
+                and_(
+                    Geofence.is_active == True,
+                    Geofence.geometry.op('&&')(point),
+                    func.ST_Intersects(Geofence.geometry, point)
+                )
+            )
+        )
+        .distinct(pts.c.idx)
+        .order_by(pts.c.idx, func.ST_Area(Geofence.geometry))
+    )
     
-    return query.all()
+    return {
+        row.idx: {'id': row.id, 'name': row.name}
+        for row in db.execute(stmt)
+    }
+
+
+def assign_geofence_ids_bulk(db: Session, gps_ids: Sequence[int]) -> int:
+    """
+    Calcula y escribe CurrentGeofenceID/CurrentGeofenceName de varios
+    puntos GPS en un solo UPDATE del lado del servidor (sin traer filas a
+    Python). Útil para backfill o recálculo tras cambiar geocercas.
+    
+    Misma regla que GeofenceDetector: ST_Intersects y gana la geocerca
+    activa de menor área; puntos fuera de toda geocerca quedan en NULL.
+    
+    NOTE: No toca GeofenceEventType: entry/exit/inside depende del orden de
+    los puntos del device y lo decide el flujo de ingesta.
+    
+    Args:
+        db: Session SQLAlchemy
+        gps_ids: ids de gps_data a recalcular
+    
+    Returns:
+        int: Número de filas GPS actualizadas
+    """
+    if not gps_ids:
+        return 0
+    
+    result = db.execute(_ASSIGN_GEOFENCE_STMT, {'ids': list(gps_ids)})
+    db.commit()
+    return result.rowcount
 
 
 def get_geofence_by_id(db: Session, geofence_id: str) -> Optional[Geofence]:
     """Obtiene una geocerca por ID."""
-    return db.query(Geofence).filter(Geofence.id == geofence_id).first()
+    return db.get(Geofence, geofence_id)
+
+
+def geofence_exists(db: Session, geofence_id: str) -> bool:
+    """
+    Verifica si existe una geocerca (SELECT EXISTS: una sonda a la PK,
+    sin cargar la geometría).
+    """
+    return db.query(exists().where(Geofence.id == geofence_id)).scalar()
 
 
 def create_geofence(db: Session, geofence_data: dict) -> Geofence:
@@ -34,46 +255,123 @@ def create_geofence(db: Session, geofence_data: dict) -> Geofence:
         db: Session SQLAlchemy
         geofence_data: Dict con datos de la geocerca
     """
-    new_geofence = Geofence(**geofence_data)
-    db.add(new_geofence)
+    # INSERT ... RETURNING: la fila (con defaults del servidor) vuelve en
+    # el mismo round-trip, sin el SELECT extra de db.refresh()
+    new_geofence = db.execute(
+        insert(Geofence).values(**geofence_data).returning(Geofence)
+    ).scalar_one()
+    # Sin expunge, el commit expira los atributos y el primer acceso
+    # dispararía justamente ese SELECT
+    db.expunge(new_geofence)
     db.commit()
-    db.refresh(new_geofence)
+    _geofence_cache.invalidate()
     return new_geofence
 
 
+def create_geofences_bulk(
+    db: Session,
+    geofences_data: List[dict],
+    chunk_size: int = 1000
+) -> int:
+    """
+    Crea muchas geocercas en una sola transacción.
+    
+    Usa el INSERT masivo del ORM (executemany agrupado en INSERT ... VALUES
+    multi-fila por el driver), en bloques de `chunk_size` para no exceder el
+    límite de parámetros de PostgreSQL, y un solo commit al final.
+    
+    Args:
+        db: Session SQLAlchemy
+        geofences_data: Lista de dicts (mismas claves que create_geofence)
+        chunk_size: Filas por INSERT
+    
+    Returns:
+        int: Número de geocercas insertadas
+    
+    Raises:
+        IntegrityError: Si algún id ya existe (no se inserta nada)
+    """
+    if not geofences_data:
+        return 0
+    
+    for start in range(0, len(geofences_data), chunk_size):
+        db.execute(insert(Geofence), geofences_data[start:start + chunk_size])
+    
+    db.commit()
+    _geofence_cache.invalidate()
+    return len(geofences_data)
+
+
 def update_geofence(db: Session, geofence_id: str, update_data: dict) -> Optional[Geofence]:
-    """Actualiza una geocerca existente."""
-    geofence = get_geofence_by_id(db, geofence_id)
+    """
+    Actualiza una geocerca existente.
     
-    if not geofence:
-        return None
+    Un solo UPDATE ... RETURNING (sin SELECT previo ni refresh): el WHERE
+    hace de chequeo de existencia.
     
-    for key, value in update_data.items():
-        if hasattr(geofence, key):
-            setattr(geofence, key, value)
+    Returns:
+        Geofence actualizada (desacoplada de la sesión), o None si no existe
+    """
+    values = {
+        key: value
+        for key, value in update_data.items()
+        if key in _GEOFENCE_UPDATABLE_ATTRS
+    }
+    
+    if not values:
+        return get_geofence_by_id(db, geofence_id)
+    
+    stmt = (
+        update(Geofence)
+        .where(Geofence.id == geofence_id)
+        .values(**values)
+        .returning(Geofence)
+        # get_all_geofences hace merge de las cacheadas en la sesión: si la
+        # instancia ya está en el identity map, sobrescribirla con RETURNING
+        .execution_options(populate_existing=True)
+    )
+    geofence = db.execute(stmt).scalar_one_or_none()
+    
+    if geofence is None:
+        return None
     
+    # Igual que create_geofence: sin expunge el commit expira los atributos
+    db.expunge(geofence)
     db.commit()
-    db.refresh(geofence)
+    _geofence_cache.invalidate()
     return geofence
 
 
 def delete_geofence(db: Session, geofence_id: str) -> bool:
-    """Elimina una geocerca."""
-    geofence = get_geofence_by_id(db, geofence_id)
+    """
+    Elimina una geocerca.
+    
+    DELETE directo por id: no se carga la fila (ni la geometría) antes.
+    """
+    result = db.execute(
+        delete(Geofence)
+        .where(Geofence.id == geofence_id)
+        .execution_options(synchronize_session=False)
+    )
     
-    if not geofence:
+    if result.rowcount == 0:
         return False
     
-    db.delete(geofence)
     db.commit()
+    _geofence_cache.invalidate()
     return True
 
 
+def geofences_exist(db: Session) -> bool:
+    """Indica si hay al menos una geocerca (SELECT EXISTS, sin count(*))."""
+    return db.execute(select(exists().select_from(Geofence))).scalar()
+
+
 def count_geofences(db: Session, only_active: bool = True) -> int:
     """Cuenta geocercas en la DB."""
-    query = db.query(Geofence)
+    stmt = select(func.count()).select_from(Geofence)
     
     if only_active:
-        query = query.filter(Geofence.is_active == True)
+        stmt = stmt.where(Geofence.is_active == True)
     
-    return query.count()
\ No newline at end of file
+    return db.scalar(stmt)
\ No newline at end of file
@@ -1,74 +1,324 @@
 # src/Repositories/gps_data.py
 
+import csv
+import io
+import logging
+import numpy as np
+from sqlalchemy import func, select, exists, insert, update, delete, cast, bindparam, literal_column, case, or_, and_, null, text, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from geoalchemy2 import Geography
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from src.Models.gps_data import GPS_data
+from src.Models.gps_data import GPS_data, GPS_GEOGRAPHY_SQL, GPS_GEOHASH_PRECISION
+from src.Models.device import Device
+from src.Models.last_gps_by_device import LastGpsByDevice
+from src.Models.trip import Trip
 from src.Schemas.gps_data import GpsData_create, GpsData_update
 from src.Services.gps_serialization import serialize_gps_row, serialize_many
-from datetime import datetime
+from src.Services.geohash import cells_covering_bbox
+from src.Services.cache_manager import last_gps_cache, device_list_cache
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
 from math import radians, cos, sin, asin, sqrt
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence
 
+logger = logging.getLogger(__name__)
+
+
+# Columnas que consume serialize_gps_row (GpsData_get): proyección Core en
+# lugar de hidratar entidades ORM (sin identity map ni instrumentación)
+_GPS_ROW_COLUMNS = (
+    GPS_data.id,
+    GPS_data.DeviceID,
+    GPS_data.trip_id,
+    GPS_data.Latitude,
+    GPS_data.Longitude,
+    GPS_data.Altitude,
+    GPS_data.Accuracy,
+    GPS_data.Timestamp,
+    GPS_data.CurrentGeofenceID,
+    GPS_data.CurrentGeofenceName,
+    GPS_data.GeofenceEventType,
+)
+
+
+
+# ==========================================================
+# STATEMENTS PRECOMPILADOS
+# ==========================================================
+# Construidos una sola vez al importar: cada llamada solo rebindea los
+# parámetros y SQLAlchemy reutiliza la compilación cacheada.
+
+# Columnas (y orden de claves) del formato interno de
+# get_last_gps_row_by_device: la fila mapeada se copia tal cual con dict(row)
+_LAST_GPS_COLUMNS = (
+    GPS_data.id,
+    GPS_data.DeviceID,
+    GPS_data.Latitude,
+    GPS_data.Longitude,
+    GPS_data.Altitude,
+    GPS_data.Accuracy,
+    GPS_data.Timestamp,
+    GPS_data.CurrentGeofenceID,
+    GPS_data.CurrentGeofenceName,
+    GPS_data.GeofenceEventType,
+)
+
+# Último GPS por device: todas las columnas están en
+# idx_gps_device_id_covering (index-only scan)
+_LAST_GPS_ROW_STMT = (
+    select(*_LAST_GPS_COLUMNS)
+    .where(GPS_data.DeviceID == bindparam("device_id"))
+    .order_by(GPS_data.id.desc())
+    .limit(1)
+)
+
+_DEVICE_GEOFENCE_STMT = (
+    select(
+        GPS_data.CurrentGeofenceID,
+        GPS_data.CurrentGeofenceName,
+        GPS_data.GeofenceEventType,
+        GPS_data.Timestamp
+    )
+    .where(GPS_data.DeviceID == bindparam("device_id"))
+    .order_by(GPS_data.Timestamp.desc())
+    .limit(1)
+)
+
+_OLDEST_GPS_ROW_STMT = (
+    select(*_GPS_ROW_COLUMNS)
+    .where(GPS_data.DeviceID == bindparam("device_id"))
+    .order_by(GPS_data.id.asc())
+    .limit(1)
+)
+
+# Rangos temporales semiabiertos [start_time, end_time): un punto en el
+# borde cae en un solo rango contiguo, y Timestamp va sin envolver en
+# funciones (date_trunc, extract...) para que el planner use el B-tree
+# (DeviceID, Timestamp) como rango de índice.
+_RANGE_BY_DEVICE_STMT = (
+    select(*_GPS_ROW_COLUMNS)
+    .where(
+        GPS_data.DeviceID == bindparam("device_id"),
+        GPS_data.Timestamp >= bindparam("start_time"),
+        GPS_data.Timestamp < bindparam("end_time")
+    )
+    .order_by(GPS_data.Timestamp.asc())
+)
+
+_RANGE_STMT = (
+    select(*_GPS_ROW_COLUMNS)
+    .where(
+        GPS_data.Timestamp >= bindparam("start_time"),
+        GPS_data.Timestamp < bindparam("end_time")
+    )
+    .order_by(GPS_data.Timestamp.asc())
+)
+
+_BY_TRIP_STMT = (
+    select(*_GPS_ROW_COLUMNS)
+    .where(GPS_data.trip_id == bindparam("trip_id"))
+    .order_by(GPS_data.Timestamp.asc())
+)
+
+# count(*) sin columnas: index-only scan sobre idx_gps_trip_timestamp
+# (trip_id es la columna líder), sin el subquery de Query.count()
+_COUNT_BY_TRIP_STMT = (
+    select(func.count())
+    .select_from(GPS_data)
+    .where(GPS_data.trip_id == bindparam("trip_id"))
+)
+
+_DEVICE_HAS_GPS_STMT = select(
+    exists().where(GPS_data.DeviceID == bindparam("device_id"))
+)
+
+_DEVICE_TIMESPAN_STMT = (
+    select(func.min(GPS_data.Timestamp), func.max(GPS_data.Timestamp))
+    .where(GPS_data.DeviceID == bindparam("device_id"))
+)
+
+
+# Extremos globales sobre devices activos: un LATERAL por device con
+# ORDER BY Timestamp LIMIT 1 baja por unique_device_timestamp
+# (DeviceID, Timestamp) en vez de ordenar el JOIN gps_data ⋈ devices
+# completo. Costo O(devices activos · log N).
+def _device_edge_gps(*columns, ascending: bool):
+    return (
+        select(*columns)
+        .where(GPS_data.DeviceID == Device.DeviceID)
+        .order_by(GPS_data.Timestamp.asc() if ascending else GPS_data.Timestamp.desc())
+        .limit(1)
+        .lateral()
+    )
+
+
+def _global_edge_gps_stmt(ascending: bool):
+    edge = _device_edge_gps(*_GPS_ROW_COLUMNS, ascending=ascending)
+    return (
+        select(edge)
+        .select_from(Device)
+        .join(edge, true())
+        .where(Device.IsActive == True)
+        .order_by(edge.c.Timestamp.asc() if ascending else edge.c.Timestamp.desc())
+        .limit(1)
+    )
+
+
+_GLOBAL_OLDEST_STMT = _global_edge_gps_stmt(ascending=True)
+_GLOBAL_NEWEST_STMT = _global_edge_gps_stmt(ascending=False)
+
+_oldest_edge = _device_edge_gps(GPS_data.Timestamp, ascending=True)
+_newest_edge = _device_edge_gps(GPS_data.Timestamp, ascending=False)
+_GLOBAL_TIMESPAN_STMT = (
+    select(func.min(_oldest_edge.c.Timestamp), func.max(_newest_edge.c.Timestamp))
+    .select_from(Device)
+    .join(_oldest_edge, true())
+    .join(_newest_edge, true())
+    .where(Device.IsActive == True)
+)
 
 """
 get_gps_data_by_id to get GPS data (from one user) by ID
 """
 def get_gps_data_by_id(DB: Session, gps_data_id: int):
-    return DB.query(GPS_data).filter(GPS_data.id == gps_data_id).first()
+    # Session.get(): mira primero el identity map y usa el SELECT por PK cacheado
+    return DB.get(GPS_data, gps_data_id)
 
 
 # ==========================================================
 # ✅ Obtener último GPS por dispositivo (ajustado para geocerca)
 # ==========================================================
-def get_last_gps_row_by_device(DB: Session, device_id: str, include_id: bool = False) -> dict | None:
+def get_last_gps_row_by_device(
+    DB: Session,
+    device_id: str,
+    include_id: bool = False,
+    fill_cache: bool = True
+) -> dict | None:
     """
     Retrieve the most recent GPS point from a specific device.
     IMPORTANTE: Retorna campos de geocerca SIN serializar para lógica interna.
+    
+    Served from last_gps_cache when possible (written through by
+    created_gps_data); falls back to the DB and fills the cache.
+    
+    fill_cache=False for read-replica sessions (get_read_DB): a lagging
+    replica row must not reach the cache the UDP loop reads.
     """
-    row = (
-        DB.query(GPS_data)
-        .filter(GPS_data.DeviceID == device_id)
-        .order_by(GPS_data.id.desc())
-        .first()
-    )
+    cached = last_gps_cache.get(device_id)
+    if cached is not None:
+        result = dict(cached)
+        if not include_id:
+            result["id"] = None
+        return result
+
+    # Generación antes del SELECT: si un INSERT confirma entretanto, el
+    # fill se descarta en lugar de cachear la fila anterior
+    generation = last_gps_cache.generation(device_id)
+    row = DB.execute(_LAST_GPS_ROW_STMT, {"device_id": device_id}).mappings().first()
     
     if not row:
-        print(f"[REPO] get_last_gps_row_by_device('{device_id}'): No GPS anterior encontrado")
+        logger.debug("get_last_gps_row_by_device(%s): no previous GPS", device_id)
         return None
 
-    ts = getattr(row, "Timestamp", None)
-    timestamp_iso = ts.isoformat() if ts is not None else None
-
-    result = {
-        "id": row.id if include_id else None,
-        "DeviceID": row.DeviceID,
-        "Latitude": row.Latitude,
-        "Longitude": row.Longitude,
-        "Altitude": row.Altitude,
-        "Accuracy": row.Accuracy,
-        "Timestamp": timestamp_iso,
-        "CurrentGeofenceID": row.CurrentGeofenceID,
-        "CurrentGeofenceName": row.CurrentGeofenceName,
-        "GeofenceEventType": row.GeofenceEventType
-    }
+    result = _last_gps_row_dict(row)
+    if fill_cache:
+        last_gps_cache.fill(device_id, dict(result), generation)
+    if not include_id:
+        result["id"] = None
+
+    # %s diferido: sin formateo ni write a stdout si DEBUG está apagado
+    logger.debug(
+        "get_last_gps_row_by_device(%s): id=%s geofence=%s event=%s",
+        device_id, row["id"], result["CurrentGeofenceID"], result["GeofenceEventType"]
+    )
+    
+    return result
 
-    print(f"[REPO] get_last_gps_row_by_device('{device_id}'):")
-    print(f"[REPO]   → ID en DB: {row.id}")
-    print(f"[REPO]   → CurrentGeofenceID: {result['CurrentGeofenceID']}")
-    print(f"[REPO]   → GeofenceEventType: {result['GeofenceEventType']}")
+
+def _last_gps_row_dict(row: Mapping[str, Any]) -> dict:
+    """Formato interno de get_last_gps_row_by_device (Timestamp ISO, con id)."""
+    # Fila de select(*_LAST_GPS_COLUMNS): copia en bloque, solo Timestamp cambia
+    result = dict(row)
+    ts = result["Timestamp"]
+    result["Timestamp"] = ts.isoformat() if ts is not None else None
+    return result
+
+
+def get_last_gps_rows_by_devices(
+    DB: Session,
+    device_ids: Iterable[str],
+    include_id: bool = False,
+    fill_cache: bool = True
+) -> dict[str, dict]:
+    """
+    Batch version of get_last_gps_row_by_device: {device_id: row} for the
+    given devices, in one query instead of one per device (N+1).
+    
+    Cached devices are served from last_gps_cache; the rest are fetched with
+    a single DISTINCT ON ("DeviceID") ... WHERE "DeviceID" IN (...).
+    Devices without GPS are absent from the result.
+    
+    fill_cache=False for read-replica sessions (see get_last_gps_row_by_device).
+    """
+    result: dict[str, dict] = {}
+    missing: list[str] = []
+    for device_id in dict.fromkeys(device_ids):
+        cached = last_gps_cache.get(device_id)
+        if cached is not None:
+            result[device_id] = dict(cached)
+        else:
+            missing.append(device_id)
+    
+    if missing:
+        generations = {device_id: last_gps_cache.generation(device_id) for device_id in missing}
+        rows = DB.execute(
+            _LAST_GPS_ROWS_BY_DEVICES_STMT.where(GPS_data.DeviceID.in_(missing))
+        ).mappings()
+        for row in rows:
+            row_dict = _last_gps_row_dict(row)
+            if fill_cache:
+                last_gps_cache.fill(row["DeviceID"], dict(row_dict), generations[row["DeviceID"]])
+            result[row["DeviceID"]] = row_dict
+    
+    if not include_id:
+        for row_dict in result.values():
+            row_dict["id"] = None
     
     return result
 
 
+# ==========================================================
+# ✅ Estado de geocerca actual por dispositivo (proyección)
+# ==========================================================
+def get_device_current_geofence(DB: Session, device_id: str) -> dict | None:
+    """
+    Retrieve only the geofence state of the device's most recent GPS point.
+    
+    Projects the three geofence columns (+ Timestamp) instead of loading the
+    whole row; with idx_gps_device_ts_geofence this is an index-only scan.
+    """
+    row = DB.execute(_DEVICE_GEOFENCE_STMT, {"device_id": device_id}).first()
+    
+    if not row:
+        return None
+    
+    return {
+        "CurrentGeofenceID": row.CurrentGeofenceID,
+        "CurrentGeofenceName": row.CurrentGeofenceName,
+        "GeofenceEventType": row.GeofenceEventType,
+        "Timestamp": row.Timestamp
+    }
+
+
 # ==========================================================
 # ✅ Obtener GPS más antiguo por dispositivo
 # ==========================================================
 def get_oldest_gps_row_by_device(DB: Session, device_id: str, include_id: bool = False) -> dict | None:
-    row = (
-        DB.query(GPS_data)
-        .filter(GPS_data.DeviceID == device_id)
-        .order_by(GPS_data.id.asc())
-        .first()
-    )
+    row = DB.execute(_OLDEST_GPS_ROW_STMT, {"device_id": device_id}).first()
     return serialize_gps_row(row, include_id=include_id)
 
 
@@ -82,50 +332,101 @@ def get_gps_data_in_range_by_device(
     end_time: datetime,
     include_id: bool = False
 ) -> list[dict]:
-    rows = (
-        DB.query(GPS_data)
-        .filter(
-            GPS_data.DeviceID == device_id,
+    """
+    GPS history of one device in the half-open range [start_time, end_time),
+    ordered chronologically.
+    """
+    rows = DB.execute(
+        _RANGE_BY_DEVICE_STMT,
+        {"device_id": device_id, "start_time": start_time, "end_time": end_time}
+    ).all()
+    return serialize_many(rows, include_id=include_id)
+
+
+# ==========================================================
+# ✅ Histórico de varios dispositivos en un solo query
+# ==========================================================
+def get_gps_data_in_range_by_devices(
+    DB: Session,
+    device_ids: Sequence[str],
+    start_time: datetime,
+    end_time: datetime,
+    include_id: bool = False
+) -> dict[str, list[dict]]:
+    """
+    Retrieve GPS history for several devices with ONE query
+    (DeviceID IN (...)), bucketed by device in Python.
+    
+    Use this instead of looping get_gps_data_in_range_by_device()
+    over a list of devices (N round-trips → 1). The range is half-open:
+    [start_time, end_time).
+    
+    Returns:
+        dict: {device_id: [gps, ...]} ordered chronologically per device;
+        devices without points in the range are omitted
+    """
+    if not device_ids:
+        return {}
+
+    # Proyección Core (Row), sin hidratar entidades ORM
+    rows = DB.execute(
+        select(*_GPS_ROW_COLUMNS)
+        .where(
+            GPS_data.DeviceID.in_(device_ids),
             GPS_data.Timestamp >= start_time,
-            GPS_data.Timestamp <= end_time
+            GPS_data.Timestamp < end_time
         )
-        .order_by(GPS_data.Timestamp.asc())
-        .all()
-    )
-    return serialize_many(rows, include_id=include_id)
+        .order_by(GPS_data.DeviceID, GPS_data.Timestamp.asc())
+    ).all()
+    return {
+        device_id: serialize_many(list(group), include_id=include_id)
+        for device_id, group in groupby(rows, key=attrgetter('DeviceID'))
+    }
 
 
 # ==========================================================
 # ✅ Listar todos los dispositivos que han reportado GPS
 # ==========================================================
+def _invalidate_device_list_if_new(device_ids: Iterable[str]) -> None:
+    """
+    Descarta la lista cacheada de get_all_devices si alguno de estos
+    devices no está en ella (primer GPS de un device nuevo). Los devices
+    ya conocidos no la tocan: el caché sobrevive a la ingesta normal.
+    """
+    cached = device_list_cache.get('all')
+    if cached is not None and not set(device_ids).issubset(cached):
+        device_list_cache.invalidate('all')
+
+
 def get_all_devices(DB: Session) -> list[str]:
-    result = DB.query(GPS_data.DeviceID).distinct().all()
-    return [row[0] for row in result]
+    """
+    DeviceIDs that have reported at least one GPS point.
+    
+    Reads last_gps_by_device (one row per device) instead of a DISTINCT
+    scan over gps_data, and memoizes the list for DEVICE_LIST_CACHE_TTL_S:
+    the set only changes when a new device reports for the first time.
+    """
+    cached = device_list_cache.get('all')
+    if cached is not None:
+        return list(cached)
+
+    devices = DB.scalars(select(LastGpsByDevice.DeviceID)).all()
+    device_list_cache.set('all', tuple(devices))
+    return devices
 
 
 # ==========================================================
 # ✅ Obtener última posición de todos los dispositivos
 # ==========================================================
 def get_last_gps_all_devices(DB: Session, include_id: bool = False) -> dict[str, dict]:
-    from sqlalchemy import func, and_
-    
-    subq = (
-        DB.query(
-            GPS_data.DeviceID,
-            func.max(GPS_data.id).label('max_id')
-        )
-        .group_by(GPS_data.DeviceID)
-        .subquery()
-    )
+    """
+    Latest GPS point of every device.
     
-    rows = (
-        DB.query(GPS_data)
-        .join(subq, and_(
-            GPS_data.DeviceID == subq.c.DeviceID,
-            GPS_data.id == subq.c.max_id
-        ))
-        .all()
-    )
+    Reads last_gps_by_device (one row per device, maintained by a trigger
+    on gps_data) instead of aggregating over gps_data: O(devices), not
+    O(total rows).
+    """
+    rows = DB.query(LastGpsByDevice).all()
     
     result = {}
     for row in rows:
@@ -136,44 +437,411 @@ def get_last_gps_all_devices(DB: Session, include_id: bool = False) -> dict[str,
     return result
 
 
+# Último punto por device en una sola pasada (loose scan sobre
+# idx_gps_device_id_covering), sin GROUP BY + self-join; columnas de
+# _last_gps_row_dict (get_last_gps_rows_by_devices)
+_LAST_GPS_ROWS_BY_DEVICES_STMT = (
+    select(*_LAST_GPS_COLUMNS)
+    .distinct(GPS_data.DeviceID)
+    .order_by(GPS_data.DeviceID, GPS_data.id.desc())
+)
+
+
+# ==========================================================
+# ✅ Particiones mensuales de gps_data
+# ==========================================================
+def ensure_gps_partitions(DB: Session, months_ahead: int = 2) -> list[str]:
+    """
+    Create the monthly gps_data partitions from the current month up to
+    `months_ahead` months later (gsms_create_gps_partition is idempotent).
+    
+    Keeps new rows out of gps_data_default so time-range queries
+    (get_gps_data_in_range & co.) get partition pruning. If the default
+    partition already holds rows of a month, the SQL function moves them
+    into the new partition.
+    
+    Returns:
+        list[str]: Partition names that exist after the call
+    """
+    partitions = []
+    now = datetime.now(timezone.utc)
+    for offset in range(months_ahead + 1):
+        year, month = divmod(now.month - 1 + offset, 12)
+        month_start = date(now.year + year, month + 1, 1)
+        try:
+            name = DB.execute(
+                select(func.gsms_create_gps_partition(month_start))
+            ).scalar()
+            DB.commit()
+            partitions.append(name)
+        except Exception:
+            DB.rollback()
+            logger.exception("ensure_gps_partitions: could not create partition for %s", f"{month_start:%Y-%m}")
+    return partitions
+
+
 # ==========================================================
 # ✅ Verificar si un dispositivo tiene datos GPS
 # ==========================================================
 def device_has_gps_data(DB: Session, device_id: str) -> bool:
-    count = (
-        DB.query(GPS_data)
-        .filter(GPS_data.DeviceID == device_id)
-        .limit(1)
-        .count()
-    )
-    return count > 0
+    # SELECT EXISTS(...): corta en la primera entrada del índice, sin count(*)
+    return DB.execute(_DEVICE_HAS_GPS_STMT, {"device_id": device_id}).scalar()
 
 
 """
 created_gps_data to create a new GPS data row
 """
-def created_gps_data(DB: Session, gps_data: GpsData_create):
-    new_gps_data = GPS_data(**gps_data.model_dump(exclude_unset=True))
-    DB.add(new_gps_data)
-    DB.commit()
-    DB.refresh(new_gps_data)
+def created_gps_data(
+    DB: Session,
+    gps_data: GpsData_create,
+    commit: bool = True,
+    increment_trip_points: bool = False
+):
+    # commit=False deja el INSERT en la transacción del caller (insert_data
+    # hace un solo commit por paquete); si ese commit falla, el caller debe
+    # invalidar last_gps_cache del device.
+    # INSERT ... RETURNING: la fila (con id) vuelve en el mismo round-trip,
+    # sin el SELECT extra de DB.refresh() ni el unit-of-work del add()
+    values = gps_data.model_dump(exclude_unset=True)
+    stmt = insert(GPS_data).values(**values).returning(GPS_data)
+
+    if increment_trip_points and values.get('trip_id'):
+        # CTE escribible: el INSERT y el point_count += 1 del trip van en un
+        # solo statement (sin el UPDATE aparte de increment_point_count).
+        # La FK trip_id → trips garantiza que el UPDATE encuentra el trip.
+        inserted = insert(GPS_data).values(**values).returning(*GPS_data.__table__.c).cte('ins')
+        trip_update = (
+            update(Trip)
+            .where(Trip.trip_id == inserted.c.trip_id)
+            .values(point_count=Trip.point_count + 1)
+            .cte('trip_update')
+        )
+        stmt = select(GPS_data).from_statement(select(inserted).add_cte(trip_update))
+
+    new_gps_data = DB.execute(stmt).scalar_one()
+    # Desacoplar antes del commit: los atributos de RETURNING quedan cargados
+    # y el commit no los expira (leer .id después no dispara otro SELECT)
+    DB.expunge(new_gps_data)
+    if commit:
+        DB.commit()
+
+    # Write-through: el recién insertado es el último por id del dispositivo
+    ts = new_gps_data.Timestamp
+    last_gps_cache.set(new_gps_data.DeviceID, {
+        "id": new_gps_data.id,
+        "DeviceID": new_gps_data.DeviceID,
+        "Latitude": new_gps_data.Latitude,
+        "Longitude": new_gps_data.Longitude,
+        "Altitude": new_gps_data.Altitude,
+        "Accuracy": new_gps_data.Accuracy,
+        "Timestamp": ts.isoformat() if ts is not None else None,
+        "CurrentGeofenceID": new_gps_data.CurrentGeofenceID,
+        "CurrentGeofenceName": new_gps_data.CurrentGeofenceName,
+        "GeofenceEventType": new_gps_data.GeofenceEventType
+    })
+    _invalidate_device_list_if_new((new_gps_data.DeviceID,))
     return new_gps_data
 
 
+"""
+created_gps_data_bulk to insert many GPS rows in one statement
+"""
+def created_gps_data_bulk(DB: Session, batch: Sequence[GpsData_create]) -> int:
+    """
+    Insert a batch of GPS points with a single multi-row INSERT and one commit.
+    
+    Duplicates of (DeviceID, Timestamp) — e.g. a retransmitted UDP packet —
+    are skipped via ON CONFLICT DO NOTHING on unique_device_timestamp.
+    No refresh: callers of the ingest path don't need the generated ids.
+    
+    If the batch fails with any other IntegrityError (e.g. a trip_id that no
+    longer exists), it falls back to one insert per row so a single bad row
+    doesn't drop the whole batch.
+    
+    Returns:
+        int: Number of rows actually inserted
+    """
+    return len(insert_gps_rows_bulk(DB, batch))
+
+
+def insert_gps_rows_bulk(DB: Session, batch: Sequence[GpsData_create]) -> list[Optional[str]]:
+    """
+    Same as created_gps_data_bulk, but returns the trip_id of every row
+    actually inserted (RETURNING trip_id), so callers can update per-trip
+    counters for exactly the rows that were written.
+    """
+    return _insert_gps_rows_returning(DB, batch, GPS_data.trip_id)
+
+
+def created_gps_data_bulk_ids(DB: Session, batch: Sequence[GpsData_create]) -> list[int]:
+    """
+    Same as created_gps_data_bulk, but returns the generated ids of the rows
+    actually inserted (RETURNING id), in the same round-trip as the INSERT.
+    """
+    return _insert_gps_rows_returning(DB, batch, GPS_data.id)
+
+
+def _insert_gps_rows_returning(DB: Session, batch: Sequence[GpsData_create], returning_column) -> list:
+    """
+    Multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING <returning_column>.
+    
+    SQLAlchemy's insertmanyvalues renders the executemany as batched
+    multi-row VALUES statements (psycopg2), so RETURNING doesn't force one
+    statement per row.
+    """
+    if not batch:
+        return []
+
+    # model_dump() completo (no exclude_unset): executemany exige las mismas
+    # claves en todas las filas; los opcionales no enviados quedan en NULL
+    rows = [d.model_dump() for d in batch]
+    stmt = (
+        pg_insert(GPS_data)
+        .on_conflict_do_nothing(index_elements=['DeviceID', 'Timestamp'])
+        .returning(returning_column)
+    )
+
+    device_ids = {row['DeviceID'] for row in rows}
+    try:
+        try:
+            inserted = DB.execute(stmt, rows).scalars().all()
+            DB.commit()
+            return list(inserted)
+        except IntegrityError as e:
+            DB.rollback()
+            logger.debug("created_gps_data_bulk: batch of %d failed, retrying per row: %s", len(rows), e.orig)
+
+        inserted = []
+        skipped = 0
+        first_error = None
+        for row in rows:
+            try:
+                inserted.extend(DB.execute(stmt, [row]).scalars().all())
+                DB.commit()
+            except IntegrityError as e:
+                DB.rollback()
+                skipped += 1
+                first_error = first_error or e.orig
+                logger.debug(
+                    "created_gps_data_bulk: skipped %s @ %s: %s",
+                    row.get('DeviceID'), row.get('Timestamp'), e.orig
+                )
+
+        # Un solo aviso por lote (p.ej. 500 filas con un trip_id obsoleto)
+        if skipped:
+            logger.warning(
+                "created_gps_data_bulk: skipped %d of %d rows after per-row retry (first error: %s)",
+                skipped, len(rows), first_error
+            )
+        return inserted
+    finally:
+        # Tras el commit: el último por id de cada dispositivo cambió. Invalidar
+        # antes dejaría que una lectura concurrente recachee la fila anterior
+        for device_id in device_ids:
+            last_gps_cache.invalidate(device_id)
+        _invalidate_device_list_if_new(device_ids)
+
+
+# Columnas que escribe bulk_copy_gps_data (todas menos id, que asigna la secuencia)
+_COPY_GPS_COLUMNS = (
+    'DeviceID', 'trip_id', 'Latitude', 'Longitude', 'Altitude', 'Accuracy',
+    'Timestamp', 'CurrentGeofenceID', 'CurrentGeofenceName', 'GeofenceEventType'
+)
+
+
+class _CopyStream(io.RawIOBase):
+    """
+    File-like de solo lectura sobre un iterador de líneas CSV, para que
+    copy_expert consuma las filas a medida que se generan (sin armar
+    todo el archivo en memoria).
+    """
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line.encode('utf-8')
+
+        if size < 0:
+            chunk, self._buffer = self._buffer, b''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def _gps_csv_lines(rows: Iterable[Mapping[str, Any]], device_ids: set[str]) -> Iterator[str]:
+    """
+    Líneas CSV (orden de _COPY_GPS_COLUMNS) para COPY, una por fila.
+    Acepta 'geofence' anidado (formato serializado) y anota cada DeviceID
+    en device_ids.
+    """
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+
+    for row in rows:
+        values = dict(row)
+        geofence = values.pop('geofence', None)
+        if geofence:
+            values['CurrentGeofenceID'] = geofence.get('id')
+            values['CurrentGeofenceName'] = geofence.get('name')
+            values['GeofenceEventType'] = geofence.get('event')
+
+        ts = values.get('Timestamp')
+        if isinstance(ts, datetime):
+            values['Timestamp'] = ts.isoformat()
+
+        device_ids.add(values['DeviceID'])
+        writer.writerow([values.get(col) for col in _COPY_GPS_COLUMNS])
+
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+
+
+def bulk_copy_gps_data(DB: Session, rows: Iterable[Mapping[str, Any]]) -> int:
+    """
+    Carga masiva de puntos GPS con COPY ... FROM STDIN (restauración,
+    réplica o backfill de históricos). Es la vía de escritura más rápida
+    de PostgreSQL: sin parsear un INSERT por fila.
+    
+    Acepta dicts con las columnas de gps_data (como GpsData_create) o los
+    dicts serializados de iter_gps_for_device() (con 'geofence' anidado),
+    de modo que un export puede reinsertarse directamente. Las filas se
+    consumen en streaming.
+    
+    Nota: COPY no tiene ON CONFLICT; un (DeviceID, Timestamp) duplicado
+    aborta toda la carga (rollback).
+    
+    Returns:
+        int: Número de filas copiadas
+    """
+    device_ids: set[str] = set()
+    count = 0
+
+    def csv_lines() -> Iterator[str]:
+        nonlocal count
+        for line in _gps_csv_lines(rows, device_ids):
+            count += 1
+            yield line
+
+    columns = ', '.join(f'"{col}"' for col in _COPY_GPS_COLUMNS)
+    sql = f'COPY gps_data ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    try:
+        cursor = DB.connection().connection.cursor()
+        try:
+            cursor.copy_expert(sql, _CopyStream(csv_lines()))
+        finally:
+            cursor.close()
+        DB.commit()
+    except Exception:
+        DB.rollback()
+        raise
+    finally:
+        for device_id in device_ids:
+            last_gps_cache.invalidate(device_id)
+        _invalidate_device_list_if_new(device_ids)
+
+    return count
+
+
+# Staging por conexión para copy_gps_rows_bulk (ON COMMIT DELETE ROWS:
+# queda vacía al terminar cada transacción)
+_COPY_STAGE_COLUMNS = ', '.join(f'"{col}"' for col in _COPY_GPS_COLUMNS)
+_CREATE_COPY_STAGE_SQL = (
+    'CREATE TEMP TABLE IF NOT EXISTS gps_data_stage ON COMMIT DELETE ROWS AS '
+    f'SELECT {_COPY_STAGE_COLUMNS} FROM gps_data WITH NO DATA'
+)
+_COPY_STAGE_SQL = f'COPY gps_data_stage ({_COPY_STAGE_COLUMNS}) FROM STDIN WITH (FORMAT csv)'
+_INSERT_FROM_STAGE_SQL = (
+    f'INSERT INTO gps_data ({_COPY_STAGE_COLUMNS}) '
+    f'SELECT {_COPY_STAGE_COLUMNS} FROM gps_data_stage '
+    'ON CONFLICT ("DeviceID", "Timestamp") DO NOTHING '
+    'RETURNING trip_id'
+)
+
+
+def copy_gps_rows_bulk(DB: Session, batch: Sequence[GpsData_create]) -> list[Optional[str]]:
+    """
+    Same contract as insert_gps_rows_bulk (RETURNING trip_id of the rows
+    actually inserted), loading the batch with COPY instead of INSERT.
+    
+    COPY has no ON CONFLICT, so rows go to a temp staging table first and
+    then INSERT ... SELECT ... ON CONFLICT DO NOTHING moves them into
+    gps_data: duplicates are skipped instead of aborting the load. Worth
+    it for large batches (UDP_BATCH_COPY_MIN_ROWS); small ones are cheaper
+    as a multi-row INSERT.
+    
+    Raises on any error (after rollback); callers may retry the batch
+    with insert_gps_rows_bulk.
+    """
+    if not batch:
+        return []
+
+    device_ids: set[str] = set()
+    try:
+        DB.execute(text(_CREATE_COPY_STAGE_SQL))
+        cursor = DB.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                _COPY_STAGE_SQL,
+                _CopyStream(_gps_csv_lines((d.model_dump() for d in batch), device_ids))
+            )
+        finally:
+            cursor.close()
+        inserted = DB.execute(text(_INSERT_FROM_STAGE_SQL)).scalars().all()
+        DB.commit()
+    except Exception:
+        DB.rollback()
+        raise
+    finally:
+        for device_id in device_ids:
+            last_gps_cache.invalidate(device_id)
+        _invalidate_device_list_if_new(device_ids)
+
+    return list(inserted)
+
+
 """
 update_gps_data to update GPS data row by ID
 """
 def update_gps_data(DB: Session, gps_data_id: int, gps_data: GpsData_update):
-    db_gps_data = DB.query(GPS_data).filter(GPS_data.id == gps_data_id).first()
-    if not db_gps_data:
-        return None
-
     update_data = gps_data.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_gps_data, key, value)
+    if not update_data:
+        # PATCH vacío: mismo contrato que el UPDATE (fila actual, desacoplada)
+        db_gps_data = DB.get(GPS_data, gps_data_id, populate_existing=True)
+        if db_gps_data is not None:
+            DB.expunge(db_gps_data)
+        return db_gps_data
 
+    # UPDATE ... RETURNING: sin SELECT previo de la fila
+    db_gps_data = DB.execute(
+        update(GPS_data)
+        .where(GPS_data.id == gps_data_id)
+        .values(**update_data)
+        .returning(GPS_data)
+        # Si la instancia ya está en el identity map (p.ej. cargada por el
+        # caller), se sobrescribe con los valores de RETURNING
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if db_gps_data is None:
+        return None
+
+    DB.expunge(db_gps_data)
     DB.commit()
-    DB.refresh(db_gps_data)
+    if 'DeviceID' in update_data:
+        # Se desconoce el device anterior sin el SELECT: invalidar todo (operación admin poco frecuente)
+        last_gps_cache.clear()
+    else:
+        last_gps_cache.invalidate(db_gps_data.DeviceID)
     return db_gps_data
 
 
@@ -181,12 +849,18 @@ def update_gps_data(DB: Session, gps_data_id: int, gps_data: GpsData_update):
 delete_gps_data to delete GPS data row by ID
 """
 def delete_gps_data(DB: Session, gps_data_id: int):
-    db_gps_data = DB.query(GPS_data).filter(GPS_data.id == gps_data_id).first()
-    if db_gps_data is None:
+    # DELETE ... RETURNING: el DeviceID para invalidar el caché sin SELECT previo
+    device_id = DB.execute(
+        delete(GPS_data)
+        .where(GPS_data.id == gps_data_id)
+        .returning(GPS_data.DeviceID)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if device_id is None:
         return None
-    DB.delete(db_gps_data)
     DB.commit()
-    return db_gps_data.id
+    last_gps_cache.invalidate(device_id)
+    return gps_data_id
 
 
 # ==========================================================
@@ -202,22 +876,21 @@ def get_gps_data_in_range(
     [LEGACY] Retrieve GPS data in time range from ALL devices.
     
     ⚠️ WARNING: Returns mixed GPS data from all devices.
-    For device-specific history, use get_gps_data_in_range_by_device().
+    For device-specific history, use get_gps_data_in_range_by_device(),
+    or get_gps_data_in_range_by_devices() for a known set of devices
+    (one query; don't loop the single-device function).
     
     Use only for:
     - Administrative exports
     - Global monitoring dashboards
     - Debugging
+    
+    The range is half-open: [start_time, end_time).
     """
-    rows = (
-        DB.query(GPS_data)
-        .filter(
-            GPS_data.Timestamp >= start_time, 
-            GPS_data.Timestamp <= end_time
-        )
-        .order_by(GPS_data.Timestamp.asc())
-        .all()
-    )
+    # Para rangos grandes usar iter_gps_data_in_range (streaming)
+    rows = DB.execute(
+        _RANGE_STMT, {"start_time": start_time, "end_time": end_time}
+    ).all()
     return serialize_many(rows, include_id=include_id)
 
 
@@ -228,15 +901,7 @@ def get_global_oldest_gps(DB: Session) -> dict | None:
     """
     Obtiene el GPS más antiguo de TODOS los devices activos.
     """
-    from src.Models.device import Device
-    
-    row = (
-        DB.query(GPS_data)
-        .join(Device, GPS_data.DeviceID == Device.DeviceID)
-        .filter(Device.IsActive == True)
-        .order_by(GPS_data.Timestamp.asc())
-        .first()
-    )
+    row = DB.execute(_GLOBAL_OLDEST_STMT).first()
     return serialize_gps_row(row, include_id=False)
 
 
@@ -244,32 +909,136 @@ def get_global_newest_gps(DB: Session) -> dict | None:
     """
     Obtiene el GPS más reciente de TODOS los devices activos.
     """
-    from src.Models.device import Device
-    
-    row = (
-        DB.query(GPS_data)
-        .join(Device, GPS_data.DeviceID == Device.DeviceID)
-        .filter(Device.IsActive == True)
-        .order_by(GPS_data.Timestamp.desc())
-        .first()
-    )
+    row = DB.execute(_GLOBAL_NEWEST_STMT).first()
     return serialize_gps_row(row, include_id=False)
 
 
+def get_device_gps_timespan(
+    DB: Session,
+    device_id: str
+) -> tuple[datetime | None, datetime | None]:
+    """
+    Obtiene (MIN, MAX) de Timestamp de un device en un solo query.
+    
+    Con el índice (DeviceID, Timestamp) ambos extremos salen del mismo
+    índice, en vez de dos queries separados (oldest + newest).
+    
+    Returns:
+        (oldest, newest): (None, None) si el device no tiene GPS
+    """
+    row = DB.execute(_DEVICE_TIMESPAN_STMT, {"device_id": device_id}).one()
+    return row[0], row[1]
+
+
+def get_global_gps_timespan(DB: Session) -> tuple[datetime | None, datetime | None]:
+    """
+    Obtiene (MIN, MAX) de Timestamp sobre TODOS los devices activos en un
+    solo query (reemplaza get_global_oldest_gps + get_global_newest_gps
+    cuando solo se necesitan los timestamps).
+    
+    Returns:
+        (oldest, newest): (None, None) si no hay GPS
+    """
+    row = DB.execute(_GLOBAL_TIMESPAN_STMT).one()
+    return row[0], row[1]
+
+
 def get_all_gps_for_device(DB: Session, device_id: str) -> list[dict]:
     """
     Obtiene TODO el historial GPS de un device (sin filtro temporal).
-    Úsalo con cuidado en devices con mucha data.
+    Úsalo con cuidado en devices con mucha data; para exportar usa
+    iter_gps_for_device().
+    
+    Lectura simple (sin cursor del lado del servidor): funciona también con
+    ReadSessionLocal / get_read_DB.
     """
-    rows = (
-        DB.query(GPS_data)
-        .filter(GPS_data.DeviceID == device_id)
+    rows = DB.execute(
+        select(*_GPS_ROW_COLUMNS)
+        .where(GPS_data.DeviceID == device_id)
         .order_by(GPS_data.Timestamp.asc())
-        .all()
-    )
+    ).all()
     return serialize_many(rows, include_id=False)
 
 
+def iter_gps_for_device(
+    DB: Session,
+    device_id: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    include_id: bool = False,
+    chunk_size: int = 10_000
+) -> Iterator[dict]:
+    """
+    Genera el historial GPS de un device (opcionalmente acotado en el
+    tiempo, rango semiabierto [start_time, end_time)) serializado punto
+    a punto, sin materializar el resultado.
+    
+    stream_results usa un cursor del lado del servidor (psycopg2 named
+    cursor) y yield_per trae `chunk_size` filas por vez: la memoria es
+    O(chunk), no O(filas). Requiere una sesión transaccional
+    (SessionLocal), no ReadSessionLocal: los named cursors no funcionan
+    en AUTOCOMMIT.
+    """
+    stmt = select(*_GPS_ROW_COLUMNS).where(GPS_data.DeviceID == device_id)
+    if start_time is not None:
+        stmt = stmt.where(GPS_data.Timestamp >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(GPS_data.Timestamp < end_time)
+    stmt = stmt.order_by(GPS_data.Timestamp.asc())
+
+    yield from _iter_serialized(DB, stmt, include_id, chunk_size)
+
+
+def iter_gps_data_in_range(
+    DB: Session,
+    start_time: datetime,
+    end_time: datetime,
+    include_id: bool = False,
+    chunk_size: int = 10_000
+) -> Iterator[dict]:
+    """
+    Versión streaming de get_gps_data_in_range (todos los devices).
+    Misma restricción de sesión que iter_gps_for_device.
+    """
+    stmt = (
+        select(*_GPS_ROW_COLUMNS)
+        .where(GPS_data.Timestamp >= start_time, GPS_data.Timestamp < end_time)
+        .order_by(GPS_data.Timestamp.asc())
+    )
+    yield from _iter_serialized(DB, stmt, include_id, chunk_size)
+
+
+def iter_gps_by_trip_id(
+    DB: Session,
+    trip_id: str,
+    include_id: bool = False,
+    chunk_size: int = 10_000
+) -> Iterator[dict]:
+    """
+    Versión streaming de get_gps_by_trip_id.
+    Misma restricción de sesión que iter_gps_for_device.
+    """
+    stmt = (
+        select(*_GPS_ROW_COLUMNS)
+        .where(GPS_data.trip_id == trip_id)
+        .order_by(GPS_data.Timestamp.asc())
+    )
+    yield from _iter_serialized(DB, stmt, include_id, chunk_size)
+
+
+def _iter_serialized(DB: Session, stmt, include_id: bool, chunk_size: int) -> Iterator[dict]:
+    """
+    Ejecuta `stmt` con cursor del lado del servidor y serializa por bloques
+    de `chunk_size` filas (serialize_many, camino rápido para Row).
+    """
+    result = DB.execute(
+        stmt,
+        execution_options={'stream_results': True, 'yield_per': chunk_size}
+    )
+    for chunk in result.partitions():
+        yield from serialize_many(chunk, include_id=include_id)
+
+
 # ==========================================================
 # 🆕 FASE 4: Query GPS por trip_id
 # ==========================================================
@@ -297,12 +1066,8 @@ def get_gps_by_trip_id(DB: Session, trip_id: str, include_id: bool = False) -> l
         >>> # Draw polyline on map
         >>> polyline = [(p['Latitude'], p['Longitude']) for p in gps_points]
     """
-    rows = (
-        DB.query(GPS_data)
-        .filter(GPS_data.trip_id == trip_id)
-        .order_by(GPS_data.Timestamp.asc())
-        .all()
-    )
+    # Para trips muy largos usar iter_gps_by_trip_id (streaming)
+    rows = DB.execute(_BY_TRIP_STMT, {"trip_id": trip_id}).all()
     return serialize_many(rows, include_id=include_id)
 
 
@@ -326,11 +1091,7 @@ def count_gps_by_trip_id(DB: Session, trip_id: str) -> int:
         >>> if count != trip.point_count:
         ...     print("⚠️ Inconsistency detected!")
     """
-    return (
-        DB.query(GPS_data)
-        .filter(GPS_data.trip_id == trip_id)
-        .count()
-    )
+    return DB.scalar(_COUNT_BY_TRIP_STMT, {"trip_id": trip_id})
 
 #######################################################
 
@@ -374,6 +1135,26 @@ def calculate_bounding_box(
         - 1 degree latitude ≈ 111,320 meters (constant)
         - 1 degree longitude ≈ 111,320 * cos(latitude) meters (varies)
         - This is faster than PostGIS for initial filtering
+        - The deltas are memoized per (lat, lon, radius); a fresh dict is
+          returned on every call so callers may mutate it
+    """
+    lat_min, lat_max, lon_min, lon_max = _bounding_box(center_lat, center_lon, radius_meters)
+    return {
+        'lat_min': lat_min,
+        'lat_max': lat_max,
+        'lon_min': lon_min,
+        'lon_max': lon_max
+    }
+
+
+@lru_cache(maxsize=4096)
+def _bounding_box(
+    center_lat: float,
+    center_lon: float,
+    radius_meters: float
+) -> tuple[float, float, float, float]:
+    """
+    Memoized core of calculate_bounding_box: (lat_min, lat_max, lon_min, lon_max).
     """
     # Earth constants
     METERS_PER_DEGREE_LAT = 111320.0  # Approximately constant
@@ -391,12 +1172,37 @@ def calculate_bounding_box(
         # Near poles, use large delta
         lon_delta = 180.0
     
-    return {
-        'lat_min': center_lat - lat_delta,
-        'lat_max': center_lat + lat_delta,
-        'lon_min': center_lon - lon_delta,
-        'lon_max': center_lon + lon_delta
-    }
+    return (
+        center_lat - lat_delta,
+        center_lat + lat_delta,
+        center_lon - lon_delta,
+        center_lon + lon_delta
+    )
+
+
+# Más celdas que esto y el IN deja de ganarle al índice (Latitude, Longitude)
+GEOHASH_MAX_CELLS = 64
+
+
+def _bbox_conditions(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> list:
+    """
+    WHERE de un bounding box: geohash7 IN (celdas que lo cubren) como
+    predicado líder cuando el bbox es chico, más el rango numérico exacto
+    (las celdas exceden el bbox en los bordes).
+    """
+    conditions = []
+    cells = cells_covering_bbox(
+        lat_min, lat_max, lon_min, lon_max,
+        precision=GPS_GEOHASH_PRECISION,
+        max_cells=GEOHASH_MAX_CELLS
+    )
+    if cells:
+        conditions.append(GPS_data.geohash7.in_(cells))
+    conditions.extend((
+        GPS_data.Latitude.between(lat_min, lat_max),
+        GPS_data.Longitude.between(lon_min, lon_max)
+    ))
+    return conditions
 
 
 def get_gps_in_bounding_box(
@@ -421,13 +1227,14 @@ def get_gps_in_bounding_box(
         lon_min, lon_max: Longitude bounds
         device_id: Optional device filter
         start_time: Optional start time filter
-        end_time: Optional end time filter
+        end_time: Optional end time filter (exclusive)
     
     Returns:
         list[GPS_data]: GPS points in bounding box
     
     Performance:
-        - Uses B-tree indexes on Latitude/Longitude
+        - Small boxes: geohash7 IN (covering cells) on idx_gps_geohash7
+        - Otherwise: B-tree index on (Latitude, Longitude)
         - Typically reduces dataset by 95%+
         - Query time: O(log N)
     
@@ -442,10 +1249,7 @@ def get_gps_in_bounding_box(
         ... )
     """
     query = DB.query(GPS_data).filter(
-        GPS_data.Latitude >= lat_min,
-        GPS_data.Latitude <= lat_max,
-        GPS_data.Longitude >= lon_min,
-        GPS_data.Longitude <= lon_max
+        *_bbox_conditions(lat_min, lat_max, lon_min, lon_max)
     )
     
     # Optional filters
@@ -456,11 +1260,45 @@ def get_gps_in_bounding_box(
         query = query.filter(GPS_data.Timestamp >= start_time)
     
     if end_time:
-        query = query.filter(GPS_data.Timestamp <= end_time)
+        query = query.filter(GPS_data.Timestamp < end_time)
     
     return query.all()
 
 
+def get_gps_coords_in_bounding_box(
+    DB: Session,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    device_id: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> list[tuple[str, float, float]]:
+    """
+    Same filter as get_gps_in_bounding_box, projected to (trip_id, Latitude,
+    Longitude) tuples of points that belong to a trip.
+    
+    No ORM entities are built: rows are plain tuples with fixed positions,
+    fetched in chunks (yield_per) for large candidate sets.
+    """
+    stmt = select(GPS_data.trip_id, GPS_data.Latitude, GPS_data.Longitude).where(
+        GPS_data.trip_id.is_not(None),
+        *_bbox_conditions(lat_min, lat_max, lon_min, lon_max)
+    )
+    
+    if device_id:
+        stmt = stmt.where(GPS_data.DeviceID == device_id)
+    
+    if start_time:
+        stmt = stmt.where(GPS_data.Timestamp >= start_time)
+    
+    if end_time:
+        stmt = stmt.where(GPS_data.Timestamp < end_time)
+    
+    return [tuple(row) for row in DB.execute(stmt.execution_options(yield_per=10000))]
+
+
 def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate great-circle distance between two points (Haversine formula).
@@ -499,9 +1337,8 @@ def get_unique_trip_ids_near_location(
     COMPLETE 3-FILTER ALGORITHM: Find trips that pass near a location.
     
     Algorithm:
-        1. FILTER 1: Bounding box (fast, uses indexes)
-        2. FILTER 2: Haversine distance (accurate, in Python)
-        3. FILTER 3: Extract unique trip_ids
+        Single query: ST_DWithin on the geography of each point (GiST index
+        idx_gps_geography) + DISTINCT trip_id, all evaluated in PostgreSQL.
     
     Args:
         DB: SQLAlchemy session
@@ -510,16 +1347,14 @@ def get_unique_trip_ids_near_location(
         radius_meters: Search radius in meters
         device_id: Optional device filter
         start_time: Optional start time filter
-        end_time: Optional end time filter
+        end_time: Optional end time filter (exclusive)
     
     Returns:
         list[str]: Unique trip_ids that have at least one GPS point within radius
     
     Performance:
-        - Filter 1: Reduces 95%+ of points (milliseconds)
-        - Filter 2: Haversine on remaining points (fast in Python)
-        - Filter 3: Set deduplication (instant)
-        - Total time: Usually < 100ms for 10,000 GPS points
+        - Index scan on idx_gps_geography (no Python loop)
+        - Only distinct trip_ids are transferred
     
     Example:
         >>> # Find trips that passed near warehouse
@@ -540,11 +1375,61 @@ def get_unique_trip_ids_near_location(
         - Results are NOT sorted (use in subsequent query)
     """
     # ========================================
-    # FILTER 1: Bounding Box (Fast)
+    # ST_DWithin sobre idx_gps_geography + DISTINCT en SQL
     # ========================================
+    # La distancia se evalúa en PostgreSQL (index-assisted); solo viajan
+    # los trip_id distintos, no los puntos candidatos.
+    center = cast(
+        func.ST_SetSRID(func.ST_MakePoint(float(center_lon), float(center_lat)), 4326),
+        Geography(srid=4326)
+    )
+    
+    stmt = (
+        select(GPS_data.trip_id)
+        .where(
+            GPS_data.trip_id.is_not(None),
+            func.ST_DWithin(literal_column(GPS_GEOGRAPHY_SQL), center, float(radius_meters))
+        )
+        .distinct()
+    )
+    
+    if device_id:
+        stmt = stmt.where(GPS_data.DeviceID == device_id)
+    
+    if start_time:
+        stmt = stmt.where(GPS_data.Timestamp >= start_time)
+    
+    if end_time:
+        stmt = stmt.where(GPS_data.Timestamp < end_time)
+    
+    matching_trip_ids = [str(trip_id) for trip_id in DB.execute(stmt).scalars()]
+    
+    logger.debug("[SPATIAL] ST_DWithin: %d unique trip_ids within %sm", len(matching_trip_ids), radius_meters)
+    
+    return matching_trip_ids
+
+
+def get_unique_trip_ids_near_location_numpy(
+    DB: Session,
+    center_lat: float,
+    center_lon: float,
+    radius_meters: float,
+    device_id: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> list[str]:
+    """
+    Same result as get_unique_trip_ids_near_location without ST_DWithin:
+    bounding box in SQL, Haversine vectorized. Explicit opt-in only (e.g.
+    diagnostics or comparing against the PostGIS path); it is never used as
+    an automatic fallback, since the schema itself requires PostGIS.
+    
+    Fetches only (trip_id, Latitude, Longitude) of the bbox candidates and
+    computes every distance in one NumPy expression instead of a Python loop.
+    """
     bbox = calculate_bounding_box(center_lat, center_lon, radius_meters)
     
-    candidate_points = get_gps_in_bounding_box(
+    rows = get_gps_coords_in_bounding_box(
         DB,
         bbox['lat_min'],
         bbox['lat_max'],
@@ -554,48 +1439,53 @@ def get_unique_trip_ids_near_location(
         start_time=start_time,
         end_time=end_time
     )
+    logger.debug("[SPATIAL] Filter 1 (BBox): %d candidate points", len(rows))
     
-    print(f"[SPATIAL] Filter 1 (BBox): {len(candidate_points)} candidate points")
-    
-    if not candidate_points:
+    if not rows:
         return []
     
-    # ========================================
-    # FILTER 2: Haversine Distance (Accurate)
-    # ========================================
-    matching_trip_ids: set[str] = set()
+    trip_ids, lats, lons = zip(*rows)
+    lat0 = radians(center_lat)
+    lat1 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat1 - lat0
+    dlon = np.radians(np.asarray(lons, dtype=np.float64)) - radians(center_lon)
     
-    for gps in candidate_points:
-        # ✅ CORRECCIÓN: Acceso seguro a atributos ORM
-        trip_id_value = getattr(gps, 'trip_id', None)
-        
-        # Skip GPS without trip_id
-        if trip_id_value is None:
-            continue
-        
-        # ✅ CORRECCIÓN: Cast explícito de valores ORM a float
-        lat_value = float(getattr(gps, 'Latitude', 0.0))
-        lon_value = float(getattr(gps, 'Longitude', 0.0))
-        
-        distance = _haversine_distance(
-            center_lat, center_lon,
-            lat_value, lon_value
-        )
-        
-        if distance <= radius_meters:
-            matching_trip_ids.add(str(trip_id_value))
+    a = np.sin(dlat / 2) ** 2 + cos(lat0) * np.cos(lat1) * np.sin(dlon / 2) ** 2
+    distances = 2 * 6371000 * np.arcsin(np.sqrt(a))
     
-    print(f"[SPATIAL] Filter 2 (Haversine): {len(matching_trip_ids)} unique trip_ids within {radius_meters}m")
+    matching = np.unique(np.asarray(trip_ids, dtype=object)[distances <= radius_meters])
+    logger.debug("[SPATIAL] Filter 2 (Haversine): %d unique trip_ids within %sm", len(matching), radius_meters)
     
-    # ========================================
-    # FILTER 3: Return Unique Trip IDs
-    # ========================================
-    return list(matching_trip_ids)
+    return [str(trip_id) for trip_id in matching]
 
 # ==========================================================
 # 🆕 FASE 2: AGREGACIÓN DE DATOS
 # ==========================================================
 
+# Punto de ruta en formato frontend, construido en SQL (get_full_gps_data_for_trip)
+_TRIP_POINT_JSON = func.json_build_object(
+    'timestamp', func.gsms_utc_iso_seconds(GPS_data.Timestamp),
+    'gps', func.json_build_object(
+        'lat', GPS_data.Latitude,
+        'lon', GPS_data.Longitude
+    ),
+    'geofence', case(
+        (
+            or_(
+                and_(GPS_data.CurrentGeofenceID.is_not(None), GPS_data.CurrentGeofenceID != ''),
+                GPS_data.GeofenceEventType == 'exit'
+            ),
+            func.json_build_object(
+                'id', GPS_data.CurrentGeofenceID,
+                'name', GPS_data.CurrentGeofenceName,
+                'event', GPS_data.GeofenceEventType
+            )
+        ),
+        else_=null()
+    )
+)
+
+
 def get_full_gps_data_for_trip(
     DB: Session,
     trip_id: str
@@ -637,64 +1527,54 @@ def get_full_gps_data_for_trip(
         >>> print(f"Started at ({first_point['gps']['lat']}, {first_point['gps']['lon']})")
     
     Performance:
-        - Uses indexed trip_id column
+        - Uses idx_gps_trip_timestamp (trip_id, Timestamp)
+        - JSON built server-side: one row, no ORM hydration
         - Ordered chronologically for route visualization
-        - Typical time: 10-50ms for 360 points
     
     Notes:
         - Returns empty list if trip has no GPS data
         - Geofence is None if GPS point is outside all geofences
         - Timestamps are normalized to UTC ISO format with 'Z' suffix
     """
-    # Query GPS points for this trip (already uses index)
-    rows = (
-        DB.query(GPS_data)
-        .filter(GPS_data.trip_id == trip_id)
-        .order_by(GPS_data.Timestamp.asc())
-        .all()
+    # El JSON final se construye en PostgreSQL (json_build_object + json_agg):
+    # una sola fila, sin hidratar entidades ORM ni armar dicts en Python.
+    # gsms_utc_iso_seconds() es la misma función que genera
+    # accelerometer_data.Timestamp_iso, así las claves del accel_map coinciden.
+    stmt = (
+        select(
+            func.json_agg(aggregate_order_by(_TRIP_POINT_JSON, GPS_data.Timestamp.asc()))
+        )
+        .where(GPS_data.trip_id == trip_id)
     )
     
-    if not rows:
-        return []
+    # psycopg2 decodifica el json a list[dict]; NULL (sin filas) → []
+    return DB.execute(stmt).scalar() or []
+
+
+def get_full_gps_data_for_trips(
+    DB: Session,
+    trip_ids: Sequence[str]
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    Batch version of get_full_gps_data_for_trip: {trip_id: route points}
+    with one GROUP BY trip_id query for all trips (no N+1).
+    
+    Trips without GPS map to an empty list.
+    """
+    if not trip_ids:
+        return {}
     
-    # Build enriched GPS data
-    result: list[dict[str, Any]] = []
+    rows = DB.execute(
+        select(
+            GPS_data.trip_id,
+            func.json_agg(aggregate_order_by(_TRIP_POINT_JSON, GPS_data.Timestamp.asc()))
+        )
+        .where(GPS_data.trip_id.in_(trip_ids))
+        .group_by(GPS_data.trip_id)
+    )
     
-    for row in rows:
-        # Normalize timestamp to UTC ISO string
-        ts = getattr(row, 'Timestamp', None)
-        timestamp_str = ts.strftime("%Y-%m-%dT%H:%M:%SZ") if ts else None
-        
-        # Extract GPS coordinates
-        lat = float(getattr(row, 'Latitude', 0.0))
-        lon = float(getattr(row, 'Longitude', 0.0))
-        alt = float(getattr(row, 'Altitude', 0.0))
-        acc = float(getattr(row, 'Accuracy', 0.0))
-        
-        # Extract geofence data
-        geo_id = getattr(row, 'CurrentGeofenceID', None)
-        geo_name = getattr(row, 'CurrentGeofenceName', None)
-        geo_event = getattr(row, 'GeofenceEventType', None)
-        
-        # Build geofence object (None if outside all geofences)
-        geofence_data = None
-        if geo_id or geo_event == 'exit':
-            geofence_data = {
-                "id": geo_id,
-                "name": geo_name,
-                "event": geo_event
-            }
-        
-        # Build GPS point
-        point = {
-            "timestamp": timestamp_str,
-            "gps": {
-                "lat": lat,
-                "lon": lon
-            },
-            "geofence": geofence_data
-        }
-        
-        result.append(point)
+    routes: dict[str, list[dict[str, Any]]] = {trip_id: [] for trip_id in trip_ids}
+    for trip_id, points in rows:
+        routes[trip_id] = points or []
     
-    return result
\ No newline at end of file
+    return routes
@@ -15,14 +15,41 @@ Usage:
     active = get_active_trip_by_device(db, "ESP001")
 """
 
+import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, insert, select, update, delete, bindparam
 from datetime import datetime
 from typing import Optional
 
 from src.Models.trip import Trip
 from src.Schemas.trip import Trip_create, Trip_update
 
+logger = logging.getLogger(__name__)
+
+
+# ==========================================================
+# STATEMENTS PRECOMPILADOS
+# ==========================================================
+# Construidos una vez al importar (como en Repositories/gps_data.py):
+# cada llamada solo rebindea parámetros y reutiliza la compilación
+# cacheada. 'active' va como literal del statement: psycopg2 interpola
+# en el cliente y el planner empareja los índices parciales
+# idx_trips_active_device / idx_trips_active_start_time.
+_ACTIVE_TRIP_BY_DEVICE_STMT = (
+    select(Trip)
+    .where(
+        Trip.device_id == bindparam("device_id"),
+        Trip.status == 'active'
+    )
+    .limit(1)
+)
+
+_ALL_ACTIVE_TRIPS_STMT = (
+    select(Trip)
+    .where(Trip.status == 'active')
+    .order_by(Trip.start_time.desc())
+)
+
 # ==========================================================
 # CREATE OPERATIONS
 # ==========================================================
@@ -52,12 +79,19 @@ def create_trip(DB: Session, trip_data: Trip_create) -> Trip:
         >>> print(created.trip_id)
         TRIP_20250102_ESP001_001
     """
-    new_trip = Trip(**trip_data.model_dump(exclude_unset=True))
-    DB.add(new_trip)
+    # INSERT ... RETURNING: created_at y demás defaults del servidor vuelven
+    # en el mismo round-trip, sin el SELECT extra de DB.refresh()
+    new_trip = DB.execute(
+        insert(Trip)
+        .values(**trip_data.model_dump(exclude_unset=True))
+        .returning(Trip)
+    ).scalar_one()
+    # Desacoplar antes del commit para que no expire los atributos cargados
+    DB.expunge(new_trip)
     DB.commit()
-    DB.refresh(new_trip)  # Get auto-generated created_at
     
-    print(f"[REPO] Trip created: {new_trip.trip_id} (device: {new_trip.device_id}, type: {new_trip.trip_type})")
+    # trip_handler ya publica el evento por log_ws: aquí solo debug
+    logger.debug("[REPO] Trip created: %s (device: %s, type: %s)", new_trip.trip_id, new_trip.device_id, new_trip.trip_type)
     
     return new_trip
 
@@ -77,7 +111,7 @@ def get_trip_by_id(DB: Session, trip_id: str) -> Optional[Trip]:
     Returns:
         Trip or None: Trip object if found, None otherwise
     """
-    return DB.query(Trip).filter(Trip.trip_id == trip_id).first()
+    return DB.get(Trip, trip_id)
 
 
 def get_active_trip_by_device(DB: Session, device_id: str) -> Optional[Trip]:
@@ -103,14 +137,7 @@ def get_active_trip_by_device(DB: Session, device_id: str) -> Optional[Trip]:
         ... else:
         ...     print("No active trip")
     """
-    return (
-        DB.query(Trip)
-        .filter(
-            Trip.device_id == device_id,
-            Trip.status == 'active'
-        )
-        .first()
-    )
+    return DB.scalars(_ACTIVE_TRIP_BY_DEVICE_STMT, {"device_id": device_id}).first()
 
 
 # ==========================================================
@@ -192,19 +219,18 @@ def get_all_active_trips(DB: Session) -> list[Trip]:
         - System health monitoring
         - Cleanup operations
     """
-    return (
-        DB.query(Trip)
-        .filter(Trip.status == 'active')
-        .order_by(Trip.start_time.desc())
-        .all()
-    )
+    return list(DB.scalars(_ALL_ACTIVE_TRIPS_STMT))
 
 
 # ==========================================================
 # UPDATE OPERATIONS
 # ==========================================================
 
-def update_trip(DB: Session, trip_id: str, trip_update: Trip_update) -> Optional[Trip]:
+def update_trip(
+    DB: Session,
+    trip_id: str,
+    trip_update: Trip_update
+) -> Optional[Trip]:
     """
     Update an existing trip with new data.
     
@@ -219,6 +245,7 @@ def update_trip(DB: Session, trip_id: str, trip_update: Trip_update) -> Optional
     Notes:
         - Only updates fields present in trip_update (exclude_unset)
         - Triggers updated_at timestamp automatically
+        - Single UPDATE ... RETURNING (no SELECT before, no reload after)
         
     Example:
         >>> update = Trip_update(
@@ -229,21 +256,22 @@ def update_trip(DB: Session, trip_id: str, trip_update: Trip_update) -> Optional
         ... )
         >>> trip = update_trip(db, "TRIP_20250102_ESP001_001", update)
     """
-    db_trip = DB.query(Trip).filter(Trip.trip_id == trip_id).first()
-    
-    if not db_trip:
-        print(f"[REPO] Trip not found: {trip_id}")
-        return None
-    
     # Update only provided fields
     update_data = trip_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_trip, key, value)
+    if not update_data:
+        # No-op update: same contract as the UPDATE path (current row, detached)
+        db_trip = DB.get(Trip, trip_id, populate_existing=True)
+        if db_trip is not None:
+            DB.expunge(db_trip)
+        return db_trip
     
-    DB.commit()
-    DB.refresh(db_trip)
+    db_trip = _update_trip_returning(DB, trip_id, update_data)
+    
+    if db_trip is None:
+        print(f"[REPO] Trip not found: {trip_id}")
+        return None
     
-    print(f"[REPO] Trip updated: {trip_id} ({len(update_data)} fields)")
+    logger.debug("[REPO] Trip updated: %s (%d fields)", trip_id, len(update_data))
     
     return db_trip
 
@@ -275,39 +303,64 @@ def close_trip(
         - Calculates avg_speed if not provided: (distance / duration) * 3.6
         - This is typically called by TripDetector when starting new trip
     """
-    db_trip = DB.query(Trip).filter(Trip.trip_id == trip_id).first()
-    
-    if not db_trip:
-        print(f"[REPO] Cannot close trip - not found: {trip_id}")
-        return None
-    
     # Calculate avg_speed if not provided
     if avg_speed is None and duration > 0:
         # (meters / seconds) * 3.6 = km/h
         avg_speed = (distance / duration) * 3.6
     
-    # ✅ CORRECCIÓN: Usar setattr (consistente con update_trip)
-    setattr(db_trip, 'status', 'closed')
-    setattr(db_trip, 'end_time', end_time)
-    setattr(db_trip, 'distance', distance)
-    setattr(db_trip, 'duration', duration)
-    setattr(db_trip, 'avg_speed', avg_speed)
+    db_trip = _update_trip_returning(DB, trip_id, {
+        'status': 'closed',
+        'end_time': end_time,
+        'distance': distance,
+        'duration': duration,
+        'avg_speed': avg_speed,
+    })
     
-    DB.commit()
-    DB.refresh(db_trip)
+    if db_trip is None:
+        print(f"[REPO] Cannot close trip - not found: {trip_id}")
+        return None
+    
+    logger.debug("[REPO] Trip closed: %s - %.1fm in %.0fs (%s km/h)", trip_id, distance, duration, avg_speed)
     
-    print(f"[REPO] Trip closed: {trip_id} - {distance:.1f}m in {duration:.0f}s ({avg_speed:.2f} km/h)")
+    return db_trip
+
+
+def _update_trip_returning(DB: Session, trip_id: str, values: dict) -> Optional[Trip]:
+    """
+    UPDATE ... RETURNING de un trip y commit (un solo round-trip de escritura).
+
+    Returns:
+        Trip or None: Trip actualizado (desacoplado de la sesión, con los
+        valores del servidor como updated_at), o None si no existe
+    """
+    db_trip = DB.execute(
+        update(Trip)
+        .where(Trip.trip_id == trip_id)
+        .values(**values)
+        .returning(Trip)
+        # Si la instancia ya está en el identity map (p.ej. cargada por el
+        # caller), se sobrescribe con los valores de RETURNING
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    
+    if db_trip is None:
+        return None
     
+    # Expunge antes del commit: los atributos de RETURNING no se expiran
+    DB.expunge(db_trip)
+    DB.commit()
     return db_trip
 
 
-def increment_point_count(DB: Session, trip_id: str) -> bool:
+def increment_point_count(DB: Session, trip_id: str, amount: int = 1, commit: bool = True) -> bool:
     """
     Increment the GPS point counter for a trip.
     
     Args:
         DB: SQLAlchemy session
         trip_id: Trip identifier
+        amount: Points to add (batched ingest adds a whole flush at once)
+        commit: False leaves the UPDATE in the caller's transaction
         
     Returns:
         bool: True if updated, False if trip not found
@@ -324,15 +377,17 @@ def increment_point_count(DB: Session, trip_id: str) -> bool:
         DB.query(Trip)
         .filter(Trip.trip_id == trip_id)
         .update(
-            {Trip.point_count: Trip.point_count + 1},
+            {Trip.point_count: Trip.point_count + amount},
             synchronize_session=False
         )
     )
     
-    DB.commit()
+    if commit:
+        DB.commit()
     
     if result > 0:
-        print(f"[REPO] Trip {trip_id}: point_count incremented")
+        # Una vez por paquete GPS: debug diferido, sin I/O a stdout
+        logger.debug("[REPO] Trip %s: point_count incremented by %d", trip_id, amount)
         return True
     else:
         print(f"[REPO] Cannot increment - trip not found: {trip_id}")
@@ -362,16 +417,21 @@ def delete_trip(DB: Session, trip_id: str) -> bool:
         This is a destructive operation. Historical data is lost.
         Consider archiving before deletion.
     """
-    db_trip = DB.query(Trip).filter(Trip.trip_id == trip_id).first()
-    
-    if not db_trip:
+    # DELETE ... RETURNING: sin SELECT previo del trip
+    deleted_id = DB.execute(
+        delete(Trip)
+        .where(Trip.trip_id == trip_id)
+        .returning(Trip.trip_id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    
+    if deleted_id is None:
         print(f"[REPO] Cannot delete - trip not found: {trip_id}")
         return False
     
-    DB.delete(db_trip)
     DB.commit()
     
-    print(f"[REPO] Trip deleted: {trip_id}")
+    logger.debug("[REPO] Trip deleted: %s", trip_id)
     
     return True
 
@@ -404,10 +464,12 @@ def get_trip_statistics_by_device(
             - total_duration: Sum of all durations (seconds)
             - avg_speed: Average speed across all trips (km/h)
     """
+    # count(*) (no count(trip_id)): todas las columnas leídas están en
+    # idx_trips_closed_stats → index-only scan
     query = DB.query(
-        func.count(Trip.trip_id).label('total_trips'),
-        func.count(Trip.trip_id).filter(Trip.trip_type == 'movement').label('movement_trips'),
-        func.count(Trip.trip_id).filter(Trip.trip_type == 'parking').label('parking_sessions'),
+        func.count().label('total_trips'),
+        func.count().filter(Trip.trip_type == 'movement').label('movement_trips'),
+        func.count().filter(Trip.trip_type == 'parking').label('parking_sessions'),
         func.sum(Trip.distance).label('total_distance'),
         func.sum(Trip.duration).label('total_duration'),
         func.avg(Trip.avg_speed).label('avg_speed')
@@ -462,7 +524,8 @@ def get_trips_in_time_range(
     
     Overlapping Logic:
     - Trip starts BEFORE end_time (trip.start_time < end_time)
-    - Trip ends AFTER start_time OR is still active (trip.end_time > start_time OR trip.end_time IS NULL)
+    - Trip ends AT/AFTER start_time OR is still active (trip.end_time >= start_time OR trip.end_time IS NULL)
+    - Evaluated as trip_range && tstzrange(start_time, end_time, '[)')
     
     Args:
         DB: SQLAlchemy session
@@ -494,21 +557,14 @@ def get_trips_in_time_range(
     
     Notes:
         - Active trips (end_time=NULL) are always included if they started before end_time
-        - Uses indexed columns for optimal performance
+        - Uses the GiST index on (device_id, trip_range)
         - Ordered by start_time DESC (most recent first)
     """
 
-    # Base query
+    # Solapamiento en un solo operador sobre idx_trips_device_range (GiST):
+    # [trip.start_time, trip.end_time o infinity] && [start_time, end_time)
     query = DB.query(Trip).filter(
-        Trip.start_time < end_time  # Trip started before range ends
-    )
-    
-    # Overlapping condition: Trip ends after range starts OR is still active
-    query = query.filter(
-        or_(
-            Trip.end_time > start_time,
-            Trip.end_time.is_(None)  # Active trips
-        )
+        Trip.trip_range.op('&&')(func.tstzrange(start_time, end_time, '[)'))
     )
     
     # Optional filters
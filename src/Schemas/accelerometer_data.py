@@ -25,6 +25,12 @@ class AccelData_base(BaseModel):
         description="GPS timestamp (must match gps_data.Timestamp, UTC)"
     )
 
+    trip_id: Optional[str] = Field(
+        None,
+        max_length=100,
+        description="ID of the trip this window belongs to (same as the GPS point)"
+    )
+
     # Accelerometer window timestamps
     ts_start: datetime = Field(
         ...,
@@ -6,6 +6,7 @@ Purpose:
 - Store ETags to avoid DB queries during validation
 - Invalidate cache when new GPS data arrives
 - Limit memory usage with LRU eviction
+- Keep the last GPS point per device (TTLCache, no ETag overhead)
 
 Architecture:
 - Thread-safe (uses threading.Lock)
@@ -237,9 +238,119 @@ class CacheManager:
         return hashlib.md5(json_str.encode()).hexdigest()
 
 
+class TTLCache:
+    """
+    Minimal thread-safe key → value cache with TTL and LRU eviction.
+    
+    Unlike CacheManager it stores plain values (no ETag, no JSON
+    serialization on set), so it is cheap enough for per-packet hot paths.
+    
+    Every key has a generation counter, bumped by set() / invalidate() /
+    clear(). Read-through fills take generation(key) before querying and
+    pass it to fill(): if a writer touched the key meanwhile, the (possibly
+    stale) value is dropped instead of being cached.
+    
+    Attributes:
+        max_size: Maximum number of entries before LRU eviction
+        ttl: Time-to-live in seconds for every entry
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self._cache: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._generations: Dict[Any, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.ttl = ttl
+    
+    def get(self, key: Any) -> Optional[Any]:
+        """
+        Return the cached value, or None if missing/expired.
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, value = entry
+            if time.monotonic() > expires_at:
+                del self._cache[key]
+                return None
+            
+            self._cache.move_to_end(key)
+            return value
+    
+    def generation(self, key: Any) -> tuple[int, int]:
+        """
+        Current generation of a key; take it before reading the source of
+        truth and hand it to fill().
+        """
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+    
+    def set(self, key: Any, value: Any) -> None:
+        """
+        Store (or overwrite) a value written by the source of truth; evicts
+        the least recently used entry when max_size is exceeded.
+        """
+        with self._lock:
+            self._bump(key)
+            self._store(key, value)
+    
+    def fill(self, key: Any, value: Any, generation: tuple[int, int]) -> bool:
+        """
+        Read-through fill: store the value only if the key was not written
+        or invalidated since generation(key) was taken.
+        
+        Returns:
+            bool: True if stored, False if discarded as possibly stale
+        """
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(key, 0)):
+                return False
+            self._store(key, value)
+            return True
+    
+    def invalidate(self, key: Any) -> bool:
+        """
+        Remove a key (used when the underlying row changes).
+        """
+        with self._lock:
+            self._bump(key)
+            return self._cache.pop(key, None) is not None
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._cache.clear()
+    
+    def _bump(self, key: Any) -> None:
+        # Un contador por key (devices: cardinalidad acotada)
+        self._generations[key] = self._generations.get(key, 0) + 1
+    
+    def _store(self, key: Any, value: Any) -> None:
+        self._cache[key] = (time.monotonic() + self.ttl, value)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+
 # Global cache instance (singleton)
 # Created once when module is imported
 cache_manager = CacheManager(
     max_size=settings.CACHE_MAX_SIZE,
     default_ttl=settings.CACHE_DEFAULT_TTL_S
-)
\ No newline at end of file
+)
+
+# Último GPS por dispositivo (write-through desde created_gps_data)
+last_gps_cache = TTLCache(
+    max_size=settings.LAST_GPS_CACHE_MAX_SIZE,
+    ttl=settings.LAST_GPS_CACHE_TTL_S
+)
+
+# Lista de dispositivos con GPS (una sola entrada, TTL corto)
+device_list_cache = TTLCache(
+    max_size=1,
+    ttl=settings.DEVICE_LIST_CACHE_TTL_S
+)
@@ -8,6 +8,7 @@ Componentes:
 - geofence_handler: Detección y logging de eventos de geocercas
 - trip_handler: Detección y gestión del ciclo de vida de trips
 - persistence_handler: Inserción de datos en DB con transacciones atómicas
+- ingest_buffer: Inserción por lotes (GpsIngestBuffer, opt-in UDP_BATCH_ENABLED)
 
 Arquitectura:
 - Handlers reciben inputs explícitos
@@ -22,7 +23,13 @@ from .trip_handler import (
     calculate_trip_metrics,
     handle_trip_detection
 )
-from .persistence_handler import insert_data
+from .persistence_handler import (
+    flush_last_seen_buffer,
+    insert_data,
+    start_last_seen_flusher,
+    suppress_stationary_duplicate
+)
+from .ingest_buffer import GpsIngestBuffer, gps_ingest_buffer
 
 __all__ = [
     # Geofence handler
@@ -34,5 +41,12 @@ __all__ = [
     'handle_trip_detection',
     
     # Persistence handler
+    'flush_last_seen_buffer',
     'insert_data',
+    'start_last_seen_flusher',
+    'suppress_stationary_duplicate',
+    
+    # Ingest buffer
+    'GpsIngestBuffer',
+    'gps_ingest_buffer',
 ]
\ No newline at end of file
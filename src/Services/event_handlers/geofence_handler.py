@@ -29,6 +29,7 @@ from src.Services.geofence_detector import geofence_detector
 from src.Repositories.gps_data import created_gps_data
 from src.Schemas.gps_data import GpsData_create
 from src.Core import log_ws
+from .ingest_buffer import GpsIngestBuffer
 
 
 def handle_geofence_detection(
@@ -39,7 +40,8 @@ def handle_geofence_detection(
     altitude: Optional[float],
     accuracy: Optional[float],
     timestamp: datetime,
-    previous_gps: Optional[dict]
+    previous_gps: Optional[dict],
+    ingest_buffer: Optional[GpsIngestBuffer] = None
 ) -> Dict[str, Any]:
     """
     Maneja detección de geocercas y eventos de transición (ENTRY/EXIT).
@@ -65,7 +67,10 @@ def handle_geofence_detection(
         accuracy: Precisión GPS en metros (opcional)
         timestamp: Timestamp UTC del GPS actual
         previous_gps: GPS anterior del dispositivo (dict de get_last_gps_row_by_device)
-                     Debe contener: CurrentGeofenceID, CurrentGeofenceName
+                     Debe contener: CurrentGeofenceID, CurrentGeofenceName.
+                     Es también el estado previo de la detección (None = sin GPS previo)
+        ingest_buffer: Buffer de ingesta por lotes (UDP_BATCH_ENABLED). Si se pasa,
+                     el EXIT artificial se encola en lugar de insertarse
         
     Returns:
         dict: Campos de geocerca para agregar al GPS:
@@ -130,7 +135,10 @@ def handle_geofence_detection(
             device_id=device_id,
             lat=latitude,
             lon=longitude,
-            timestamp=timestamp
+            timestamp=timestamp,
+            # Mismo "GPS anterior" que usa el EXIT artificial (paso 2), sin
+            # una consulta extra por paquete
+            previous_state=previous_gps or {}
         )
         
         # Si no está en ninguna geocerca, retornar defaults
@@ -160,8 +168,11 @@ def handle_geofence_detection(
                 'GeofenceEventType': 'exit'
             }
             
-            # Insertar EXIT en DB
-            created_gps_data(db, GpsData_create(**exit_dict))
+            # Insertar EXIT en DB (o encolarlo delante del ENTRY)
+            if ingest_buffer:
+                ingest_buffer.push(GpsData_create(**exit_dict))
+            else:
+                created_gps_data(db, GpsData_create(**exit_dict))
             
             # Log del EXIT
             log_ws.log_from_thread(
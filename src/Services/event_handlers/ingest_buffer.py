@@ -0,0 +1,313 @@
+# src/Services/event_handlers/ingest_buffer.py
+"""
+GPS Ingest Buffer
+=================
+Acumula GPS + Acelerómetro recibidos por UDP y los inserta en bloque.
+
+En lugar de un INSERT + commit por paquete (insert_data), cada flush hace:
+- Un INSERT multi-fila de GPS (ON CONFLICT DO NOTHING, RETURNING trip_id),
+  o COPY a una tabla staging + INSERT ... SELECT si el lote es grande
+  (UDP_BATCH_COPY_MIN_ROWS)
+- Un UPDATE de point_count por trip (con la cantidad realmente insertada)
+- Un INSERT multi-fila de Acelerómetro (ON CONFLICT DO NOTHING)
+- Una invalidación del caché HTTP
+
+Disparadores de flush:
+- Tamaño: el buffer alcanza UDP_BATCH_FLUSH_SIZE filas GPS
+- Tiempo: han pasado UDP_BATCH_FLUSH_MS desde el último flush
+- Explícito: flush() (cierre de trip, shutdown vía atexit / lifespan)
+
+Si la escritura del lote GPS falla (DB caída, conexión perdida), el lote
+vuelve a la cabeza del buffer y se reintenta en el siguiente flush, hasta
+UDP_BATCH_MAX_PENDING filas (por encima se descartan las más antiguas).
+
+Arquitectura:
+- Thread daemon "GPS-Ingest-Flusher" (el receptor UDP es un thread bloqueante)
+- flush() es serializado con un lock: los lotes se escriben en orden
+- last_point() expone el último punto encolado por device, para que el loop
+  UDP no lea de la DB un "GPS anterior" que todavía está en el buffer
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.Repositories.gps_data import insert_gps_rows_bulk, copy_gps_rows_bulk
+from src.Repositories.accelerometer_data import create_accel_data_bulk
+from src.Repositories.trip import increment_point_count
+
+from src.Schemas.gps_data import GpsData_create
+from src.Schemas.accelerometer_data import AccelData_create
+
+from src.Services.cache_manager import cache_manager
+from src.Core import log_ws
+from src.Core.config import settings
+from src.DB.session import SessionLocal
+
+from .persistence_handler import buffer_last_seen
+
+logger = logging.getLogger(__name__)
+
+
+class GpsIngestBuffer:
+    """
+    Buffer thread-safe de filas GPS/Accel con flush por tamaño y por tiempo.
+
+    Attributes:
+        flush_size: Filas GPS que disparan un flush inmediato
+        flush_ms: Espera máxima (ms) de una fila en el buffer
+        copy_min_rows: Lotes desde este tamaño se cargan con COPY (0 = nunca)
+        max_pending: Filas GPS retenidas mientras los flush fallan
+        attempted: Filas GPS de lotes escritos (inserted + ignored)
+        inserted: Filas GPS realmente insertadas
+        ignored: Filas GPS descartadas (duplicados / errores de integridad)
+        failed: Filas GPS de flush fallidos (se reencolan y reintentan)
+        dropped: Filas GPS descartadas por superar max_pending
+    """
+
+    def __init__(
+        self,
+        flush_size: int = 500,
+        flush_ms: int = 200,
+        copy_min_rows: int = 50,
+        max_pending: int = 10000
+    ):
+        self.flush_size = flush_size
+        self.flush_ms = flush_ms
+        self.copy_min_rows = copy_min_rows
+        self.max_pending = max_pending
+
+        self._gps: List[GpsData_create] = []
+        self._accel: List[AccelData_create] = []
+        self._last_points: Dict[str, Dict[str, Any]] = {}
+
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.attempted = 0
+        self.inserted = 0
+        self.ignored = 0
+        self.failed = 0
+        self.dropped = 0
+        self._failing = False
+
+    def push(
+        self,
+        gps_data: GpsData_create,
+        accel_data: Optional[AccelData_create] = None,
+        trip_id: Optional[str] = None
+    ) -> None:
+        """
+        Encola un GPS (y su Accel) con el trip_id asignado por trip_handler.
+        """
+        gps_dict = gps_data.model_dump()
+        gps_dict['trip_id'] = trip_id
+        gps_row = GpsData_create(**gps_dict)
+
+        accel_row = None
+        if accel_data:
+            accel_dict = accel_data.model_dump()
+            accel_dict['trip_id'] = trip_id
+            accel_row = AccelData_create(**accel_dict)
+
+        # Mismo formato que get_last_gps_row_by_device (id aún desconocido)
+        last_point = gps_dict
+        last_point['id'] = None
+        last_point['Timestamp'] = gps_row.Timestamp.isoformat()
+
+        with self._lock:
+            self._gps.append(gps_row)
+            if accel_row:
+                self._accel.append(accel_row)
+
+            previous = self._last_points.get(gps_row.DeviceID)
+            if previous is None or last_point['Timestamp'] >= previous['Timestamp']:
+                self._last_points[gps_row.DeviceID] = last_point
+
+            if len(self._gps) >= self.flush_size:
+                self._full.notify()
+
+    def last_point(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Último GPS encolado (aún no escrito) de un device, o None.
+        """
+        with self._lock:
+            point = self._last_points.get(device_id)
+            return dict(point) if point else None
+
+    def flush(self) -> int:
+        """
+        Escribe todo lo pendiente en la DB.
+
+        Returns:
+            int: Filas GPS insertadas en este flush (0 si falló y se reencoló)
+        """
+        with self._flush_lock:
+            with self._lock:
+                gps_batch, self._gps = self._gps, []
+                accel_batch, self._accel = self._accel, []
+                # last_point() sigue sirviendo estos puntos hasta que estén en la DB
+                flushed_points = dict(self._last_points)
+
+            if not gps_batch:
+                return 0
+
+            try:
+                with SessionLocal() as db:
+                    trip_ids = self._insert_gps(db, gps_batch)
+                    inserted = len(trip_ids)
+
+                    # Un UPDATE por trip con las filas realmente insertadas
+                    point_counts: Dict[str, int] = {}
+                    for trip_id in trip_ids:
+                        if trip_id:
+                            point_counts[trip_id] = point_counts.get(trip_id, 0) + 1
+                    for trip_id, amount in point_counts.items():
+                        try:
+                            increment_point_count(db, trip_id, amount)
+                        except Exception as trip_error:
+                            db.rollback()
+                            print(f"[INGEST] Error incrementing point_count of {trip_id}: {trip_error}")
+
+                    # Accel es "nice to have": un fallo no afecta al GPS ya escrito
+                    try:
+                        create_accel_data_bulk(db, accel_batch)
+                    except Exception as accel_error:
+                        db.rollback()
+                        print(f"[INGEST] Accel batch of {len(accel_batch)} failed: {accel_error}")
+
+            except Exception as e:
+                # El lote GPS no se escribió: vuelve al buffer. _last_points se
+                # conserva (sigue siendo el "GPS anterior" real) y LastSeen no avanza
+                self._requeue(gps_batch, accel_batch)
+                print(f"[INGEST] GPS batch of {len(gps_batch)} failed, requeued: {e}")
+                log_ws.log_from_thread(
+                    f"[INGEST] GPS batch of {len(gps_batch)} failed, requeued: {e}",
+                    msg_type="error"
+                )
+                return 0
+
+            self._failing = False
+            self.attempted += len(gps_batch)
+            self.inserted += inserted
+            self.ignored += len(gps_batch) - inserted
+
+            with self._lock:
+                for device_id, point in flushed_points.items():
+                    if self._last_points.get(device_id) is point:
+                        del self._last_points[device_id]
+
+            for gps_row in gps_batch:
+                buffer_last_seen(gps_row.DeviceID, gps_row.Timestamp)
+
+            try:
+                cache_manager.clear()
+            except Exception as cache_error:
+                print(f"[CACHE] Warning: Cache invalidation failed: {cache_error}")
+
+            # Cada UDP_BATCH_FLUSH_MS: debug (totales en stats())
+            logger.debug(
+                "[INGEST] Flushed %d GPS (%d inserted, %d ignored), %d accel",
+                len(gps_batch), inserted, len(gps_batch) - inserted, len(accel_batch)
+            )
+            return inserted
+
+    def _requeue(self, gps_batch: List[GpsData_create], accel_batch: List[AccelData_create]) -> None:
+        """
+        Devuelve un lote fallido a la cabeza del buffer (antes de lo encolado
+        durante el flush), acotado a max_pending filas GPS.
+        """
+        with self._lock:
+            self.failed += len(gps_batch)
+            self._failing = True
+            self._gps = gps_batch + self._gps
+            self._accel = accel_batch + self._accel
+
+            overflow = len(self._gps) - self.max_pending
+            if overflow > 0:
+                dropped, self._gps = self._gps[:overflow], self._gps[overflow:]
+                self.dropped += overflow
+                # Accel sin su GPS no tiene sentido: mismo corte por (device, timestamp)
+                dropped_keys = {(row.DeviceID, row.Timestamp) for row in dropped}
+                self._accel = [
+                    row for row in self._accel
+                    if (row.DeviceID, row.Timestamp) not in dropped_keys
+                ]
+                # Devices sin filas pendientes: su último punto ya no está en el buffer
+                pending_devices = {row.DeviceID for row in self._gps}
+                for device_id in {row.DeviceID for row in dropped} - pending_devices:
+                    self._last_points.pop(device_id, None)
+                print(f"[INGEST] Buffer over {self.max_pending} GPS rows, dropped {overflow} oldest")
+
+    def _insert_gps(self, db, gps_batch: List[GpsData_create]) -> List[Optional[str]]:
+        """
+        Escribe el lote GPS (COPY si es grande) y retorna los trip_id insertados.
+        """
+        if self.copy_min_rows and len(gps_batch) >= self.copy_min_rows:
+            try:
+                return copy_gps_rows_bulk(db, gps_batch)
+            except Exception as copy_error:
+                # p.ej. FK de trip_id: el INSERT reintenta fila por fila
+                print(f"[INGEST] COPY of {len(gps_batch)} GPS failed, falling back to INSERT: {copy_error}")
+        return insert_gps_rows_bulk(db, gps_batch)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Contadores acumulados (para monitoreo).
+        """
+        with self._lock:
+            pending = len(self._gps)
+        return {
+            "pending": pending,
+            "attempted": self.attempted,
+            "inserted": self.inserted,
+            "ignored": self.ignored,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def start(self) -> threading.Thread:
+        """
+        Inicia el thread daemon de flush y registra un flush final en atexit.
+
+        Returns:
+            threading.Thread: Thread del flusher (ya iniciado)
+        """
+        if self._thread is not None:
+            return self._thread
+
+        interval_s = self.flush_ms / 1000.0
+
+        def _run() -> None:
+            while True:
+                if self._failing:
+                    # Tras un flush fallido el buffer reencolado puede superar
+                    # flush_size: esperar el intervalo completo, sin reintentar en bucle
+                    time.sleep(interval_s)
+                else:
+                    with self._lock:
+                        if len(self._gps) < self.flush_size:
+                            self._full.wait(timeout=interval_s)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[INGEST] Flush error: {e}")
+
+        self._thread = threading.Thread(target=_run, daemon=True, name="GPS-Ingest-Flusher")
+        self._thread.start()
+        atexit.register(self.flush)
+        print(f"[INGEST] GPS ingest buffer started (size={self.flush_size}, every {self.flush_ms}ms)")
+        return self._thread
+
+
+# Global instance (singleton)
+gps_ingest_buffer = GpsIngestBuffer(
+    flush_size=settings.UDP_BATCH_FLUSH_SIZE,
+    flush_ms=settings.UDP_BATCH_FLUSH_MS,
+    copy_min_rows=settings.UDP_BATCH_COPY_MIN_ROWS,
+    max_pending=settings.UDP_BATCH_MAX_PENDING
+)
@@ -13,21 +13,31 @@ Extraído de udp.py (Fase 8) para:
 Arquitectura:
 - Input: Datos validados (GPS, Accel, Device, trip_id)
 - Output: Tupla (gps_inserted, accel_inserted)
-- Transacción atómica: Accel → GPS → update LastSeen → commit
+- Transacción atómica: Accel (savepoint) → GPS + point_count (un statement) → un solo commit
 - Non-blocking accel: Si accel falla, GPS continúa
+- LastSeen se acumula en memoria y se escribe en bloque cada tick
 
 Funciones:
 - insert_data(): Inserta GPS + Accel en una transacción atómica
+- buffer_last_seen(): Registra LastSeen pendiente (monotónico)
+- flush_last_seen_buffer(): Escribe el buffer con un solo UPDATE
+- start_last_seen_flusher(): Thread daemon que hace flush periódico
+- suppress_stationary_duplicate(): Descarta puntos repetidos de devices detenidos
 """
 
+import atexit
+import logging
+import threading
+import time
 from typing import Optional, Tuple
+from sqlalchemy import update, case, func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 # Imports de repositories
 from src.Repositories.gps_data import created_gps_data
 from src.Repositories.accelerometer_data import create_accel_data
-from src.Repositories.trip import increment_point_count
+from src.Services.trip_detector import calculate_haversine_distance
 
 # Imports de schemas
 from src.Schemas.gps_data import GpsData_create
@@ -42,9 +52,26 @@ from src.Core import log_ws
 # ============================================================
 # ✨ NUEVO: Import de cache_manager para invalidación
 # ============================================================
-from src.Services.cache_manager import cache_manager
+from src.Services.cache_manager import cache_manager, last_gps_cache
 
-from datetime import datetime
+from src.DB.session import SessionLocal
+from src.Core.config import settings
+
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================================
+# BUFFER DE LASTSEEN
+# ==========================================================
+# Un UPDATE devices por paquete GPS es innecesario: LastSeen solo
+# se consulta a escala de segundos. Se guarda el máximo por device
+# y un thread lo persiste cada DEVICE_LAST_SEEN_FLUSH_S.
+_last_seen_buffer: dict[str, datetime] = {}
+_last_seen_lock = threading.Lock()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 def insert_data(
@@ -57,11 +84,15 @@ def insert_data(
     """
     Inserta GPS y Acelerómetro en la DB con transacción atómica.
     
+    Un solo commit (un fsync del WAL) por paquete: los repositorios se
+    llaman con commit=False y el accel va en un SAVEPOINT, así un accel
+    duplicado se descarta sin deshacer el resto.
+    
     Orden de operaciones:
     1. Insertar Accel (non-blocking si falla)
     2. Insertar GPS (siempre, crítico)
-    3. Incrementar point_count del trip (si aplica)
-    4. Actualizar LastSeen del device
+    3. Incrementar point_count del trip (mismo statement que el GPS)
+    4. Registrar LastSeen del device en el buffer (flush periódico)
     5. Commit de la transacción
     6. ✨ NUEVO: Invalidar caché HTTP completo
     7. Log del resultado
@@ -82,7 +113,7 @@ def insert_data(
         db: Sesión de SQLAlchemy activa
         gps_data: Datos GPS validados (GpsData_create)
         accel_data: Datos Accel validados (opcional)
-        device_record: Objeto Device de SQLAlchemy (para update LastSeen)
+        device_record: Objeto Device de SQLAlchemy (validado por el caller)
         trip_id: ID del trip activo (opcional, para asociar GPS)
         
     Returns:
@@ -96,7 +127,7 @@ def insert_data(
         - Inserta registros en tabla gps_data
         - Inserta registros en tabla accelerometer_data (si accel_data)
         - Incrementa point_count en tabla trips (si trip_id)
-        - Actualiza LastSeen en tabla devices
+        - Registra LastSeen en el buffer (se escribe en devices por tick)
         - Invalida cache HTTP completo (cache_manager.clear())
         - Escribe logs via log_ws.log_from_thread()
         
@@ -104,7 +135,7 @@ def insert_data(
         - El commit() se hace al final, después de todas las operaciones
         - Si GPS falla, se hace rollback() completo (incluye accel si se insertó)
         - Duplicados GPS/Accel son silenciosos (no logueados como errores)
-        - trip_id se agrega DESPUÉS de validación Pydantic (no está en schema)
+        - trip_id se agrega DESPUÉS de validación Pydantic (GPS y accel)
         - Cache se invalida DESPUÉS del commit (crítico para consistencia)
     """
     device_id = gps_data.DeviceID
@@ -115,10 +146,16 @@ def insert_data(
     accel_inserted = False
     
     if accel_data:
+        # Mismo trip_id que el GPS (get_accel_map_for_trip filtra por él)
+        accel_dict = accel_data.model_dump()
+        accel_dict['trip_id'] = trip_id
+        
         try:
-            create_accel_data(db, accel_data)
+            # SAVEPOINT: un fallo del accel solo deshace el accel
+            with db.begin_nested():
+                create_accel_data(db, AccelData_create(**accel_dict), commit=False)
             accel_inserted = True
-            print(f"[PERSISTENCE] Device '{device_id}': Accel data inserted")
+            logger.debug("[PERSISTENCE] Device '%s': Accel data inserted", device_id)
             
         except IntegrityError as ie:
             # Error de integridad en accel (probablemente duplicado)
@@ -126,13 +163,12 @@ def insert_data(
             
             if "unique_device_timestamp" in error_str or "duplicate key" in error_str:
                 # Duplicado esperado (device envió mismo paquete 2 veces)
-                print(f"[PERSISTENCE] Device '{device_id}': Duplicate accel (DeviceID+Timestamp) - skipped")
-                db.rollback()  # ← Rollback SOLO del accel, GPS continúa
+                # (el SAVEPOINT ya se deshizo: solo el accel, GPS continúa)
+                logger.debug("[PERSISTENCE] Device '%s': Duplicate accel (DeviceID+Timestamp) - skipped", device_id)
                 
             else:
                 # Error inesperado de DB
                 print(f"[PERSISTENCE] Device '{device_id}': Unexpected accel DB error: {ie}")
-                db.rollback()
                 # GPS continúa de todos modos (accel es opcional)
     
     # ========================================
@@ -144,29 +180,25 @@ def insert_data(
     gps_dict['trip_id'] = trip_id
     
     try:
-        # Insertar GPS en DB
-        new_row = created_gps_data(db, GpsData_create(**gps_dict))
-        
-        # ========================================
-        # PASO 2.5: INCREMENTAR POINT_COUNT DEL TRIP
-        # ========================================
-        if trip_id:
-            try:
-                increment_point_count(db, trip_id)
-            except Exception as trip_error:
-                # Error incrementando point_count - no crítico
-                print(f"[PERSISTENCE] Device '{device_id}': Error incrementing point_count: {trip_error}")
-                # Continúa con commit del GPS (point_count no es crítico)
+        # Insertar GPS en DB; con trip_id, el point_count del trip se
+        # incrementa en el mismo statement (CTE INSERT + UPDATE)
+        new_row = created_gps_data(
+            db,
+            GpsData_create(**gps_dict),
+            commit=False,
+            increment_trip_points=True
+        )
         
         # ========================================
-        # PASO 3: ACTUALIZAR LASTSEEN DEL DEVICE
+        # PASO 3: COMMIT DE LA TRANSACCIÓN
         # ========================================
-        setattr(device_record, "LastSeen", gps_data.Timestamp)
+        db.commit()
         
         # ========================================
-        # PASO 4: COMMIT DE LA TRANSACCIÓN
+        # PASO 4: LASTSEEN DEL DEVICE (BUFFER)
         # ========================================
-        db.commit()
+        # Se persiste en bloque por el flusher (ver buffer_last_seen)
+        buffer_last_seen(device_id, gps_data.Timestamp)
         
         # ========================================
         # ✨ PASO 5: INVALIDAR CACHÉ HTTP (KISS)
@@ -181,7 +213,7 @@ def insert_data(
             # Costo: Algunos cache misses extras (aceptable)
             cache_manager.clear()
             
-            print(f"[CACHE] Cleared (GPS from '{device_id}')")
+            logger.debug("[CACHE] Cleared (GPS from '%s')", device_id)
             
         except Exception as cache_error:
             # Error invalidando caché - NO es crítico
@@ -206,11 +238,12 @@ def insert_data(
     except IntegrityError as ie:
         # Error de integridad en GPS
         db.rollback()  # ← Rollback completo (GPS + accel si se insertó)
+        last_gps_cache.invalidate(device_id)
         error_str = str(ie).lower()
         
         if "unique_device_timestamp" in error_str or "duplicate key" in error_str:
             # Duplicado GPS esperado (device envió mismo paquete 2 veces)
-            print(f"[PERSISTENCE] Device '{device_id}': Duplicate GPS (DeviceID+Timestamp) - skipped")
+            logger.debug("[PERSISTENCE] Device '%s': Duplicate GPS (DeviceID+Timestamp) - skipped", device_id)
             # No loguear como error (es comportamiento esperado)
             
         else:
@@ -226,6 +259,8 @@ def insert_data(
     except Exception as unexpected_error:
         # Error inesperado durante commit
         db.rollback()
+        # created_gps_data ya escribió el caché (write-through) antes del commit
+        last_gps_cache.invalidate(device_id)
         print(f"[PERSISTENCE] Device '{device_id}': Unexpected error during commit: {unexpected_error}")
         log_ws.log_from_thread(
             f"[PERSISTENCE] Unexpected error for device '{device_id}': {unexpected_error}",
@@ -235,6 +270,63 @@ def insert_data(
         return False, False
 
 
+# ==========================================================
+# SUPRESIÓN DE PUNTOS ESTACIONARIOS
+# ==========================================================
+# Contador de puntos descartados (monitoreo)
+duplicates_suppressed = 0
+
+
+def suppress_stationary_duplicate(
+    previous_gps: Optional[dict],
+    gps_data: GpsData_create
+) -> bool:
+    """
+    Decide si un GPS repite la última posición guardada del device.
+    
+    Se descarta cuando, respecto al último GPS guardado:
+    - Distancia < GPS_DEDUP_DISTANCE_M
+    - Misma geocerca y sin evento entry/exit
+    - Δt < GPS_DEDUP_MAX_AGE_S (pasado ese tiempo se guarda igual)
+    
+    Si se descarta, solo se registra LastSeen (buffer) y se incrementa
+    duplicates_suppressed.
+    
+    Args:
+        previous_gps: Último GPS guardado (dict de get_last_gps_row_by_device)
+        gps_data: GPS entrante, ya con campos de geocerca
+        
+    Returns:
+        bool: True si el punto no debe insertarse
+    """
+    global duplicates_suppressed
+    
+    if not previous_gps or not previous_gps.get('Timestamp'):
+        return False
+    
+    if gps_data.GeofenceEventType in ('entry', 'exit'):
+        return False
+    
+    if gps_data.CurrentGeofenceID != previous_gps.get('CurrentGeofenceID'):
+        return False
+    
+    previous_ts = datetime.fromisoformat(previous_gps['Timestamp'])
+    age_s = (gps_data.Timestamp - previous_ts).total_seconds()
+    if not 0 <= age_s < settings.GPS_DEDUP_MAX_AGE_S:
+        return False
+    
+    distance = calculate_haversine_distance(
+        previous_gps['Latitude'], previous_gps['Longitude'],
+        gps_data.Latitude, gps_data.Longitude
+    )
+    if distance >= settings.GPS_DEDUP_DISTANCE_M:
+        return False
+    
+    buffer_last_seen(gps_data.DeviceID, gps_data.Timestamp)
+    duplicates_suppressed += 1
+    return True
+
+
 # ==========================================================
 # HELPER: BATCH INSERT (FUTURO)
 # ==========================================================
@@ -270,12 +362,15 @@ def update_device_last_seen_bulk(
     device_updates: dict[str, datetime]
 ) -> int:
     """
-    [FUTURO] Actualiza LastSeen de múltiples devices en una sola query.
+    Actualiza LastSeen de múltiples devices en una sola query.
     
-    Útil para:
-    - Batch processing
-    - Sincronización periódica
-    - Optimización de performance
+    Emite un único:
+        UPDATE devices SET LastSeen = CASE DeviceID WHEN ... END
+        WHERE DeviceID IN (...) AND COALESCE(LastSeen, 'epoch') < CASE ...
+    
+    La condición final hace la actualización monotónica: un timestamp
+    igual o más viejo que el guardado (paquetes fuera de orden) no toca
+    la fila.
     
     Args:
         db: Sesión de SQLAlchemy
@@ -284,5 +379,85 @@ def update_device_last_seen_bulk(
     Returns:
         int: Número de devices actualizados
     """
-    # TODO: Implementar cuando se requiera bulk updates
-    raise NotImplementedError("Bulk update not yet implemented")
\ No newline at end of file
+    if not device_updates:
+        return 0
+    
+    new_last_seen = case(device_updates, value=Device.DeviceID)
+    
+    result = db.execute(
+        update(Device)
+        .where(
+            Device.DeviceID.in_(device_updates.keys()),
+            func.coalesce(Device.LastSeen, _EPOCH) < new_last_seen
+        )
+        .values(LastSeen=new_last_seen)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    
+    return result.rowcount
+
+
+def buffer_last_seen(device_id: str, timestamp: datetime) -> None:
+    """
+    Registra el LastSeen pendiente de un device (se queda con el máximo).
+    
+    Args:
+        device_id: ID del dispositivo
+        timestamp: Timestamp del GPS recién insertado
+    """
+    with _last_seen_lock:
+        current = _last_seen_buffer.get(device_id)
+        if current is None or timestamp > current:
+            _last_seen_buffer[device_id] = timestamp
+
+
+def flush_last_seen_buffer() -> int:
+    """
+    Persiste el buffer de LastSeen con update_device_last_seen_bulk().
+    
+    Si el UPDATE falla, los valores vuelven al buffer para el siguiente tick.
+    
+    Returns:
+        int: Número de devices actualizados
+    """
+    global _last_seen_buffer
+    
+    with _last_seen_lock:
+        pending, _last_seen_buffer = _last_seen_buffer, {}
+    
+    if not pending:
+        return 0
+    
+    try:
+        with SessionLocal() as db:
+            return update_device_last_seen_bulk(db, pending)
+    except Exception as e:
+        print(f"[PERSISTENCE] LastSeen flush failed ({len(pending)} devices): {e}")
+        for device_id, timestamp in pending.items():
+            buffer_last_seen(device_id, timestamp)
+        return 0
+
+
+def start_last_seen_flusher() -> threading.Thread:
+    """
+    Inicia el thread daemon que hace flush del buffer de LastSeen y
+    registra un flush final en atexit.
+    
+    Returns:
+        threading.Thread: Thread del flusher (ya iniciado)
+    """
+    interval_s = settings.DEVICE_LAST_SEEN_FLUSH_S
+    
+    def _run() -> None:
+        while True:
+            time.sleep(interval_s)
+            flush_last_seen_buffer()
+    
+    thread = threading.Thread(target=_run, daemon=True, name="LastSeen-Flusher")
+    thread.start()
+    # atexit es LIFO: el flush del ingest buffer (registrado después) corre
+    # antes y sus LastSeen todavía alcanzan este flush
+    atexit.register(flush_last_seen_buffer)
+    print(f"[PERSISTENCE] LastSeen flusher started (every {interval_s}s)")
+    return thread
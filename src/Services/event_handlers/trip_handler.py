@@ -38,6 +38,7 @@ from src.Repositories.trip import (
 from src.Repositories.gps_data import get_gps_by_trip_id
 from src.Schemas.trip import Trip_create
 from src.Core import log_ws
+from .ingest_buffer import GpsIngestBuffer
 
 
 # ==========================================================
@@ -233,7 +234,8 @@ def handle_trip_detection(
     device_id: str,
     current_gps: Dict[str, Any],
     previous_gps: Optional[Dict[str, Any]],
-    active_trip: Optional[Any]
+    active_trip: Optional[Any],
+    ingest_buffer: Optional[GpsIngestBuffer] = None
 ) -> Optional[str]:
     """
     Maneja detección y gestión del ciclo de vida completo de trips.
@@ -277,6 +279,8 @@ def handle_trip_detection(
             - trip_id: str
             - trip_type: 'movement' | 'parking'
             - status: 'active'
+        ingest_buffer: Buffer de ingesta por lotes (opcional). Se vacía antes de
+            calcular las métricas de cierre para que incluyan los puntos encolados
             
     Returns:
         str: ID del trip activo/creado (ej: "TRIP_20241027_120530_ESP32_001")
@@ -386,6 +390,8 @@ def handle_trip_detection(
         elif decision['action'] == 'close_and_create_trip':
             # Cerrar trip anterior
             if active_trip:
+                if ingest_buffer:
+                    ingest_buffer.flush()
                 metrics = calculate_trip_metrics(db, str(active_trip.trip_id))
                 close_trip(
                     db,
@@ -421,6 +427,8 @@ def handle_trip_detection(
         elif decision['action'] == 'close_and_create_parking':
             # Cerrar trip anterior
             if active_trip:
+                if ingest_buffer:
+                    ingest_buffer.flush()
                 metrics = calculate_trip_metrics(db, str(active_trip.trip_id))
                 close_trip(
                     db,
@@ -1,13 +1,46 @@
 # src/Services/geofence_detector.py
 
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam, Float
+import shapely
+from shapely import wkb, Point
+from shapely.strtree import STRtree
 
 # ✅ CORRECCIÓN 1: Import correcto
-from src.Repositories.gps_data import get_last_gps_row_by_device
+from src.Repositories.gps_data import get_device_current_geofence
+from src.Repositories.geofence import get_active_geofence_shapes, get_geofence_cache_version
 from src.Models.geofence import Geofence
+from src.Core.config import settings
+
+
+# Query PostGIS del fallback: construido una vez al importar, con binds
+# tipados (Float) y CAST explícito a double precision, para que el texto SQL
+# sea idéntico en cada llamada y lat/lon nunca se interpreten como texto.
+# Pre-filtro explícito por bounding box (&&) antes del ST_Intersects exacto.
+_CONTAINING_GEOFENCE_STMT = text("""
+    WITH p AS (
+        SELECT ST_SetSRID(
+            ST_MakePoint(CAST(:lon AS double precision), CAST(:lat AS double precision)),
+            4326
+        )::geography AS pt
+    )
+    SELECT id, name, ST_Area(geometry) AS area
+    FROM geofences, p
+    WHERE is_active = TRUE
+    AND geometry && p.pt
+    AND ST_Intersects(geometry, p.pt)
+    ORDER BY area ASC
+    LIMIT 1
+""").bindparams(
+    bindparam('lon', type_=Float),
+    bindparam('lat', type_=Float)
+)
 
 
 class GeofenceDetector:
@@ -15,19 +48,44 @@ class GeofenceDetector:
     Servicio de detección de geocercas.
     Encapsula la lógica para determinar si un punto GPS se encuentra
     dentro o fuera de una geocerca activa.
+    
+    Point-in-polygon se resuelve en memoria con un STRtree de las geocercas
+    activas; PostGIS solo se consulta para (re)construir el índice cuando
+    cambia la versión del cache de geocercas o vence el TTL.
     """
 
+    def __init__(self):
+        self._index_lock = threading.Lock()
+        # (STRtree | None, geocercas alineadas por índice, áreas como ndarray);
+        # se reemplaza atómicamente
+        self._index: tuple[Optional[STRtree], list[Dict[str, Any]], np.ndarray] = (
+            None, [], np.empty(0)
+        )
+        self._index_version: Optional[int] = None
+        self._index_loaded_at = 0.0
+
+        # LRU (lat, lon) redondeados a 5 decimales (~1 m) → geocerca o None.
+        # Los puntos se repiten mucho (vehículo detenido en un almacén);
+        # se vacía cada vez que se reconstruye el índice.
+        self._point_cache: OrderedDict[tuple[float, float], Optional[Dict[str, str]]] = OrderedDict()
+        self._point_cache_lock = threading.Lock()
+
     def check_point(
         self,
         db: Session,
         device_id: str,
         lat: float,
         lon: float,
-        timestamp: datetime
+        timestamp: datetime,
+        previous_state: Optional[Dict[str, Any]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Verifica si el punto GPS (lat, lon) se encuentra dentro de una geocerca.
         
+        previous_state: estado de geocerca del GPS anterior si el caller ya lo
+        tiene (handle_geofence_detection siempre lo pasa, {} si no hay GPS
+        previo); si es None se consulta la DB (callers sin ese dato).
+        
         Returns:
             - Dict con 'id', 'name', 'event_type' si hay evento
             - None si no hay cambio (fuera sin cambios)
@@ -36,10 +94,11 @@ class GeofenceDetector:
         # Paso 1: buscar geocerca actual
         current_geofence = self._find_containing_geofence(db, lat, lon)
 
-        # Paso 2: obtener último GPS del dispositivo
-        previous_gps = get_last_gps_row_by_device(db, device_id)
+        # Paso 2: obtener estado de geocerca del último GPS (solo esas columnas)
+        if previous_state is None:
+            previous_state = get_device_current_geofence(db, device_id)
         previous_geofence_id = (
-            previous_gps.get('CurrentGeofenceID') if previous_gps else None
+            previous_state.get('CurrentGeofenceID') if previous_state else None
         )
 
         # Paso 3: matriz de decisión
@@ -84,22 +143,146 @@ class GeofenceDetector:
         Busca si el punto (lat, lon) está contenido dentro de alguna geocerca activa.
         Retorna la geocerca más específica (menor área).
         
-        IMPORTANTE: PostGIS Geography NO soporta ST_Contains, usamos ST_Intersects
+        Usa el STRtree en memoria; si no se puede construir, cae al query PostGIS.
+        """
+        try:
+            self._ensure_index(db)
+        except Exception as e:
+            print(f"[GEOFENCE] Spatial index unavailable, falling back to PostGIS: {e}")
+            return self._find_containing_geofence_db(db, lat, lon)
+
+        key = (round(lat, 5), round(lon, 5))
+        with self._point_cache_lock:
+            if key in self._point_cache:
+                self._point_cache.move_to_end(key)
+                return self._point_cache[key]
+
+        tree, geofences, _ = self._index
+        result = None
+
+        if tree is not None:
+            # intersects (no contains): igual que ST_Intersects, el borde cuenta como dentro
+            hits = tree.query(Point(lon, lat), predicate='intersects')
+            if len(hits) > 0:
+                best = min((geofences[i] for i in hits), key=lambda g: g['area'])
+                result = {'id': best['id'], 'name': best['name']}
+
+        with self._point_cache_lock:
+            self._point_cache[key] = result
+            if len(self._point_cache) > settings.GEOFENCE_POINT_CACHE_SIZE:
+                self._point_cache.popitem(last=False)
+
+        return result
+
+    def find_containing_geofences(
+        self,
+        db: Session,
+        points: Sequence[Tuple[float, float]]
+    ) -> List[Optional[Dict[str, str]]]:
+        """
+        Versión por lotes de _find_containing_geofence para N puntos (lat, lon).
+        
+        Construye todos los puntos con shapely.points y resuelve el lote con
+        una sola llamada tree.query (GEOS en C, sin bucle Python por punto).
+        Para cada punto se elige la geocerca de menor área con numpy.
+        
+        Returns:
+            Lista alineada con `points`: {'id', 'name'} o None por punto.
         """
+        if not points:
+            return []
+
+        try:
+            self._ensure_index(db)
+        except Exception as e:
+            print(f"[GEOFENCE] Spatial index unavailable, falling back to PostGIS: {e}")
+            return [self._find_containing_geofence_db(db, lat, lon) for lat, lon in points]
+
+        tree, geofences, areas = self._index
+        results: List[Optional[Dict[str, str]]] = [None] * len(points)
+        if tree is None:
+            return results
+
+        coords = np.asarray(points, dtype=float)
+        pts = shapely.points(coords[:, 1], coords[:, 0])
+
+        # (índice del punto, índice de la geocerca) en una sola llamada
+        point_idx, tree_idx = tree.query(pts, predicate='intersects')
+        if len(point_idx) == 0:
+            return results
 
-        query = text("""
-            SELECT id, name, ST_Area(geometry) AS area
-            FROM geofences
-            WHERE is_active = TRUE
-            AND ST_Intersects(
-                geometry,
-                ST_GeogFromText('POINT(' || :lon || ' ' || :lat || ')')
+        # Ordenar por punto y luego por área: el primer par de cada punto es la menor
+        order = np.lexsort((areas[tree_idx], point_idx))
+        point_idx, tree_idx = point_idx[order], tree_idx[order]
+        first = np.unique(point_idx, return_index=True)[1]
+
+        for p, t in zip(point_idx[first].tolist(), tree_idx[first].tolist()):
+            g = geofences[t]
+            results[p] = {'id': g['id'], 'name': g['name']}
+
+        return results
+
+    def _ensure_index(self, db: Session) -> None:
+        """
+        (Re)construye el STRtree si cambió la versión del cache de geocercas
+        o si venció GEOFENCE_CACHE_TTL_S.
+        """
+        version = get_geofence_cache_version()
+        expired = time.monotonic() - self._index_loaded_at >= settings.GEOFENCE_CACHE_TTL_S
+
+        if self._index_version == version and not expired:
+            return
+
+        with self._index_lock:
+            version = get_geofence_cache_version()
+            expired = time.monotonic() - self._index_loaded_at >= settings.GEOFENCE_CACHE_TTL_S
+            if self._index_version == version and not expired:
+                return
+
+            rows = get_active_geofence_shapes(db)
+
+            geofences = []
+            polygons = []
+            for row in rows:
+                polygons.append(wkb.loads(bytes(row.wkb)))
+                geofences.append({
+                    'id': row.id if isinstance(row.id, str) else str(row.id),
+                    'name': row.name if isinstance(row.name, str) else str(row.name),
+                    'area': row.area
+                })
+
+            self._index = (
+                STRtree(polygons) if polygons else None,
+                geofences,
+                np.array([g['area'] for g in geofences], dtype=float)
             )
-            ORDER BY area ASC
-            LIMIT 1
-        """)
+            with self._point_cache_lock:
+                self._point_cache.clear()
+            self._index_version = version
+            self._index_loaded_at = time.monotonic()
+
+            print(f"[GEOFENCE] Spatial index built ({len(geofences)} active geofences)")
 
-        result = db.execute(query, {'lon': lon, 'lat': lat}).first()
+    def _find_containing_geofence_db(
+        self,
+        db: Session,
+        lat: float,
+        lon: float
+    ) -> Optional[Dict[str, str]]:
+        """
+        Versión PostGIS de _find_containing_geofence (fallback).
+        
+        IMPORTANTE: PostGIS Geography NO soporta ST_Contains, usamos ST_Intersects
+        
+        El punto se construye con ST_MakePoint sobre parámetros numéricos (sin
+        concatenar ni parsear WKT) y se castea a geography, el tipo de la
+        columna, para que el índice espacial de geofences.geometry aplique.
+        """
+
+        # float() explícito: Decimal/numpy/str llegarían como otro tipo de literal
+        result = db.execute(
+            _CONTAINING_GEOFENCE_STMT, {'lon': float(lon), 'lat': float(lat)}
+        ).first()
 
         if result:
             return {
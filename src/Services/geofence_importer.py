@@ -17,7 +17,13 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import json
 from shapely.geometry import shape
-from src.Repositories.geofence import get_geofence_by_id, create_geofence, update_geofence
+from src.Repositories.geofence import (
+    geofence_exists,
+    create_geofence,
+    create_geofences_bulk,
+    update_geofence,
+    delete_geofence
+)
 
 
 class GeofenceImporter:
@@ -103,6 +109,9 @@ class GeofenceImporter:
 
         features = geojson_dict.get('features', [])
 
+        # Geocercas nuevas: se insertan en bloque al final (create_geofences_bulk)
+        pending_creates: dict[str, dict] = {}
+
         for feature in features:
             properties = {}  # inicialización temprana
             try:
@@ -144,10 +153,22 @@ class GeofenceImporter:
                     'extra_metadata': properties.get('metadata')
                 }
 
-                # Verificar si ya existe
-                existing = get_geofence_by_id(db, geofence_id)
+                # Repetida dentro del mismo archivo (aún sin insertar)
+                if geofence_id in pending_creates:
+                    if mode == 'skip':
+                        skipped += 1
+                        print(f"[IMPORT] Skipped (exists): {geofence_id}")
+                    else:
+                        pending_creates[geofence_id] = geofence_data
+                        if mode == 'update':
+                            updated += 1
+                        else:
+                            created += 1
+                        print(f"[IMPORT] Replaced pending: {geofence_id}")
+                    continue
 
-                if existing:
+                # Verificar si ya existe (EXISTS, sin cargar la geometría)
+                if geofence_exists(db, geofence_id):
                     if mode == 'skip':
                         skipped += 1
                         print(f"[IMPORT] Skipped (exists): {geofence_id}")
@@ -159,16 +180,14 @@ class GeofenceImporter:
                         print(f"[IMPORT] Updated: {geofence_id}")
 
                     elif mode == 'replace':
-                        db.delete(existing)
-                        db.commit()
+                        delete_geofence(db, geofence_id)
                         create_geofence(db, geofence_data)
                         created += 1
                         print(f"[IMPORT] Replaced: {geofence_id} ({geom_type})")
 
                 else:
-                    create_geofence(db, geofence_data)
-                    created += 1
-                    print(f"[IMPORT] Created {geom_type}: {geofence_id}")
+                    pending_creates[geofence_id] = geofence_data
+                    print(f"[IMPORT] Queued {geom_type}: {geofence_id}")
 
             except IntegrityError as ie:
                 db.rollback()
@@ -180,6 +199,26 @@ class GeofenceImporter:
                 failed += 1
                 print(f"[IMPORT] Error importing {properties.get('id', 'unknown')}: {e}")
 
+        # Insertar nuevas en bloque; si falla, reintentar una por una
+        if pending_creates:
+            try:
+                created += create_geofences_bulk(db, list(pending_creates.values()))
+                print(f"[IMPORT] Created {len(pending_creates)} geofences (bulk)")
+
+            except Exception as e:
+                db.rollback()
+                print(f"[IMPORT] Bulk insert failed, retrying one by one: {e}")
+
+                for geofence_id, geofence_data in pending_creates.items():
+                    try:
+                        create_geofence(db, geofence_data)
+                        created += 1
+                        print(f"[IMPORT] Created: {geofence_id}")
+                    except Exception as row_error:
+                        db.rollback()
+                        failed += 1
+                        print(f"[IMPORT] Error importing {geofence_id}: {row_error}")
+
         print(f"[IMPORT] Processed: {created} created, {updated} updated, "
               f"{skipped} skipped, {failed} failed")
 
@@ -0,0 +1,96 @@
+# src/Services/geohash.py
+
+from math import floor
+from typing import Optional
+
+# Alfabeto base32 de geohash (sin a, i, l, o)
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _cell_size(precision: int) -> tuple[float, float]:
+    """
+    Alto (lat) y ancho (lon) en grados de una celda geohash de `precision`
+    caracteres. Los bits se intercalan empezando por longitud.
+    """
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _encode_cell(lat_idx: int, lon_idx: int, precision: int) -> str:
+    """
+    Codifica los índices enteros de una celda (fila lat, columna lon)
+    intercalando sus bits: lon, lat, lon, lat...
+    """
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+
+    value = 0
+    lon_pos, lat_pos = lon_bits - 1, lat_bits - 1
+    for i in range(bits):
+        if i % 2 == 0:
+            value = (value << 1) | ((lon_idx >> lon_pos) & 1)
+            lon_pos -= 1
+        else:
+            value = (value << 1) | ((lat_idx >> lat_pos) & 1)
+            lat_pos -= 1
+
+    chars = []
+    for _ in range(precision):
+        chars.append(_BASE32[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def encode(lat: float, lon: float, precision: int = 7) -> str:
+    """
+    Geohash de un punto; coincide con PostGIS ST_GeoHash(geom, precision).
+    """
+    lat_size, lon_size = _cell_size(precision)
+    max_lat_idx = (1 << ((precision * 5) // 2)) - 1
+    max_lon_idx = (1 << ((precision * 5 + 1) // 2)) - 1
+    lat_idx = min(max(floor((lat + 90.0) / lat_size), 0), max_lat_idx)
+    lon_idx = min(max(floor((lon + 180.0) / lon_size), 0), max_lon_idx)
+    return _encode_cell(lat_idx, lon_idx, precision)
+
+
+def cells_covering_bbox(
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    precision: int = 7,
+    max_cells: int = 64
+) -> Optional[list[str]]:
+    """
+    Celdas geohash de `precision` caracteres que cubren el bounding box.
+
+    Returns:
+        list[str]: Celdas que intersectan el bbox, o None si harían falta más
+        de `max_cells` (un IN enorme no le gana al índice lat/lon) o si el
+        bbox cruza el antimeridiano.
+    """
+    if lat_min > lat_max or lon_min > lon_max:
+        return None
+    if lon_min < -180.0 or lon_max > 180.0:
+        return None
+
+    lat_size, lon_size = _cell_size(precision)
+    max_lat_idx = (1 << ((precision * 5) // 2)) - 1
+    max_lon_idx = (1 << ((precision * 5 + 1) // 2)) - 1
+
+    lat_lo = min(max(floor((lat_min + 90.0) / lat_size), 0), max_lat_idx)
+    lat_hi = min(max(floor((lat_max + 90.0) / lat_size), 0), max_lat_idx)
+    lon_lo = min(max(floor((lon_min + 180.0) / lon_size), 0), max_lon_idx)
+    lon_hi = min(max(floor((lon_max + 180.0) / lon_size), 0), max_lon_idx)
+
+    if (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) > max_cells:
+        return None
+
+    return [
+        _encode_cell(lat_idx, lon_idx, precision)
+        for lat_idx in range(lat_lo, lat_hi + 1)
+        for lon_idx in range(lon_lo, lon_hi + 1)
+    ]
@@ -1,14 +1,32 @@
 # src/Services/gps_serialization.py
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import orjson
 from typing import Any
+from sqlalchemy.engine import Row
 from src.Schemas.gps_data import GpsData_get
 from src.Models.gps_data import GPS_data
 
+_ZERO = timedelta(0)
 
-def serialize_gps_row(row: GPS_data | None, include_id: bool = False) -> dict[str, Any] | None:
+
+def format_utc_iso(ts: datetime | None) -> str | None:
+    """
+    Formatea un datetime como UTC ISO-8601 con sufijo 'Z' (mismo formato
+    que el campo Timestamp de serialize_gps_row).
+    """
+    if ts is None:
+        return None
+    if ts.utcoffset() != _ZERO:
+        ts = ts.astimezone(timezone.utc)
+    # orjson formatea el datetime en C (~10x más rápido que isoformat + replace)
+    return orjson.dumps(ts, option=orjson.OPT_UTC_Z)[1:-1].decode()
+
+
+def serialize_gps_row(row: GPS_data | Row | None, include_id: bool = False) -> dict[str, Any] | None:
     """
-    Convierte una fila GPS_data de SQLAlchemy en un dict JSON-serializable.
+    Convierte una fila GPS_data de SQLAlchemy (entidad ORM o Row de una
+    proyección con las mismas columnas) en un dict JSON-serializable.
 
     - Usa el schema Pydantic para validación.
     - include_id: si es True, incluye el campo interno 'id'.
@@ -24,9 +42,7 @@ def serialize_gps_row(row: GPS_data | None, include_id: bool = False) -> dict[st
     # Normalizar timestamp (UTC ISO 8601 con 'Z')
     ts = data.get("Timestamp")
     if isinstance(ts, datetime):
-        iso_str = ts.astimezone(timezone.utc).isoformat()
-        # Reemplazar +00:00 por Z (estándar ISO 8601 con Z)
-        data["Timestamp"] = iso_str.replace('+00:00', 'Z')
+        data["Timestamp"] = format_utc_iso(ts)
     else:
         data["Timestamp"] = None
 
@@ -54,12 +70,52 @@ def serialize_gps_row(row: GPS_data | None, include_id: bool = False) -> dict[st
     return data
 
 
-def serialize_many(rows: list[GPS_data], include_id: bool = False) -> list[dict[str, Any]]:
+def serialize_many(rows: list[GPS_data] | list[Row], include_id: bool = False) -> list[dict[str, Any]]:
     """
     Convierte una lista de filas GPS_data en una lista de dicts JSON-serializables.
 
     - Usa `serialize_gps_row` en cada elemento.
     - Filtra automáticamente filas nulas o inválidas.
     - include_id: si es True, incluye el campo interno 'id' en cada dict.
+    - Si las filas son Row de una proyección Core, usa serialize_many_fast.
     """
+    if rows and isinstance(rows[0], Row):
+        return serialize_many_fast(rows, include_id=include_id)
     return [serialized for row in rows if (serialized := serialize_gps_row(row, include_id=include_id)) is not None]
+
+
+def serialize_many_fast(rows: list[Row], include_id: bool = False) -> list[dict[str, Any]]:
+    """
+    Versión rápida de serialize_many para filas Core (Row) con las columnas
+    de GpsData_get, p.ej. select(*_GPS_ROW_COLUMNS).
+
+    Mismo resultado que serialize_gps_row, pero sin validar cada fila con
+    Pydantic (los tipos ya vienen de la DB): un dict por fila en una sola
+    comprensión, timestamps formateados en una pasada previa.
+    """
+    timestamps = [format_utc_iso(row.Timestamp) for row in rows]
+    result = []
+
+    for row, ts in zip(rows, timestamps):
+        data = {
+            "DeviceID": row.DeviceID,
+            "trip_id": row.trip_id,
+            "Latitude": row.Latitude,
+            "Longitude": row.Longitude,
+            "Altitude": row.Altitude,
+            "Accuracy": row.Accuracy,
+            "Timestamp": ts,
+        }
+        if include_id:
+            data["id"] = row.id
+
+        geofence_id = row.CurrentGeofenceID
+        event_type = row.GeofenceEventType
+        data["geofence"] = (
+            {"id": geofence_id, "name": row.CurrentGeofenceName, "event": event_type}
+            if geofence_id or event_type == 'exit'
+            else None
+        )
+        result.append(data)
+
+    return result
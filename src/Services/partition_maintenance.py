@@ -0,0 +1,57 @@
+# src/Services/partition_maintenance.py
+"""
+gps_data Partition Maintenance
+==============================
+Mantiene creadas las particiones mensuales de gps_data por adelantado
+(GPS_PARTITION_MONTHS_AHEAD).
+
+Corre una vez al arrancar y luego cada GPS_PARTITION_MAINTENANCE_S en un
+thread daemon: un proceso que sigue vivo más meses que la ventana creada al
+inicio no termina escribiendo en gps_data_default.
+"""
+
+import logging
+import threading
+import time
+
+from src.Repositories.gps_data import ensure_gps_partitions
+from src.DB.session import SessionLocal
+from src.Core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def run_gps_partition_maintenance() -> list[str]:
+    """
+    Crea (si faltan) las particiones del mes actual y los siguientes.
+    
+    Returns:
+        list[str]: Particiones que existen tras la ejecución
+    """
+    with SessionLocal() as db:
+        partitions = ensure_gps_partitions(db, settings.GPS_PARTITION_MONTHS_AHEAD)
+    logger.info("gps_data partitions ready: %s", ", ".join(partitions))
+    return partitions
+
+
+def start_gps_partition_maintainer() -> threading.Thread:
+    """
+    Inicia el thread daemon que repite el mantenimiento periódicamente.
+    
+    Returns:
+        threading.Thread: Thread del mantenedor (ya iniciado)
+    """
+    interval_s = settings.GPS_PARTITION_MAINTENANCE_S
+    
+    def _run() -> None:
+        while True:
+            time.sleep(interval_s)
+            try:
+                run_gps_partition_maintenance()
+            except Exception:
+                logger.exception("gps_data partition maintenance failed")
+    
+    thread = threading.Thread(target=_run, daemon=True, name="GPS-Partition-Maintainer")
+    thread.start()
+    print(f"[PARTITIONS] gps_data partition maintainer started (every {interval_s}s)")
+    return thread
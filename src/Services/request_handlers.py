@@ -15,7 +15,7 @@ Remaining handler:
 
 from typing import Dict, Any, List
 from datetime import datetime
-from src.DB.session import SessionLocal
+from src.DB.session import ReadSessionLocal
 from src.Repositories.gps_data import get_unique_trip_ids_near_location
 from src.Repositories.trip import get_trips_in_time_range, get_trip_by_id
 from src.Services.trip_assembler import trip_assembler
@@ -343,7 +343,7 @@ def handle_get_trips(params: Dict[str, Any], request_id: str) -> dict:
         # ========================================
         # STEP 2: Get trip IDs based on mode
         # ========================================
-        with SessionLocal() as db:
+        with ReadSessionLocal() as db:
             if mode == 'single_trip':
                 trip_ids = _get_trip_ids_single(db, params)
             elif mode == 'temporal':
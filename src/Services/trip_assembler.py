@@ -16,8 +16,8 @@ Usage:
 from typing import Any, Optional
 from sqlalchemy.orm import Session
 from src.Models.trip import Trip
-from src.Repositories.gps_data import get_full_gps_data_for_trip
-from src.Repositories.accelerometer_data import get_accel_map_for_trip
+from src.Repositories.gps_data import get_full_gps_data_for_trip, get_full_gps_data_for_trips
+from src.Repositories.accelerometer_data import get_accel_map_for_trip, get_accel_maps_for_trips
 
 
 class TripAssembler:
@@ -32,7 +32,9 @@ class TripAssembler:
     def build_full_trip_json(
         self,
         db: Session,
-        trip: Trip
+        trip: Trip,
+        gps_data: Optional[list[dict[str, Any]]] = None,
+        accel_map: Optional[dict[str, dict[str, Any]]] = None
     ) -> dict[str, Any]:
         """
         Build complete JSON for a single trip.
@@ -40,6 +42,9 @@ class TripAssembler:
         Args:
             db: SQLAlchemy session
             trip: Trip ORM object
+            gps_data: Route points already loaded (build_trips_response batch);
+                      queried for this trip if None
+            accel_map: Accel map already loaded; queried for this trip if None
         
         Returns:
             dict: Complete trip data:
@@ -92,12 +97,14 @@ class TripAssembler:
         # ========================================
         # Load GPS data for this trip
         # ========================================
-        gps_data = get_full_gps_data_for_trip(db, trip_id)
+        if gps_data is None:
+            gps_data = get_full_gps_data_for_trip(db, trip_id)
         
         # ========================================
         # Load Accel data for this trip
         # ========================================
-        accel_map = get_accel_map_for_trip(db, trip_id)
+        if accel_map is None:
+            accel_map = get_accel_map_for_trip(db, trip_id)
         
         # ========================================
         # Merge GPS + Accel into route
@@ -158,8 +165,8 @@ class TripAssembler:
             }
         
         Performance:
-            - Processes trips sequentially (could parallelize in future)
-            - Typical time: 50-200ms for 10 trips with 3000 total points
+            - GPS routes and accel maps of all trips are loaded with one
+              query each (no per-trip N+1)
         
         Example:
             >>> trips = get_trips_in_time_range(db, start, end)
@@ -182,9 +189,19 @@ class TripAssembler:
         # ========================================
         trip_jsons = []
         
-        for trip in trips:
+        # GPS y accel de todos los trips en 2 queries (no 2 por trip)
+        trip_ids = [str(getattr(trip, 'trip_id', '')) for trip in trips]
+        routes = get_full_gps_data_for_trips(db, trip_ids)
+        accel_maps = get_accel_maps_for_trips(db, trip_ids)
+        
+        for trip, trip_id in zip(trips, trip_ids):
             try:
-                trip_json = self.build_full_trip_json(db, trip)
+                trip_json = self.build_full_trip_json(
+                    db,
+                    trip,
+                    gps_data=routes.get(trip_id, []),
+                    accel_map=accel_maps.get(trip_id, {})
+                )
                 trip_jsons.append(trip_json)
             except Exception as e:
                 # Log error but continue processing other trips
@@ -39,8 +39,12 @@ from src.Services.udp_core import (
 from src.Services.event_handlers import (
     handle_geofence_detection,
     handle_trip_detection,
-    insert_data
+    insert_data,
+    start_last_seen_flusher,
+    suppress_stationary_duplicate,
+    gps_ingest_buffer
 )
+from src.Core.config import settings
 
 
 # ==========================================================
@@ -49,6 +53,9 @@ from src.Services.event_handlers import (
 UDP_PORT = int(os.getenv("UDP_PORT", "9001"))
 BUFFER_SIZE = 65535  # maximum safe UDP packet size
 
+# Inserción por lotes (GpsIngestBuffer) en lugar de un commit por paquete
+ingest_buffer = gps_ingest_buffer if settings.UDP_BATCH_ENABLED else None
+
 
 # ==========================================================
 # UDP SERVER MAIN LOOP
@@ -153,7 +160,10 @@ def udp_server():
                 )
 
                 # Get previous GPS for context
-                previous_gps = get_last_gps_row_by_device(db, device_id)
+                # (con batching, el último punto puede estar aún en el buffer)
+                previous_gps = (
+                    ingest_buffer and ingest_buffer.last_point(device_id)
+                ) or get_last_gps_row_by_device(db, device_id)
 
                 # ========================================
                 # PASO 6: HANDLE GEOFENCE DETECTION
@@ -166,7 +176,8 @@ def udp_server():
                     altitude=gps_data.Altitude,
                     accuracy=gps_data.Accuracy,
                     timestamp=gps_data.Timestamp,
-                    previous_gps=previous_gps
+                    previous_gps=previous_gps,
+                    ingest_buffer=ingest_buffer
                 )
 
                 # Update GPS data with geofence fields
@@ -174,6 +185,13 @@ def udp_server():
                 gps_dict.update(geofence_fields)
                 gps_data = GpsData_create(**gps_dict)
 
+                # Device detenido repitiendo la misma posición: no se inserta
+                if (
+                    settings.GPS_DEDUP_STATIONARY_ENABLED
+                    and suppress_stationary_duplicate(previous_gps, gps_data)
+                ):
+                    continue
+
                 # ========================================
                 # PASO 7: HANDLE TRIP DETECTION
                 # ========================================
@@ -190,12 +208,18 @@ def udp_server():
                     device_id=device_id,
                     current_gps=current_gps,
                     previous_gps=previous_gps,
-                    active_trip=active_trip
+                    active_trip=active_trip,
+                    ingest_buffer=ingest_buffer
                 )
 
                 # ========================================
                 # PASO 8: PERSIST TO DATABASE
                 # ========================================
+                if ingest_buffer:
+                    # Se escribe en el próximo flush (tamaño o tiempo)
+                    ingest_buffer.push(gps_data, accel_data, trip_id)
+                    continue
+
                 gps_inserted, accel_inserted = insert_data(
                     db=db,
                     gps_data=gps_data,
@@ -224,6 +248,10 @@ def start_udp_server() -> threading.Thread:
     Returns:
         threading.Thread: Thread del servidor (ya iniciado)
     """
+    start_last_seen_flusher()
+    if ingest_buffer:
+        ingest_buffer.start()
+    
     thread = threading.Thread(target=udp_server, daemon=True, name="UDP-Server")
     thread.start()
     print("[UDP] Background thread started")
@@ -69,9 +69,13 @@ def validate_device(
     Side Effects:
         - Escribe logs de seguridad via log_ws.log_from_thread()
         - NO modifica la base de datos (solo lectura)
+        - El Device retornado queda en la sesión: pasarlo hacia abajo
+          (ej: insert_data) en vez de volver a consultarlo
     """
     # PASO 1: Verificar si el device existe en la DB
-    device_record = db.query(Device).filter(Device.DeviceID == device_id).first()
+    # Session.get() consulta primero el identity map de la sesión: si el
+    # Device ya se cargó en esta sesión no se emite otro SELECT.
+    device_record = db.get(Device, device_id)
     
     if not device_record:
         # Device no registrado - RECHAZO DE SEGURIDAD
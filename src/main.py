@@ -35,16 +35,18 @@ from pathlib import Path
 import asyncio
 
 # Background Services
-from src.Services.udp import start_udp_server
+from src.Services.udp import start_udp_server, ingest_buffer
+from src.Services.event_handlers import flush_last_seen_buffer
 
 # WebSocket Management (system logs only)
 from src.Core import log_ws
 
 # Database
-from src.DB.session import SessionLocal
+from src.DB.session import SessionLocal, prewarm_pool
 
 # Geofence Management
-from src.Repositories.geofence import count_geofences
+from src.Repositories.geofence import geofences_exist
+from src.Services.partition_maintenance import run_gps_partition_maintenance, start_gps_partition_maintainer
 from src.Services.geofence_importer import geofence_importer
 
 # ============================================================
@@ -209,8 +211,10 @@ async def lifespan(app: FastAPI):
     
     Startup Sequence:
         1. Configure event loop for WebSocket managers
-        2. Import geofence data if database is empty
-        3. Start UDP server for receiving GPS data from devices
+        2. Create upcoming monthly gps_data partitions (then daily maintainer)
+        3. Import geofence data if database is empty
+        4. Pre-warm the DB connection pool
+        5. Start UDP server for receiving GPS data from devices
     
     Shutdown Sequence:
         - Background threads terminate automatically (daemon mode)
@@ -230,6 +234,17 @@ async def lifespan(app: FastAPI):
     loop = asyncio.get_running_loop()
     log_ws.log_ws_manager.set_main_loop(loop)
     
+    # ========================================
+    # STARTUP: gps_data Partitions
+    # ========================================
+    try:
+        partitions = run_gps_partition_maintenance()
+        print(f"[STARTUP] ✅ gps_data partitions ready: {', '.join(partitions)}")
+    except Exception as e:
+        print(f"[STARTUP] ⚠️  gps_data partition maintenance failed: {e}")
+    # Luego cada GPS_PARTITION_MAINTENANCE_S (procesos de larga duración)
+    start_gps_partition_maintainer()
+    
     # ========================================
     # STARTUP: Import Geofences if Needed
     # ========================================
@@ -240,10 +255,9 @@ async def lifespan(app: FastAPI):
         print("[STARTUP] ⚠️  Skipping geofence import")
     else:
         with SessionLocal() as db:
-            count = count_geofences(db, only_active=False)
-            
-            if count > 0:
-                print(f"[STARTUP] ✅ Database contains {count} geofences, skipping import")
+            # EXISTS en lugar de COUNT(*): solo importa si la tabla está vacía
+            if geofences_exist(db):
+                print("[STARTUP] ✅ Database already contains geofences, skipping import")
             else:
                 print("[STARTUP] 📄 Empty database detected, importing geofences...")
                 
@@ -265,6 +279,16 @@ async def lifespan(app: FastAPI):
                     import traceback
                     traceback.print_exc()
     
+    # ========================================
+    # STARTUP: Pre-warm DB Connection Pool
+    # ========================================
+    if settings.DB_POOL_PREWARM > 0:
+        try:
+            opened = prewarm_pool(settings.DB_POOL_PREWARM)
+            print(f"[STARTUP] ✅ DB pool pre-warmed ({opened} connections)")
+        except Exception as e:
+            print(f"[STARTUP] ⚠️  DB pool pre-warm failed: {e}")
+    
     # ========================================
     # STARTUP: Initialize UDP Server
     # ========================================
@@ -283,6 +307,15 @@ async def lifespan(app: FastAPI):
     # SHUTDOWN: Cleanup
     # ========================================
     print("[SHUTDOWN] 🛑 Application shutdown initiated")
+    
+    # Escribir GPS pendientes del buffer de ingesta (UDP_BATCH_ENABLED)
+    if ingest_buffer:
+        ingest_buffer.flush()
+        print(f"[SHUTDOWN] Ingest buffer flushed: {ingest_buffer.stats()}")
+    
+    # LastSeen pendiente (incluye el que acaba de encolar el flush anterior)
+    updated = flush_last_seen_buffer()
+    print(f"[SHUTDOWN] LastSeen buffer flushed ({updated} devices)")
 
 
 # ============================================================